@@ -1,4 +1,4 @@
-import { useState, useEffect } from 'react'
+import { useState, useEffect, useRef } from 'react'
 import { Button } from '@/components/ui/button.jsx'
 import { Card, CardContent, CardDescription, CardHeader, CardTitle } from '@/components/ui/card.jsx'
 import { Badge } from '@/components/ui/badge.jsx'
@@ -7,6 +7,79 @@ import { Tabs, TabsContent, TabsList, TabsTrigger } from '@/components/ui/tabs.j
 import { Activity, Cpu, DollarSign, Zap, TrendingUp, Settings, Play, Pause, BarChart3 } from 'lucide-react'
 import './App.css'
 
+// عناوين الواجهة الخلفية (api_server.py)؛ يمكن تغييرها عبر متغيرات Vite
+const API_URL = import.meta.env.VITE_API_URL ?? 'http://localhost:5000'
+const WS_URL = import.meta.env.VITE_WS_URL ?? 'ws://localhost:5001'
+// مفتاح API عند تفعيل security.api_key_required في الخادم
+const API_KEY = import.meta.env.VITE_API_KEY ?? ''
+const API_HEADERS = API_KEY ? { 'X-API-Key': API_KEY } : {}
+// WebSocket في المتصفح لا يقبل ترويسات مخصصة، فيُمرر المفتاح في الرابط
+const SOCKET_URL = API_KEY ? `${WS_URL}?api_key=${encodeURIComponent(API_KEY)}` : WS_URL
+const REFRESH_INTERVAL = 5000
+
+const COIN_SYMBOLS = { bitcoin: 'BTC', ethereum: 'ETH', litecoin: 'LTC', monero: 'XMR' }
+
+// تطبيق فروق الخادم: الكائنات تُدمج تكرارياً (null قيمة عادية)
+function applyDelta(target, changes) {
+  const result = { ...target }
+  for (const [key, value] of Object.entries(changes)) {
+    if (value !== null && typeof value === 'object' && !Array.isArray(value) && typeof result[key] === 'object' && result[key] !== null) {
+      result[key] = applyDelta(result[key], value)
+    } else {
+      result[key] = value
+    }
+  }
+  return result
+}
+
+// حذف المسارات المرسلة في removed (مثل ['rigs', 'rig-3']) مع نسخ الكائنات على طول المسار
+function removePath(target, path) {
+  const [key, ...rest] = path
+  if (!target || typeof target !== 'object' || !(key in target)) {
+    return target
+  }
+  const result = { ...target }
+  if (rest.length) {
+    result[key] = removePath(result[key], rest)
+  } else {
+    delete result[key]
+  }
+  return result
+}
+
+function applyMessage(state, message) {
+  const updated = applyDelta(state ?? {}, message.changes)
+  return (message.removed ?? []).reduce(removePath, updated)
+}
+
+// رسم سلسلة مضغوطة من ChartRenderer.series() ({t0, dt, v}) كمضلع SVG على جهة العميل
+function SeriesChart({ title, unit, line, width = 480, height = 160 }) {
+  if (!line || line.v.length < 2) {
+    return null
+  }
+  const times = line.dt
+  const values = line.v
+  const minT = times[0]
+  const spanT = (times[times.length - 1] - minT) || 1
+  const minV = Math.min(...values)
+  const spanV = (Math.max(...values) - minV) || 1
+  const points = values
+    .map((value, i) => `${((times[i] - minT) / spanT) * width},${height - ((value - minV) / spanV) * height}`)
+    .join(' ')
+
+  return (
+    <div>
+      <div className="flex items-center justify-between text-sm text-slate-300 mb-2">
+        <span>{title}</span>
+        <span className="text-slate-400">{values[values.length - 1].toLocaleString()} {unit}</span>
+      </div>
+      <svg viewBox={`0 0 ${width} ${height}`} className="w-full h-40" preserveAspectRatio="none">
+        <polyline points={points} fill="none" stroke="currentColor" strokeWidth="1.5" className="text-blue-400" />
+      </svg>
+    </div>
+  )
+}
+
 function App() {
   const [isRunning, setIsRunning] = useState(false)
   const [currentCoin, setCurrentCoin] = useState('BTC')
@@ -25,6 +98,115 @@ function App() {
     LTC: { price: 150, change: 0.8 }
   })
 
+  // لوحات الرسم بصيغة ChartRenderer.series(): {panels: [{name, title, unit, lines}]}
+  const [chartSeries, setChartSeries] = useState(null)
+  const [backendState, setBackendState] = useState(null)
+  const seqRef = useRef(0)
+
+  // لقطة أولية عبر HTTP ثم فروق عبر WebSocket؛ أي فجوة في التسلسل تعني إعادة جلب اللقطة
+  useEffect(() => {
+    let socket = null
+    let reconnectTimer = null
+    let closed = false
+    let snapshotRequest = null
+
+    // طلب لقطة واحد فقط في الطيران: الفروق التالية للفجوة نفسها لا تطلق طلبات إضافية
+    const loadSnapshot = () => {
+      if (snapshotRequest) {
+        return snapshotRequest
+      }
+      snapshotRequest = fetch(`${API_URL}/api/state`, { headers: API_HEADERS })
+        .then((response) => (response.ok ? response.json() : null))
+        .then((snapshot) => {
+          // لقطة أقدم مما طُبق عبر WebSocket أثناء الطلب تُتجاهل
+          if (snapshot && !closed && snapshot.seq >= seqRef.current) {
+            seqRef.current = snapshot.seq
+            setBackendState(snapshot.state)
+          }
+        })
+        .catch(() => {})
+        .finally(() => {
+          snapshotRequest = null
+        })
+      return snapshotRequest
+    }
+
+    const connect = () => {
+      socket = new WebSocket(SOCKET_URL)
+      socket.onmessage = (event) => {
+        const message = JSON.parse(event.data)
+        if (message.type === 'snapshot') {
+          seqRef.current = message.seq
+          setBackendState(message.state)
+        } else if (message.seq <= seqRef.current) {
+          return
+        } else if (message.seq !== seqRef.current + 1) {
+          loadSnapshot()
+        } else {
+          seqRef.current = message.seq
+          setBackendState((state) => applyMessage(state, message))
+        }
+      }
+      socket.onclose = () => {
+        if (!closed) {
+          reconnectTimer = setTimeout(connect, 2000)
+        }
+      }
+    }
+
+    loadSnapshot()
+    connect()
+    return () => {
+      closed = true
+      clearTimeout(reconnectTimer)
+      if (socket) {
+        socket.close()
+      }
+    }
+  }, [])
+
+  // الرسوم تُجلب دورياً بصيغة السلاسل المضغوطة وتُرسم في المتصفح
+  useEffect(() => {
+    const loadCharts = () =>
+      fetch(`${API_URL}/api/charts`, { headers: API_HEADERS })
+        .then((response) => (response.ok ? response.json() : null))
+        .then((series) => series && setChartSeries(series))
+        .catch(() => {})
+    loadCharts()
+    const timer = setInterval(loadCharts, REFRESH_INTERVAL)
+    return () => clearInterval(timer)
+  }, [])
+
+  useEffect(() => {
+    if (!backendState) {
+      return
+    }
+    const { bot, fleet, prices, recommendation } = backendState
+    if (bot) {
+      setIsRunning(bot.status !== 'idle')
+      if (bot.coin) {
+        setCurrentCoin(bot.coin)
+      }
+    }
+    if (prices) {
+      const mapped = {}
+      for (const [name, data] of Object.entries(prices)) {
+        mapped[COIN_SYMBOLS[name] ?? name.toUpperCase()] = { price: data.usd, change: data.usd_24h_change }
+      }
+      setCryptoPrices((current) => ({ ...current, ...mapped }))
+    }
+    setMiningData((current) => ({
+      ...current,
+      ...(recommendation && { dailyProfit: Number(recommendation.expected_daily_profit ?? 0).toFixed(2) }),
+      ...(fleet && {
+        hashRate: fleet.hash_rate,
+        temperature: Math.round(fleet.gpu_temp),
+        powerConsumption: Math.round(fleet.power_consumption),
+        efficiency: Math.round(fleet.gpu_usage)
+      })
+    }))
+  }, [backendState])
+
   const toggleMining = () => {
     setIsRunning(!isRunning)
   }
@@ -210,10 +392,20 @@ function App() {
                 </CardTitle>
               </CardHeader>
               <CardContent>
-                <div className="text-center py-12 text-slate-400">
-                  <BarChart3 className="w-16 h-16 mx-auto mb-4 opacity-50" />
-                  <p>سيتم إضافة الرسوم البيانية والتحليلات قريباً</p>
-                </div>
+                {chartSeries && chartSeries.panels.length ? (
+                  <div className="grid grid-cols-1 lg:grid-cols-2 gap-6">
+                    {chartSeries.panels.map((panel) =>
+                      Object.entries(panel.lines).map(([label, line]) => (
+                        <SeriesChart key={`${panel.name}-${label}`} title={panel.title} unit={panel.unit} line={line} />
+                      ))
+                    )}
+                  </div>
+                ) : (
+                  <div className="text-center py-12 text-slate-400">
+                    <BarChart3 className="w-16 h-16 mx-auto mb-4 opacity-50" />
+                    <p>سيتم إضافة الرسوم البيانية والتحليلات قريباً</p>
+                  </div>
+                )}
               </CardContent>
             </Card>
           </TabsContent>
@@ -0,0 +1,224 @@
+import hashlib
+import hmac
+import os
+import secrets
+import sqlite3
+import threading
+import time
+
+from checkpoint import BinaryReader, BinaryWriter
+
+
+class ApiKeyStore:
+    """مخزن مفاتيح API: عدة مفاتيح لكل مستخدم وفهرس بمعرف البادئة
+
+    التحقق بحث واحد بمعرف البادئة ثم بصمة SHA-256 واحدة للسر، فلا حاجة لذاكرة
+    مؤقتة (مفتاحها سيكلف البصمة نفسها). معرفات المستخدمين تُقارن كنصوص لأن
+    قاعدة البيانات تخزنها نصاً.
+    """
+
+    KEY_SEPARATOR = '.'
+
+    def __init__(self, db_path=None, flush_interval=5.0):
+        self.db_path = db_path
+        self.flush_interval = flush_interval
+        # معرف المفتاح -> السجل
+        self._keys = {}
+        # المستخدم (نصاً) -> مجموعة معرفات المفاتيح
+        self._user_index = {}
+        # معرفات المفاتيح التي تغيرت عداداتها منذ آخر حفظ
+        self._dirty = set()
+        self._lock = threading.Lock()
+        self._version = 0
+        self._db = None
+        self._stop_event = threading.Event()
+        self._flush_thread = None
+
+        if db_path:
+            self._open_db()
+            self._load()
+            self._flush_thread = threading.Thread(target=self._flush_loop, name='api-key-usage-flush')
+            self._flush_thread.daemon = True
+            self._flush_thread.start()
+
+    def __len__(self):
+        return len(self._keys)
+
+    def __contains__(self, user_id):
+        return bool(self._user_index.get(str(user_id)))
+
+    @property
+    def state_version(self):
+        return self._version
+
+    @staticmethod
+    def _hash(secret):
+        return hashlib.sha256(secret.encode()).hexdigest()
+
+    def generate(self, user_id):
+        """إنشاء مفتاح جديد للمستخدم دون إلغاء المفاتيح السابقة"""
+        key_id = secrets.token_hex(6)
+        while key_id in self._keys:
+            key_id = secrets.token_hex(6)
+        secret = secrets.token_urlsafe(32)
+
+        record = {
+            'key_id': key_id,
+            'user_id': str(user_id),
+            'key_hash': self._hash(secret),
+            'created_at': time.time(),
+            'last_used': None,
+            'usage_count': 0
+        }
+
+        with self._lock:
+            self._keys[key_id] = record
+            self._user_index.setdefault(record['user_id'], set()).add(key_id)
+            self._version += 1
+            if self._db is not None:
+                self._db.execute(
+                    "INSERT INTO api_keys VALUES (?, ?, ?, ?, ?, ?)",
+                    (key_id, record['user_id'], record['key_hash'], record['created_at'], None, 0)
+                )
+                self._db.commit()
+
+        return f"{key_id}{self.KEY_SEPARATOR}{secret}"
+
+    def verify(self, provided_key, user_id=None):
+        """التحقق من المفتاح وإرجاع سجله، أو None إذا كان غير صالح"""
+        key_id, _, secret = provided_key.partition(self.KEY_SEPARATOR)
+        secret_hash = self._hash(secret)
+        with self._lock:
+            record = self._keys.get(key_id)
+            if record is None or not hmac.compare_digest(secret_hash, record['key_hash']):
+                return None
+            if user_id is not None and record['user_id'] != str(user_id):
+                return None
+
+            # تحديث العدادات في الذاكرة فقط؛ الحفظ يتم على دفعات في الخلفية
+            record['usage_count'] += 1
+            record['last_used'] = time.time()
+            self._dirty.add(key_id)
+            self._version += 1
+            return record
+
+    def revoke(self, key_id):
+        """إلغاء مفتاح واحد"""
+        with self._lock:
+            record = self._keys.pop(key_id, None)
+            if record is None:
+                return False
+            user_keys = self._user_index.get(record['user_id'])
+            if user_keys is not None:
+                user_keys.discard(key_id)
+                if not user_keys:
+                    del self._user_index[record['user_id']]
+            self._dirty.discard(key_id)
+            self._version += 1
+            if self._db is not None:
+                self._db.execute("DELETE FROM api_keys WHERE key_id = ?", (key_id,))
+                self._db.commit()
+            return True
+
+    def keys_for_user(self, user_id):
+        """سجلات مفاتيح المستخدم (بدون البصمات)"""
+        with self._lock:
+            return [
+                {k: v for k, v in self._keys[key_id].items() if k != 'key_hash'}
+                for key_id in self._user_index.get(str(user_id), ())
+            ]
+
+    def flush(self):
+        """حفظ عدادات الاستخدام المتغيرة في دفعة واحدة"""
+        with self._lock:
+            if self._db is None or not self._dirty:
+                return 0
+            rows = [
+                (self._keys[key_id]['last_used'], self._keys[key_id]['usage_count'], key_id)
+                for key_id in self._dirty if key_id in self._keys
+            ]
+            self._dirty.clear()
+            self._db.executemany(
+                "UPDATE api_keys SET last_used = ?, usage_count = ? WHERE key_id = ?", rows
+            )
+            self._db.commit()
+            return len(rows)
+
+    def _flush_loop(self):
+        while not self._stop_event.wait(self.flush_interval):
+            try:
+                self.flush()
+            except sqlite3.Error:
+                pass
+
+    def _open_db(self):
+        directory = os.path.dirname(self.db_path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        self._db = sqlite3.connect(self.db_path, check_same_thread=False)
+        self._db.execute("PRAGMA journal_mode=WAL")
+        self._db.execute(
+            "CREATE TABLE IF NOT EXISTS api_keys ("
+            "key_id TEXT PRIMARY KEY, user_id TEXT, key_hash TEXT, "
+            "created_at REAL, last_used REAL, usage_count INTEGER)"
+        )
+        self._db.commit()
+
+    def _load(self):
+        rows = self._db.execute(
+            "SELECT key_id, user_id, key_hash, created_at, last_used, usage_count FROM api_keys"
+        )
+        for key_id, user_id, key_hash, created_at, last_used, usage_count in rows:
+            self._keys[key_id] = {
+                'key_id': key_id,
+                'user_id': str(user_id),
+                'key_hash': key_hash,
+                'created_at': created_at,
+                'last_used': last_used,
+                'usage_count': usage_count
+            }
+            self._user_index.setdefault(user_id, set()).add(key_id)
+
+    def export_state(self):
+        """تسلسل سجلات المفاتيح (البصمات فقط، لا الأسرار)"""
+        writer = BinaryWriter()
+        with self._lock:
+            writer.u32(len(self._keys))
+            for record in self._keys.values():
+                writer.text(record['key_id'])
+                writer.value(record['user_id'])
+                writer.blob(bytes.fromhex(record['key_hash']))
+                writer.f64(record['created_at'])
+                writer.f64(record['last_used'])
+                writer.u64(record['usage_count'])
+        return writer.getvalue()
+
+    def import_state(self, data):
+        """استعادة سجلات المفاتيح من نقطة حفظ"""
+        reader = BinaryReader(data)
+        with self._lock:
+            for _ in range(reader.u32()):
+                key_id = reader.text()
+                record = {
+                    'key_id': key_id,
+                    'user_id': str(reader.value()),
+                    'key_hash': reader.blob().hex(),
+                    'created_at': reader.f64(),
+                    'last_used': reader.optional_f64(),
+                    'usage_count': reader.u64()
+                }
+                self._keys[key_id] = record
+                self._user_index.setdefault(record['user_id'], set()).add(key_id)
+            self._version += 1
+
+    def close(self):
+        """إيقاف خيط الحفظ وحفظ آخر العدادات"""
+        self._stop_event.set()
+        if self._flush_thread is not None:
+            self._flush_thread.join()
+            self._flush_thread = None
+        self.flush()
+        with self._lock:
+            if self._db is not None:
+                self._db.close()
+                self._db = None
@@ -0,0 +1,611 @@
+import base64
+import hashlib
+import json
+import selectors
+import socket
+import struct
+import threading
+import time
+from collections import deque
+from urllib.parse import parse_qs, urlsplit
+
+from flask import Flask, Response, jsonify, request
+from flask_cors import CORS
+
+from instrumentation import INSTRUMENTATION
+from log_pipeline import get_logger
+
+WEBSOCKET_GUID = b'258EAFA5-E914-47DA-95CA-C5AB0DC85B11'
+MAX_HANDSHAKE_BYTES = 8192
+MAX_CLIENT_FRAME = 65536
+
+OPCODE_TEXT = 0x1
+OPCODE_CLOSE = 0x8
+OPCODE_PING = 0x9
+OPCODE_PONG = 0xA
+
+
+def encode_frame(payload, opcode=OPCODE_TEXT):
+    """إطار WebSocket من الخادم (غير مقنّع) حسب RFC 6455"""
+    length = len(payload)
+    if length < 126:
+        header = struct.pack('!BB', 0x80 | opcode, length)
+    elif length < 65536:
+        header = struct.pack('!BBH', 0x80 | opcode, 126, length)
+    else:
+        header = struct.pack('!BBQ', 0x80 | opcode, 127, length)
+    return header + payload
+
+
+def _decode_client_frame(buffer):
+    """فك إطار واحد من العميل (مقنّع إلزامياً)؛ يعيد (opcode، الحمولة، الطول المستهلك) أو None"""
+    if len(buffer) < 2:
+        return None
+    opcode = buffer[0] & 0x0F
+    masked = buffer[1] & 0x80
+    length = buffer[1] & 0x7F
+    offset = 2
+    if length == 126:
+        if len(buffer) < 4:
+            return None
+        length = struct.unpack_from('!H', buffer, 2)[0]
+        offset = 4
+    elif length == 127:
+        if len(buffer) < 10:
+            return None
+        length = struct.unpack_from('!Q', buffer, 2)[0]
+        offset = 10
+    if not masked or length > MAX_CLIENT_FRAME:
+        raise ValueError("Invalid client frame")
+    end = offset + 4 + length
+    if len(buffer) < end:
+        return None
+    mask = bytes(buffer[offset:offset + 4]) * (length // 4 + 1)
+    payload = bytes(a ^ b for a, b in zip(buffer[offset + 4:end], mask))
+    return opcode, payload, end
+
+
+def diff_state(old, new):
+    """الفرق بين حالتين: (الحقول المتغيرة فقط، مسارات المفاتيح المحذوفة)
+
+    المحذوفات قائمة مسارات منفصلة لأن null قيمة مشروعة داخل الحالة نفسها.
+    """
+    removed = []
+    return _diff(old, new, [], removed), removed
+
+
+def _diff(old, new, path, removed):
+    changes = {}
+    for key, value in new.items():
+        if key not in old:
+            changes[key] = value
+            continue
+        previous = old[key]
+        if isinstance(value, dict) and isinstance(previous, dict):
+            nested = _diff(previous, value, path + [key], removed)
+            if nested:
+                changes[key] = nested
+        elif previous != value:
+            changes[key] = value
+    for key in old:
+        if key not in new:
+            removed.append(path + [key])
+    return changes
+
+
+def _normalize(value, precision):
+    """تقريب الأعداد العشرية حتى لا يولد الضجيج فروقاً في كل نبضة"""
+    if isinstance(value, float):
+        return round(value, precision) if value == value else None
+    if isinstance(value, dict):
+        return {str(key): _normalize(item, precision) for key, item in value.items()}
+    if isinstance(value, (list, tuple)):
+        return [_normalize(item, precision) for item in value]
+    return value
+
+
+class StateHub:
+    """حالة اللوحات: تُحسب الفروق وتُسلسل مرة واحدة لكل نبضة مهما كان عدد المشاهدين"""
+
+    def __init__(self, precision=2):
+        self.precision = precision
+        self.seq = 0
+        self._state = {}
+        self._snapshot = None
+        self._snapshot_frame = None
+        self._lock = threading.Lock()
+
+    def publish(self, state):
+        """نشر حالة جديدة وإرجاع إطار الفروق الجاهز للإرسال، أو None إذا لم يتغير شيء"""
+        state = _normalize(state, self.precision)
+        with self._lock:
+            changes, removed = diff_state(self._state, state)
+            if not changes and not removed:
+                return None
+            self.seq += 1
+            self._state = state
+            self._snapshot = self._snapshot_frame = None
+            payload = json.dumps(
+                {'type': 'delta', 'seq': self.seq, 'changes': changes, 'removed': removed},
+                separators=(',', ':'), ensure_ascii=False
+            ).encode('utf-8')
+        return encode_frame(payload)
+
+    def _snapshot_locked(self):
+        if self._snapshot is None:
+            self._snapshot = json.dumps(
+                {'type': 'snapshot', 'seq': self.seq, 'state': self._state},
+                separators=(',', ':'), ensure_ascii=False
+            ).encode('utf-8')
+        return self._snapshot
+
+    def snapshot_bytes(self):
+        """الحالة الكاملة بصيغة JSON (تُحسب مرة واحدة لكل تسلسل)"""
+        with self._lock:
+            return self._snapshot_locked()
+
+    def snapshot_frame(self):
+        """إطار اللقطة الكاملة للعملاء الجدد (يُحسب مرة واحدة لكل تسلسل)"""
+        with self._lock:
+            if self._snapshot_frame is None:
+                self._snapshot_frame = encode_frame(self._snapshot_locked())
+            return self._snapshot_frame
+
+
+class _Client:
+    __slots__ = ('sock', 'address', 'inbound', 'outbound', 'offset', 'open', 'writing')
+
+    def __init__(self, sock, address):
+        self.sock = sock
+        self.address = address
+        self.inbound = bytearray()
+        self.outbound = deque()
+        self.offset = 0
+        self.open = False
+        self.writing = False
+
+
+class WebSocketBroadcaster:
+    """خادم WebSocket خفيف (مكتبة قياسية) بحلقة selectors واحدة
+
+    الإطار نفسه (bytes) يُضاف إلى طابور كل عميل بدون نسخ. العميل البطيء الذي
+    يتجاوز max_backlog تُحذف إطاراته المتراكمة ويستلم لقطة كاملة بدلاً منها.
+    on_subscribe(path) إن وُجد يحدد الإطارات الأولى حسب مسار الطلب (للاستئناف مثلاً).
+    authorize(path, headers, address) إن وُجد يرفض المصافحة بـ 403 عندما يعيد False.
+    """
+
+    def __init__(self, host='127.0.0.1', port=5001, on_connect=None, max_backlog=64, on_subscribe=None,
+                 authorize=None):
+        self.host = host
+        self.port = port
+        self.on_connect = on_connect
+        self.on_subscribe = on_subscribe
+        self.authorize = authorize
+        self.max_backlog = max_backlog
+        self.frames_broadcast = 0
+        self.resyncs = 0
+        self._clients = {}
+        self._outbox = deque()
+        self._selector = None
+        self._listener = None
+        self._wake_reader, self._wake_writer = socket.socketpair()
+        self._wake_reader.setblocking(False)
+        self._wake_writer.setblocking(False)
+        self._running = False
+        self._thread = None
+
+    @property
+    def address(self):
+        return self._listener.getsockname()[:2]
+
+    @property
+    def client_count(self):
+        return sum(1 for client in list(self._clients.values()) if client.open)
+
+    def start(self):
+        self._listener = socket.create_server((self.host, self.port))
+        self._listener.setblocking(False)
+        self.port = self._listener.getsockname()[1]
+        self._selector = selectors.DefaultSelector()
+        self._selector.register(self._listener, selectors.EVENT_READ, 'listener')
+        self._selector.register(self._wake_reader, selectors.EVENT_READ, 'wake')
+        self._running = True
+        self._thread = threading.Thread(target=self._run, name='websocket-broadcaster')
+        self._thread.daemon = True
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self._running = False
+        self._wake()
+        if self._thread is not None:
+            self._thread.join()
+            self._thread = None
+
+    def broadcast(self, frame):
+        """إرسال إطار جاهز لكل العملاء المتصلين (آمن من أي خيط)"""
+        self._outbox.append(frame)
+        self._wake()
+
+    def _wake(self):
+        try:
+            self._wake_writer.send(b'\0')
+        except (BlockingIOError, OSError):
+            pass
+
+    def _run(self):
+        try:
+            while self._running:
+                for key, events in self._selector.select(timeout=1.0):
+                    if key.data == 'listener':
+                        self._accept()
+                    elif key.data == 'wake':
+                        try:
+                            while self._wake_reader.recv(4096):
+                                pass
+                        except BlockingIOError:
+                            pass
+                    else:
+                        client = key.data
+                        if events & selectors.EVENT_READ:
+                            self._read(client)
+                        if events & selectors.EVENT_WRITE and client.sock.fileno() != -1:
+                            self._write(client)
+                self._fan_out()
+        finally:
+            for client in list(self._clients.values()):
+                self._drop(client)
+            self._selector.close()
+            self._listener.close()
+
+    def _fan_out(self):
+        while self._outbox:
+            frame = self._outbox.popleft()
+            self.frames_broadcast += 1
+            for client in list(self._clients.values()):
+                if client.open:
+                    self._enqueue(client, frame)
+
+    def _enqueue(self, client, frame):
+        if len(client.outbound) >= self.max_backlog and self.on_connect is not None:
+            # لا يمكن تخطي فروق وسطية؛ نستبدل المتراكم بلقطة كاملة ونبقي الإطار المرسل جزئياً
+            partial = client.outbound[0] if client.offset else None
+            client.outbound.clear()
+            if partial is not None:
+                client.outbound.append(partial)
+            client.outbound.append(self.on_connect())
+            self.resyncs += 1
+            frame = None
+        if frame is not None:
+            client.outbound.append(frame)
+        self._write(client)
+
+    def _accept(self):
+        try:
+            sock, address = self._listener.accept()
+        except BlockingIOError:
+            return
+        sock.setblocking(False)
+        sock.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+        client = _Client(sock, address)
+        self._clients[sock.fileno()] = client
+        self._selector.register(sock, selectors.EVENT_READ, client)
+
+    def _read(self, client):
+        try:
+            data = client.sock.recv(65536)
+        except BlockingIOError:
+            return
+        except OSError:
+            data = b''
+        if not data:
+            self._drop(client)
+            return
+        client.inbound += data
+        try:
+            if not client.open:
+                self._handshake(client)
+            if client.open:
+                self._read_frames(client)
+        except ValueError:
+            self._drop(client)
+
+    def _handshake(self, client):
+        end = client.inbound.find(b'\r\n\r\n')
+        if end < 0:
+            if len(client.inbound) > MAX_HANDSHAKE_BYTES:
+                raise ValueError("Handshake too large")
+            return
+        lines = bytes(client.inbound[:end]).decode('latin-1').split('\r\n')
+        del client.inbound[:end + 4]
+        headers = {}
+        for line in lines[1:]:
+            name, _, value = line.partition(':')
+            headers[name.strip().lower()] = value.strip()
+        key = headers.get('sec-websocket-key')
+        if headers.get('upgrade', '').lower() != 'websocket' or not key:
+            try:
+                client.sock.send(b'HTTP/1.1 400 Bad Request\r\nContent-Length: 0\r\n\r\n')
+            except OSError:
+                pass
+            raise ValueError("Not a WebSocket upgrade")
+
+        path = lines[0].split(' ')[1] if lines[0].count(' ') >= 2 else '/'
+        if self.authorize is not None and not self.authorize(path, headers, client.address):
+            try:
+                client.sock.send(b'HTTP/1.1 403 Forbidden\r\nContent-Length: 0\r\n\r\n')
+            except OSError:
+                pass
+            raise ValueError("WebSocket handshake not authorized")
+
+        accept = base64.b64encode(hashlib.sha1(key.encode('ascii') + WEBSOCKET_GUID).digest())
+        client.outbound.append(
+            b'HTTP/1.1 101 Switching Protocols\r\nUpgrade: websocket\r\nConnection: Upgrade\r\n'
+            b'Sec-WebSocket-Accept: ' + accept + b'\r\n\r\n'
+        )
+        client.open = True
+        if self.on_subscribe is not None:
+            client.outbound.append(self.on_subscribe(path))
+        elif self.on_connect is not None:
+            client.outbound.append(self.on_connect())
+        self._write(client)
+
+    def _read_frames(self, client):
+        while True:
+            frame = _decode_client_frame(client.inbound)
+            if frame is None:
+                return
+            opcode, payload, consumed = frame
+            del client.inbound[:consumed]
+            if opcode == OPCODE_CLOSE:
+                client.outbound.append(encode_frame(payload[:2], OPCODE_CLOSE))
+                self._write(client)
+                self._drop(client)
+                return
+            if opcode == OPCODE_PING:
+                client.outbound.append(encode_frame(payload, OPCODE_PONG))
+                self._write(client)
+            # رسائل العميل الأخرى غير مستخدمة؛ اللوحات تستقبل فقط
+
+    def _write(self, client):
+        sock = client.sock
+        try:
+            while client.outbound:
+                data = client.outbound[0]
+                sent = sock.send(memoryview(data)[client.offset:])
+                client.offset += sent
+                if client.offset < len(data):
+                    break
+                client.outbound.popleft()
+                client.offset = 0
+        except BlockingIOError:
+            pass
+        except OSError:
+            self._drop(client)
+            return
+
+        wants_write = bool(client.outbound)
+        if wants_write != client.writing and sock.fileno() != -1:
+            client.writing = wants_write
+            events = selectors.EVENT_READ | (selectors.EVENT_WRITE if wants_write else 0)
+            self._selector.modify(sock, events, client)
+
+    def _drop(self, client):
+        if self._clients.pop(client.sock.fileno(), None) is None:
+            return
+        try:
+            self._selector.unregister(client.sock)
+        except (KeyError, ValueError):
+            pass
+        client.open = False
+        client.sock.close()
+
+
+def create_app(server):
+    """تطبيق Flask لواجهات القراءة (الحالة، الرسوم، مقاييس النظام والمقاطع)"""
+    app = Flask(__name__)
+    # CORS لأصول الواجهة المحددة فقط بدلاً من أي أصل
+    CORS(app, resources={r'/api/*': {'origins': server.allowed_origins}}, allow_headers=['X-API-Key'])
+
+    @app.before_request
+    def require_api_key():
+        # طلبات preflight لا تحمل الترويسة؛ يردها CORS بعد هذا الفحص
+        if not request.path.startswith('/api/') or request.method == 'OPTIONS':
+            return None
+        if not server.authenticate(request.headers.get('X-API-Key'), request.remote_addr):
+            return jsonify({'error': 'Unauthorized'}), 401
+        return None
+
+    @app.route('/api/state')
+    def state():
+        return Response(server.hub.snapshot_bytes(), mimetype='application/json')
+
+    @app.route('/api/charts')
+    def charts():
+        if server.chart_renderer is None:
+            return jsonify({'error': 'Charts are not enabled'}), 404
+        since = request.args.get('since', type=float)
+        return Response(server.chart_renderer.to_json(since), mimetype='application/json')
+
+    @app.route('/api/system')
+    def system():
+        if server.monitor is None:
+            return jsonify({'error': 'System monitor is not enabled'}), 404
+        resolution = request.args.get('resolution', type=float)
+        last = request.args.get('last', default=720, type=int)
+        try:
+            return jsonify(server.monitor.to_dict(resolution, last))
+        except ValueError as e:
+            return jsonify({'error': str(e)}), 400
+
+    @app.route('/api/spans')
+    def spans():
+        return Response(INSTRUMENTATION.to_json(), mimetype='application/json')
+
+    @app.route('/metrics')
+    def metrics():
+        return Response(INSTRUMENTATION.to_prometheus(), mimetype='text/plain; version=0.0.4')
+
+    return app
+
+
+class ApiServer:
+    """خدمة الواجهة الخلفية: HTTP للقراءة و WebSocket لدفع الفروق في كل نبضة"""
+
+    def __init__(self, bot=None, monitor=None, chart_renderer=None, config=None, security=None):
+        settings = (config or {}).get('api_server', {})
+        self.bot = bot
+        self.monitor = monitor
+        self.chart_renderer = chart_renderer
+        self.security = security
+        self.api_key_required = (config or {}).get('security', {}).get('api_key_required', False)
+        if self.api_key_required and security is None:
+            raise ValueError("api_key_required is set but no SecurityModule was given")
+        self.allowed_origins = settings.get('allowed_origins', ['http://localhost:5173'])
+        self.host = settings.get('host', '127.0.0.1')
+        self.http_port = settings.get('http_port', 5000)
+        self.tick_interval = settings.get('tick_interval', 1.0)
+        self.hub = StateHub(settings.get('precision', 2))
+        self.broadcaster = WebSocketBroadcaster(
+            self.host, settings.get('ws_port', 5001),
+            on_connect=self.hub.snapshot_frame,
+            max_backlog=settings.get('max_backlog', 64),
+            authorize=self.authorize_websocket
+        )
+        self.app = create_app(self)
+        self.logger = get_logger(__name__, 'api_server.log', config)
+        self._stop_event = threading.Event()
+        self._thread = None
+
+    def authenticate(self, api_key, address=None):
+        """التحقق من مفتاح API لطلب HTTP أو WebSocket (دائماً صحيح إذا لم يُطلب مفتاح)"""
+        if not self.api_key_required:
+            return True
+        if not api_key:
+            return False
+        return self.security.authenticate_api_key(api_key, address) is not None
+
+    def authorize_websocket(self, path, headers, address):
+        """المتصفحات لا ترسل ترويسات مخصصة مع WebSocket، فيُقبل المفتاح من ?api_key=
+
+        Origin يُفحص أيضاً لأن CORS لا ينطبق على WebSocket؛ العملاء غير المتصفحات لا يرسلونه.
+        """
+        origin = headers.get('origin')
+        if origin is not None and origin not in self.allowed_origins:
+            return False
+        api_key = headers.get('x-api-key') or parse_qs(urlsplit(path).query).get('api_key', [None])[0]
+        return self.authenticate(api_key, address[0] if address else None)
+
+    def collect_state(self):
+        """تجميع حالة البوت والتوصية والأسطول والمقاييس في قاموس واحد"""
+        state = {}
+        bot = self.bot
+        if bot is not None:
+            state['bot'] = {'status': bot.mining_status, 'coin': bot.target_coin}
+            state['prices'] = (bot.data or {}).get('crypto_prices') or {}
+            recommendation = getattr(bot, 'recommendation', None)
+            if recommendation:
+                state['recommendation'] = {
+                    key: recommendation.get(key)
+                    for key in ('recommended_coin', 'expected_daily_profit', 'risk_level', 'confidence')
+                }
+                state['recommendation']['market'] = recommendation.get('market_conditions', {}).get('market_sentiment')
+            if bot.rigs is not None:
+                state['fleet'] = bot.rigs.hardware_status()
+                state['rigs'] = {
+                    rig.name: {
+                        'coin': rig.coin,
+                        'hash_rate': rig.hash_rate,
+                        'power': rig.power,
+                        'temperature': round(rig.temperature)
+                    }
+                    for rig in bot.rigs.rigs
+                }
+
+        if self.monitor is not None:
+            latest = self.monitor.latest()
+            if latest:
+                state['system'] = {
+                    key: latest[key]
+                    for key in ('cpu_percent', 'memory_percent', 'process_cpu_percent', 'process_rss_mb',
+                                'net_sent_rate', 'net_recv_rate')
+                }
+
+        state['spans'] = {
+            name: {'count': snapshot.count * snapshot.sample_every, 'p50_ms': snapshot.percentile(50) / 1e6,
+                   'p99_ms': snapshot.percentile(99) / 1e6}
+            for name, snapshot in INSTRUMENTATION.snapshots().items()
+            if name.startswith('bot.')
+        }
+        return state
+
+    def tick(self):
+        """نبضة واحدة: تجميع، حساب الفروق وتسلسلها مرة واحدة، ثم البث"""
+        frame = self.hub.publish(self.collect_state())
+        if frame is not None:
+            self.broadcaster.broadcast(frame)
+        return frame
+
+    def _run(self):
+        next_tick = time.monotonic()
+        while not self._stop_event.wait(max(0.0, next_tick - time.monotonic())):
+            try:
+                self.tick()
+            except Exception as e:
+                self.logger.error("State tick failed: %s", e)
+            next_tick += self.tick_interval
+
+    def start(self):
+        """تشغيل خادم WebSocket ونبضات الحالة في الخلفية"""
+        self.broadcaster.start()
+        self._stop_event.clear()
+        self._thread = threading.Thread(target=self._run, name='api-state-tick')
+        self._thread.daemon = True
+        self._thread.start()
+        self.logger.info("WebSocket broadcaster listening on %s:%s", self.host, self.broadcaster.port)
+        return self
+
+    def stop(self):
+        self._stop_event.set()
+        if self._thread is not None:
+            self._thread.join()
+            self._thread = None
+        self.broadcaster.stop()
+
+    def serve(self):
+        """تشغيل كل شيء وخادم HTTP (يحجب حتى الإيقاف)"""
+        self.start()
+        try:
+            self.app.run(host=self.host, port=self.http_port, threaded=True)
+        finally:
+            self.stop()
+
+
+if __name__ == "__main__":
+    from chart_renderer import ChartRenderer, monitor_panels, profit_panels
+    from data_collector import DataCollector
+    from intelligent_analyzer import IntelligentAnalyzer
+    from mining_bot import MiningBot
+    from mock_services import RigFleet
+    from security_module import SecurityModule
+    from system_monitor import SystemMonitor
+
+    try:
+        with open('config.json', 'r', encoding='utf-8') as f:
+            config = json.load(f)
+    except FileNotFoundError:
+        config = {}
+
+    bot = MiningBot(collector=DataCollector(config), analyzer=IntelligentAnalyzer(config), rigs=RigFleet(100))
+    monitor = SystemMonitor(interval=5.0)
+    monitor.start()
+    renderer = ChartRenderer(monitor_panels(monitor) + profit_panels(bot.analyzer), columns=3)
+    update_interval = config.get('api_settings', {}).get('update_interval', 60)
+
+    def bot_loop():
+        while True:
+            bot.run_cycle()
+            time.sleep(update_interval)
+
+    threading.Thread(target=bot_loop, name='mining-bot', daemon=True).start()
+    ApiServer(bot, monitor, renderer, config, security=SecurityModule(config)).serve()
@@ -0,0 +1,372 @@
+import argparse
+import contextlib
+import gc
+import io
+import json
+import os
+import shutil
+import subprocess
+import tempfile
+import time
+from datetime import datetime
+
+import numpy as np
+
+from instrumentation import Histogram
+
+RESULTS_DIR = os.path.join('benchmarks', 'results')
+
+
+class BenchmarkCase:
+    """حالة قياس: setup يعيد السياق، func تُستدعى بالسياق، teardown لتنظيفه"""
+
+    def __init__(self, name, func, setup=None, teardown=None):
+        self.name = name
+        self.func = func
+        self.setup = setup
+        self.teardown = teardown
+
+
+class BenchmarkRunner:
+    """تشغيل قياسات بإحماء ومعايرة تلقائية لعدد التكرارات ومئينات وفترات ثقة"""
+
+    def __init__(self, warmup_time=0.2, round_time=0.05, rounds=30, max_time=10.0,
+                 bootstrap_samples=1000, seed=1234, call_fraction=0.25):
+        self.warmup_time = warmup_time
+        self.round_time = round_time
+        self.rounds = rounds
+        # نسبة استدعاءات الجولة التي تُعاد مقيسة فرادى للمئينات بعد كل جولة
+        self.call_fraction = call_fraction
+        self.max_time = max_time
+        self.bootstrap_samples = bootstrap_samples
+        self._rng = np.random.default_rng(seed)
+
+    def _loop(self, func, iterations):
+        clock = time.perf_counter_ns
+        start = clock()
+        for _ in range(iterations):
+            func()
+        return clock() - start
+
+    def calibrate(self, func):
+        """إيجاد عدد التكرارات الذي تستغرق جولته round_time تقريباً"""
+        iterations = 1
+        while True:
+            elapsed = self._loop(func, iterations) / 1e9
+            if elapsed >= self.round_time or iterations >= 1 << 24:
+                return iterations
+            if elapsed <= 0:
+                iterations *= 10
+                continue
+            # تقدير مباشر مع حد للنمو حتى لا نتجاوز الهدف كثيراً
+            iterations = max(iterations + 1, min(iterations * 10, int(iterations * self.round_time / elapsed)))
+
+    def _timed_loop(self, func, iterations, histogram):
+        """جولة يُقاس فيها كل استدعاء على حدة ويُسجل في المدرج (للمئينات فقط)"""
+        clock = time.perf_counter_ns
+        record = histogram.record
+        for _ in range(iterations):
+            start = clock()
+            func()
+            record(clock() - start)
+
+    def measure(self, func):
+        """إرجاع متوسط زمن الاستدعاء (ثوان) لكل جولة ومدرج أزمنة الاستدعاءات المفردة
+
+        متوسط الجولة من توقيت الدفعة كاملة مرة واحدة، لأن قراءة الساعة لكل
+        استدعاء تضيف كلفتها إلى كل عينة وتزيح فترات الثقة؛ الأزمنة المفردة
+        تُجمع في جزء إضافي بعد كل جولة ولا تدخل إلا في المئينات.
+        """
+        deadline = time.perf_counter() + self.warmup_time
+        while time.perf_counter() < deadline:
+            func()
+
+        iterations = self.calibrate(func)
+        call_iterations = max(1, int(iterations * self.call_fraction))
+        samples = []
+        histogram = Histogram('benchmark')
+        gc_was_enabled = gc.isenabled()
+        gc.disable()
+        started = time.perf_counter()
+        try:
+            for _ in range(self.rounds):
+                samples.append(self._loop(func, iterations) / iterations / 1e9)
+                self._timed_loop(func, call_iterations, histogram)
+                if time.perf_counter() - started > self.max_time and len(samples) >= 5:
+                    break
+        finally:
+            if gc_was_enabled:
+                gc.enable()
+        return samples, iterations, histogram.snapshot()
+
+    def summarize(self, samples, iterations, calls):
+        """المتوسط مع فترة ثقة 95% (bootstrap) من الجولات، والمئينات من الاستدعاءات المفردة
+
+        متوسطات الجولات تخفي الذيل، لذلك تُحسب المئينات والحدود من مدرج كل
+        الاستدعاءات (خطأ نسبي أقل من 6.25%).
+        """
+        data = np.asarray(samples, dtype=float)
+        means = self._rng.choice(data, size=(self.bootstrap_samples, len(data)), replace=True).mean(axis=1)
+        ci_low, ci_high = np.percentile(means, [2.5, 97.5])
+        return {
+            'rounds': len(data),
+            'iterations_per_round': iterations,
+            'mean': float(data.mean()),
+            'std_deviation': float(data.std(ddof=1)) if len(data) > 1 else 0.0,
+            'calls': calls.count,
+            'minimum': calls.minimum / 1e9,
+            'maximum': calls.maximum / 1e9,
+            'p50': calls.percentile(50) / 1e9,
+            'p95': calls.percentile(95) / 1e9,
+            'p99': calls.percentile(99) / 1e9,
+            'ci95': [float(ci_low), float(ci_high)],
+            'ops_per_second': 1.0 / float(data.mean()) if data.mean() > 0 else 0.0
+        }
+
+    def run(self, func):
+        return self.summarize(*self.measure(func))
+
+    def run_case(self, case):
+        context = case.setup() if case.setup else None
+        try:
+            func = (lambda: case.func(context)) if case.setup else case.func
+            return self.run(func)
+        finally:
+            if case.teardown:
+                case.teardown(context)
+
+
+def current_commit():
+    """معرف الإيداع الحالي في git مع علامة إذا كانت الشجرة معدلة"""
+    try:
+        commit = subprocess.run(
+            ['git', 'rev-parse', '--short', 'HEAD'], capture_output=True, text=True, check=True
+        ).stdout.strip()
+        dirty = subprocess.run(
+            ['git', 'status', '--porcelain', '--untracked-files=no'], capture_output=True, text=True, check=True
+        ).stdout.strip()
+        return commit + ('-dirty' if dirty else '')
+    except (OSError, subprocess.CalledProcessError):
+        return 'unknown'
+
+
+def save_results(results, commit=None, results_dir=RESULTS_DIR):
+    """حفظ النتائج في ملف خاص بالإيداع"""
+    commit = commit or current_commit()
+    os.makedirs(results_dir, exist_ok=True)
+    path = os.path.join(results_dir, f'{commit}.json')
+    with open(path, 'w', encoding='utf-8') as f:
+        json.dump({
+            'commit': commit,
+            'timestamp': datetime.now().isoformat(),
+            'results': results
+        }, f, ensure_ascii=False, indent=2)
+    return path
+
+
+def load_results(commit=None, results_dir=RESULTS_DIR, exclude=None):
+    """تحميل نتائج إيداع محدد، أو أحدث نتائج محفوظة عند عدم التحديد"""
+    if commit:
+        path = os.path.join(results_dir, f'{commit}.json')
+        if not os.path.exists(path):
+            return None
+    else:
+        if not os.path.isdir(results_dir):
+            return None
+        candidates = [
+            os.path.join(results_dir, name) for name in os.listdir(results_dir)
+            if name.endswith('.json') and name[:-5] != exclude
+        ]
+        if not candidates:
+            return None
+        path = max(candidates, key=os.path.getmtime)
+    with open(path, 'r', encoding='utf-8') as f:
+        return json.load(f)
+
+
+def detect_regressions(current, baseline, tolerance=0.10):
+    """مقارنة المتوسطات: تراجع إذا زاد الزمن أكثر من التسامح ولم تتداخل فترات الثقة"""
+    regressions = []
+    for name, stats in current.items():
+        previous = baseline.get(name)
+        if not previous or not previous.get('mean'):
+            continue
+        ratio = stats['mean'] / previous['mean']
+        intervals_overlap = stats['ci95'][0] <= previous['ci95'][1]
+        if ratio > 1 + tolerance and not intervals_overlap:
+            regressions.append({
+                'benchmark': name,
+                'baseline_mean': previous['mean'],
+                'current_mean': stats['mean'],
+                'slowdown_percent': (ratio - 1) * 100
+            })
+    return regressions
+
+
+def _silenced(func):
+    """إسكات print داخل الوحدات المقاسة حتى لا تقيس الطرفية بدلاً من الكود"""
+    def wrapper(*args):
+        with contextlib.redirect_stdout(io.StringIO()):
+            return func(*args)
+    return wrapper
+
+
+def default_cases():
+    """حالات القياس: المحلل، جامع البيانات مقابل خادم محلي، وحدة الأمان، والمجدول"""
+    from data_collector import DataCollector
+    from intelligent_analyzer import IntelligentAnalyzer
+    from mock_services import MockPriceServer
+    from pool_ledger import PoolLedger
+    from price_sources import BinanceSource, CoinCapSource, CoinGeckoSource, PriceAggregator
+    from security_module import SecurityModule
+    from session_store import TimingWheel
+
+    analyzer_data = {
+        'crypto_prices': {
+            'bitcoin': {'usd': 60000, 'usd_24h_change': 2.5},
+            'ethereum': {'usd': 3000, 'usd_24h_change': -1.2}
+        },
+        'energy_costs': {'cost_per_kwh': 0.12},
+        'hardware_status': {'power_consumption': 250}
+    }
+
+    def collector_setup():
+        server = MockPriceServer().start()
+        collector = DataCollector()
+        collector.crypto_api_url = server.url
+        return server, collector
+
+    def aggregator_setup():
+        # ثلاثة مزودين محليين أحدهم بطيء متقطع: يقيس كلفة التحوط والنصاب ورفض الشاذ
+        servers = [
+            MockPriceServer(seed=1).start(),
+            MockPriceServer(latency=0.05, error_rate=0.2, seed=2).start(),
+            MockPriceServer(bias=0.05, seed=3).start()
+        ]
+        aggregator = PriceAggregator([
+            CoinGeckoSource(servers[0].url),
+            BinanceSource(servers[1].binance_url),
+            CoinCapSource(servers[2].coincap_url)
+        ], quorum=2, hedge_delay=0.01)
+        return servers, aggregator
+
+    def aggregator_teardown(context):
+        context[1].close()
+        for server in context[0]:
+            server.stop()
+
+    def ledger_setup():
+        workdir = tempfile.mkdtemp(prefix='bench_ledger_')
+        ledger = PoolLedger(os.path.join(workdir, 'ledger.db'), flush_interval=3600)
+        return {'ledger': ledger, 'counter': 0, 'workdir': workdir}
+
+    def ledger_teardown(state):
+        state['ledger'].close()
+        shutil.rmtree(state['workdir'], ignore_errors=True)
+
+    def ledger_ingest(state):
+        # الإلحاق بالدفعة مع الكتابة الدورية بـ executemany (تكلفة مستهلكة لكل حصة)
+        state['counter'] += 1
+        state['ledger'].add_share('BTC', f"rig-{state['counter'] % 1000}", 65536.0)
+
+    def security_setup():
+        # ملف مفتاح مؤقت حتى لا تلمس ملفات المفاتيح الحقيقية؛ السجل يبقى في مساره المعتاد
+        workdir = tempfile.mkdtemp(prefix='bench_security_')
+        security = SecurityModule({'security': {'key_file': os.path.join(workdir, 'encryption.key')}})
+        api_key = security.generate_api_key('bench_user')
+        token = security.generate_session_token('bench_user')
+        encrypted = security.encrypt_sensitive_data('benchmark payload')
+        return security, api_key, token, encrypted, workdir
+
+    def security_teardown(context):
+        shutil.rmtree(context[4], ignore_errors=True)
+
+    def wheel_setup():
+        now = time.time()
+        return {'wheel': TimingWheel(start=now), 'now': now, 'counter': 0}
+
+    def wheel_churn(state):
+        # إضافة مفتاح وإزالة آخر وتقدم العجلة نقرة كل 64 عملية
+        state['counter'] += 1
+        counter = state['counter']
+        state['wheel'].add(counter, state['now'] + 3600)
+        state['wheel'].remove(counter - 32)
+        if counter % 64 == 0:
+            state['now'] += 1
+            state['wheel'].advance(state['now'])
+
+    analyzer = IntelligentAnalyzer()
+    return [
+        BenchmarkCase('analyzer.recommend_mining_strategy',
+                      _silenced(lambda: analyzer.recommend_mining_strategy(analyzer_data))),
+        BenchmarkCase('analyzer.calculate_profitability',
+                      lambda: analyzer.calculate_profitability('BTC', analyzer_data['hardware_status'], 0.12)),
+        BenchmarkCase('collector.collect_all_data',
+                      _silenced(lambda context: context[1].collect_all_data()),
+                      setup=collector_setup, teardown=lambda context: context[0].stop()),
+        BenchmarkCase('collector.price_aggregation',
+                      lambda context: context[1].fetch(['bitcoin', 'ethereum']),
+                      setup=aggregator_setup, teardown=aggregator_teardown),
+        BenchmarkCase('security.validate_api_key',
+                      lambda context: context[0].validate_api_key('bench_user', context[1]),
+                      setup=security_setup, teardown=security_teardown),
+        BenchmarkCase('security.validate_session_token',
+                      lambda context: context[0].validate_session_token(context[2]),
+                      setup=security_setup, teardown=security_teardown),
+        BenchmarkCase('security.decrypt_sensitive_data',
+                      lambda context: context[0].decrypt_sensitive_data(context[3]),
+                      setup=security_setup, teardown=security_teardown),
+        BenchmarkCase('scheduler.timing_wheel_churn', wheel_churn, setup=wheel_setup),
+        BenchmarkCase('ledger.add_share', ledger_ingest, setup=ledger_setup, teardown=ledger_teardown),
+    ]
+
+
+def run_suite(cases=None, runner=None, baseline=None, tolerance=0.10, save=True):
+    """تشغيل كل الحالات وحفظ النتائج ومقارنتها بخط الأساس"""
+    runner = runner or BenchmarkRunner()
+    cases = cases if cases is not None else default_cases()
+    commit = current_commit()
+
+    results = {}
+    for case in cases:
+        results[case.name] = runner.run_case(case)
+
+    previous = load_results(baseline, exclude=commit)
+    regressions = detect_regressions(results, previous['results'], tolerance) if previous else []
+    path = save_results(results, commit) if save else None
+
+    return {
+        'commit': commit,
+        'baseline_commit': previous['commit'] if previous else None,
+        'results': results,
+        'regressions': regressions,
+        'results_file': path
+    }
+
+
+def _format_seconds(value):
+    for unit, scale in (('s', 1), ('ms', 1e-3), ('us', 1e-6)):
+        if value >= scale:
+            return f"{value / scale:.2f}{unit}"
+    return f"{value / 1e-9:.0f}ns"
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Smart mining bot benchmark suite")
+    parser.add_argument('--baseline', help="commit to compare against (default: latest stored run)")
+    parser.add_argument('--tolerance', type=float, default=0.10, help="allowed slowdown before flagging (0.10 = 10%%)")
+    parser.add_argument('--quick', action='store_true', help="fewer rounds for a fast smoke run")
+    parser.add_argument('--no-save', action='store_true', help="do not store results for this commit")
+    args = parser.parse_args()
+
+    runner = BenchmarkRunner(rounds=10, warmup_time=0.05) if args.quick else BenchmarkRunner()
+    report = run_suite(runner=runner, baseline=args.baseline, tolerance=args.tolerance, save=not args.no_save)
+
+    print(f"Commit: {report['commit']}  Baseline: {report['baseline_commit']}")
+    for name, stats in report['results'].items():
+        print(f"{name:40s} p50={_format_seconds(stats['p50']):>9s} p95={_format_seconds(stats['p95']):>9s} "
+              f"p99={_format_seconds(stats['p99']):>9s} ci95=[{_format_seconds(stats['ci95'][0])}, "
+              f"{_format_seconds(stats['ci95'][1])}]")
+    for regression in report['regressions']:
+        print(f"REGRESSION {regression['benchmark']}: +{regression['slowdown_percent']:.1f}%")
+    raise SystemExit(1 if report['regressions'] else 0)
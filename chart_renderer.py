@@ -0,0 +1,251 @@
+import json
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+from matplotlib import dates
+from matplotlib.backends.backend_agg import FigureCanvasAgg
+from matplotlib.figure import Figure
+
+
+class MinMaxAccumulator:
+    """تجميع تزايدي min/max لكل دلو زمني؛ لا يعالج إلا النقاط الجديدة
+
+    عندما يتجاوز عدد الدلاء max_buckets يتضاعف عرض الدلو ويُدمج كل دلوين متجاورين،
+    فتبقى تكلفة الرسم ثابتة مهما طالت السلسلة.
+    """
+
+    def __init__(self, max_buckets=1000, bucket_seconds=1.0):
+        self.max_buckets = max_buckets
+        self.bucket_seconds = bucket_seconds
+        self.last_timestamp = -np.inf
+        self._ids = np.empty(0, dtype=np.int64)
+        self._min_t = np.empty(0)
+        self._min_v = np.empty(0)
+        self._max_t = np.empty(0)
+        self._max_v = np.empty(0)
+
+    def __len__(self):
+        return len(self._ids)
+
+    def add(self, timestamps, values):
+        """إضافة النقاط الأحدث من آخر نقطة معالجة فقط"""
+        timestamps = np.asarray(timestamps, dtype=np.float64)
+        values = np.asarray(values, dtype=np.float64)
+        start = np.searchsorted(timestamps, self.last_timestamp, side='right')
+        timestamps, values = timestamps[start:], values[start:]
+        valid = ~np.isnan(values)
+        timestamps, values = timestamps[valid], values[valid]
+        if not len(timestamps):
+            return 0
+
+        if not len(self._ids) and timestamps[-1] - timestamps[0] > self.bucket_seconds * self.max_buckets:
+            # تحميل أولي لسلسلة طويلة: نبدأ بعرض دلو يناسبها بدلاً من التضاعف المتكرر
+            self.bucket_seconds = (timestamps[-1] - timestamps[0]) / self.max_buckets * 1.01
+        self.last_timestamp = timestamps[-1]
+        ids = np.floor(timestamps / self.bucket_seconds).astype(np.int64)
+        boundaries = np.flatnonzero(np.diff(ids)) + 1
+        starts = np.concatenate(([0], boundaries))
+        ends = np.concatenate((boundaries, [len(ids)]))
+
+        new_ids, min_t, min_v, max_t, max_v = [], [], [], [], []
+        for begin, end in zip(starts, ends):
+            chunk = values[begin:end]
+            low = begin + int(np.argmin(chunk))
+            high = begin + int(np.argmax(chunk))
+            new_ids.append(ids[begin])
+            min_t.append(timestamps[low])
+            min_v.append(values[low])
+            max_t.append(timestamps[high])
+            max_v.append(values[high])
+
+        # الدلو الأول قد يكمل الدلو الأخير الحالي
+        if len(self._ids) and new_ids[0] == self._ids[-1]:
+            if min_v[0] < self._min_v[-1]:
+                self._min_t[-1], self._min_v[-1] = min_t[0], min_v[0]
+            if max_v[0] > self._max_v[-1]:
+                self._max_t[-1], self._max_v[-1] = max_t[0], max_v[0]
+            new_ids, min_t, min_v, max_t, max_v = new_ids[1:], min_t[1:], min_v[1:], max_t[1:], max_v[1:]
+
+        if new_ids:
+            self._ids = np.concatenate((self._ids, new_ids))
+            self._min_t = np.concatenate((self._min_t, min_t))
+            self._min_v = np.concatenate((self._min_v, min_v))
+            self._max_t = np.concatenate((self._max_t, max_t))
+            self._max_v = np.concatenate((self._max_v, max_v))
+
+        while len(self._ids) > self.max_buckets:
+            self._coarsen()
+        return len(timestamps)
+
+    def _coarsen(self):
+        """مضاعفة عرض الدلو ودمج الدلاء التي تقع في نفس الدلو الجديد"""
+        self.bucket_seconds *= 2
+        ids = self._ids // 2
+        starts = np.concatenate(([0], np.flatnonzero(np.diff(ids)) + 1))
+        low = np.minimum.reduceat(self._min_v, starts)
+        high = np.maximum.reduceat(self._max_v, starts)
+        # موضع القيمة المختارة داخل كل مجموعة (مجموعات من دلو أو دلوين)
+        low_pick = self._pick(self._min_v, low, starts)
+        high_pick = self._pick(self._max_v, high, starts)
+        self._ids = ids[starts]
+        self._min_t, self._min_v = self._min_t[low_pick], low
+        self._max_t, self._max_v = self._max_t[high_pick], high
+
+    @staticmethod
+    def _pick(values, reduced, starts):
+        groups = np.repeat(np.arange(len(starts)), np.diff(np.concatenate((starts, [len(values)]))))
+        matches = np.flatnonzero(values == reduced[groups])
+        # أول تطابق في كل مجموعة
+        first = np.unique(groups[matches], return_index=True)[1]
+        return matches[first]
+
+    def points(self, since=None):
+        """نقاط الرسم (الأدنى والأعلى لكل دلو) مرتبة زمنياً"""
+        timestamps = np.column_stack((self._min_t, self._max_t))
+        values = np.column_stack((self._min_v, self._max_v))
+        swap = self._min_t > self._max_t
+        timestamps[swap] = timestamps[swap][:, ::-1]
+        values[swap] = values[swap][:, ::-1]
+        timestamps, values = timestamps.ravel(), values.ravel()
+        if since is not None:
+            start = np.searchsorted(timestamps, since, side='right')
+            timestamps, values = timestamps[start:], values[start:]
+        return timestamps, values
+
+
+class ChartPanel:
+    """لوحة واحدة: عنوان ووحدة وخطوط؛ كل خط دالة (since) تعيد (الطوابع، القيم) الأحدث من since"""
+
+    def __init__(self, name, title, unit, lines, max_buckets=1000):
+        self.name = name
+        self.title = title
+        self.unit = unit
+        self.lines = dict(lines)
+        self.accumulators = {label: MinMaxAccumulator(max_buckets) for label in self.lines}
+
+    def update(self):
+        """سحب النقاط الجديدة فقط من كل مصدر"""
+        added = 0
+        for label, source in self.lines.items():
+            accumulator = self.accumulators[label]
+            timestamps, values = source(accumulator.last_timestamp)
+            added += accumulator.add(timestamps, values)
+        return added
+
+
+def monitor_panels(monitor, resolution=None, max_buckets=1000):
+    """لوحات الأداء القياسية من SystemMonitor (نسخ النقاط الجديدة فقط)"""
+    def source(*names):
+        def read(since):
+            # الرسم في خيط منفصل عن أخذ العينات، فتُنسخ النقاط الجديدة تحت قفل المراقب
+            timestamps, columns = monitor.read_since(names, since, resolution)
+            values = columns[0]
+            for column in columns[1:]:
+                values = values + column
+            return timestamps, values
+        return read
+
+    return [
+        ChartPanel('cpu', 'CPU Usage (%)', 'Usage %', {'cpu': source('cpu_percent')}, max_buckets),
+        ChartPanel('memory', 'Memory Usage (%)', 'Usage %', {'memory': source('memory_percent')}, max_buckets),
+        ChartPanel('network', 'Network I/O (bytes/sec)', 'Bytes/sec',
+                   {'network': source('net_sent_rate', 'net_recv_rate')}, max_buckets),
+        ChartPanel('disk', 'Disk I/O (bytes/sec)', 'Bytes/sec',
+                   {'disk': source('disk_read_rate', 'disk_write_rate')}, max_buckets)
+    ]
+
+
+def profit_panels(analyzer, max_buckets=1000):
+    """لوحة الربح المتوقع من سجل توصيات المحلل"""
+    history = analyzer.profit_history
+
+    def read(since):
+        timestamps, (profit,) = history.read_since(('expected_daily_profit',), since)
+        return timestamps, profit
+
+    return [ChartPanel('profit', 'Expected Daily Profit (USD)', 'USD/day', {'profit': read}, max_buckets)]
+
+
+class ChartRenderer:
+    """رسم تزايدي في خيط خلفي: الشكل والمحاور والخطوط تُنشأ مرة واحدة وتُحدّث بياناتها فقط"""
+
+    def __init__(self, panels, figsize=(15, 10), dpi=100, columns=2, title='Mining Bot Performance Analysis'):
+        self.panels = list(panels)
+        self.dpi = dpi
+        self._executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix='chart-renderer')
+        # قفل الشكل: يُمسك طوال update و savefig داخل خيط الرسم فقط
+        self._lock = threading.Lock()
+        # قفل صغير للطلب المعلّق لا يُمسك أثناء الرسم، فيبقى render_async غير حاجب
+        self._pending_lock = threading.Lock()
+        self._pending = None
+
+        rows = -(-len(self.panels) // columns)
+        # Figure مباشرة بدلاً من pyplot: بلا حالة عامة وآمن للاستخدام من خيط خلفي
+        self.figure = Figure(figsize=figsize, dpi=dpi)
+        FigureCanvasAgg(self.figure)
+        self.figure.suptitle(title, fontsize=16)
+        self._lines = {}
+        for index, panel in enumerate(self.panels):
+            axis = self.figure.add_subplot(rows, columns, index + 1)
+            axis.set_title(panel.title)
+            axis.set_ylabel(panel.unit)
+            axis.grid(True, alpha=0.3)
+            axis.tick_params(axis='x', rotation=45)
+            axis.xaxis_date()
+            for label in panel.lines:
+                self._lines[(panel.name, label)] = (axis, axis.plot([], [], linewidth=1.5)[0])
+        self.figure.tight_layout()
+
+    def update(self):
+        """تحديث بيانات الخطوط بالنقاط الجديدة فقط؛ يعيد عدد النقاط المضافة"""
+        added = 0
+        for panel in self.panels:
+            added += panel.update()
+            for label, accumulator in panel.accumulators.items():
+                axis, line = self._lines[(panel.name, label)]
+                timestamps, values = accumulator.points()
+                line.set_data(dates.date2num((timestamps * 1e6).astype('datetime64[us]')), values)
+                axis.relim()
+                axis.autoscale_view()
+        return added
+
+    def render(self, filename):
+        """تحديث ثم حفظ الصورة (متزامن)"""
+        with self._lock:
+            self.update()
+            self.figure.savefig(filename, dpi=self.dpi, bbox_inches='tight')
+        return filename
+
+    def render_async(self, filename):
+        """طلب رسم في الخلفية؛ الطلبات المتراكمة تُدمج في رسم واحد"""
+        with self._pending_lock:
+            if self._pending is not None and not self._pending.done():
+                return self._pending
+            self._pending = self._executor.submit(self.render, filename)
+            return self._pending
+
+    def series(self, since=None, precision=4):
+        """سلاسل مضغوطة لرسمها في الواجهة: طابع أساسي وفروق زمنية بالثواني وقيم مقربة"""
+        with self._lock:
+            for panel in self.panels:
+                panel.update()
+            result = {'panels': []}
+            for panel in self.panels:
+                lines = {}
+                for label, accumulator in panel.accumulators.items():
+                    timestamps, values = accumulator.points(since)
+                    base = float(timestamps[0]) if len(timestamps) else 0.0
+                    lines[label] = {
+                        't0': base,
+                        'dt': np.round(timestamps - base, 3).tolist(),
+                        'v': np.round(values, precision).tolist()
+                    }
+                result['panels'].append({'name': panel.name, 'title': panel.title, 'unit': panel.unit, 'lines': lines})
+            return result
+
+    def to_json(self, since=None):
+        return json.dumps(self.series(since), separators=(',', ':'))
+
+    def close(self):
+        self._executor.shutdown(wait=True)
@@ -0,0 +1,338 @@
+import math
+import mmap
+import os
+import struct
+import threading
+import time
+import zlib
+
+import numpy as np
+
+from log_pipeline import get_logger
+
+MAGIC = b'SMCK'
+FORMAT_VERSION = 1
+# الترويسة: السحر، الإصدار، عدد الأقسام، رقم الجيل، وقت الكتابة
+HEADER = struct.Struct('<4sHHQd')
+# جدول الأقسام: الاسم، الإزاحة، الطول، CRC32
+NAME_SIZE = 16
+ENTRY = struct.Struct(f'<{NAME_SIZE}sQQI')
+ALIGNMENT = 8
+
+_U32 = struct.Struct('<I')
+_U64 = struct.Struct('<Q')
+_F64 = struct.Struct('<d')
+
+_TAG_NONE, _TAG_STR, _TAG_INT, _TAG_FLOAT = range(4)
+
+
+class CheckpointError(Exception):
+    """ملف نقطة الحفظ تالف أو بصيغة غير معروفة"""
+
+
+class BinaryWriter:
+    """كاتب ثنائي مضغوط لأقسام نقطة الحفظ"""
+
+    def __init__(self):
+        self._buffer = bytearray()
+
+    def u32(self, value):
+        self._buffer += _U32.pack(value)
+
+    def u64(self, value):
+        self._buffer += _U64.pack(value)
+
+    def f64(self, value):
+        self._buffer += _F64.pack(math.nan if value is None else value)
+
+    def blob(self, data):
+        self._buffer += _U32.pack(len(data))
+        self._buffer += data
+
+    def text(self, value):
+        self.blob(value.encode('utf-8'))
+
+    def value(self, value):
+        """قيمة عددية أو نصية مع وسم النوع (للمعرفات التي قد تكون أرقاماً)"""
+        if value is None:
+            self._buffer.append(_TAG_NONE)
+        elif isinstance(value, str):
+            self._buffer.append(_TAG_STR)
+            self.text(value)
+        elif isinstance(value, int):
+            self._buffer.append(_TAG_INT)
+            self.text(str(value))
+        else:
+            self._buffer.append(_TAG_FLOAT)
+            self.f64(float(value))
+
+    def array(self, array):
+        """مصفوفة numpy ثنائية الأبعاد من float64 كبايتات خام"""
+        array = np.ascontiguousarray(array, dtype=np.float64)
+        self.u32(array.shape[0])
+        self.u32(array.shape[1] if array.ndim > 1 else 1)
+        self._buffer += array.tobytes()
+
+    def getvalue(self):
+        return bytes(self._buffer)
+
+
+class BinaryReader:
+    """قارئ فوق memoryview (غالباً على mmap) بدون نسخ حتى فك القيم"""
+
+    def __init__(self, data):
+        self._view = memoryview(data)
+        self._offset = 0
+
+    def _take(self, size):
+        end = self._offset + size
+        if end > len(self._view):
+            raise CheckpointError("Truncated checkpoint section")
+        chunk = self._view[self._offset:end]
+        self._offset = end
+        return chunk
+
+    def u32(self):
+        return _U32.unpack(self._take(4))[0]
+
+    def u64(self):
+        return _U64.unpack(self._take(8))[0]
+
+    def f64(self):
+        return _F64.unpack(self._take(8))[0]
+
+    def optional_f64(self):
+        value = self.f64()
+        return None if math.isnan(value) else value
+
+    def blob(self):
+        return bytes(self._take(self.u32()))
+
+    def text(self):
+        return self.blob().decode('utf-8')
+
+    def value(self):
+        tag = self._take(1)[0]
+        if tag == _TAG_NONE:
+            return None
+        if tag == _TAG_STR:
+            return self.text()
+        if tag == _TAG_INT:
+            return int(self.text())
+        if tag == _TAG_FLOAT:
+            return self.f64()
+        raise CheckpointError(f"Unknown value tag: {tag}")
+
+    def array(self):
+        rows, columns = self.u32(), self.u32()
+        raw = self._take(rows * columns * 8)
+        # نسخة لأن الذاكرة المعينة تُغلق بعد الاستعادة
+        return np.frombuffer(raw, dtype=np.float64).reshape(rows, columns).copy()
+
+
+def read_sections(view):
+    """تحليل الترويسة والجدول وإرجاع {الاسم: memoryview} بعد التحقق من CRC"""
+    if len(view) < HEADER.size:
+        raise CheckpointError("Checkpoint too short")
+    magic, version, count, generation, created = HEADER.unpack_from(view, 0)
+    if magic != MAGIC or version != FORMAT_VERSION:
+        raise CheckpointError("Unknown checkpoint format")
+
+    if HEADER.size + count * ENTRY.size > len(view):
+        raise CheckpointError("Section table truncated")
+
+    entries = []
+    for index in range(count):
+        name, offset, length, crc = ENTRY.unpack_from(view, HEADER.size + index * ENTRY.size)
+        try:
+            name = name.rstrip(b'\0').decode('ascii')
+        except UnicodeDecodeError:
+            raise CheckpointError("Invalid section name") from None
+        if offset + length > len(view):
+            raise CheckpointError("Section out of bounds")
+        # التحقق أولاً بدون الاحتفاظ بشرائح، حتى لا يبقي الاستثناء الذاكرة المعينة مصدّرة
+        if zlib.crc32(view[offset:offset + length]) != crc:
+            raise CheckpointError(f"Checksum mismatch in section {name}")
+        entries.append((name, offset, length, crc))
+
+    sections = {name: (view[offset:offset + length], crc) for name, offset, length, crc in entries}
+    return generation, created, sections
+
+
+class Checkpointer:
+    """نقاط حفظ تزايدية وذرية لحالة البوت في ملف ثنائي مقسم
+
+    كل هدف مسجل يوفر export_state() و import_state(data) و state_version.
+    الأقسام التي لم يتغير إصدارها لا يُعاد تسلسلها بل تُنسخ بايتاتها كما هي من
+    الملف السابق (عبر mmap)، والملف الجديد يُكتب مؤقتاً ثم يستبدل القديم بـ rename.
+    """
+
+    def __init__(self, path=None, interval=None, config=None):
+        settings = (config or {}).get('checkpoint', {})
+        self.path = path or settings.get('path', 'bot_state.ckpt')
+        self.interval = interval or settings.get('interval', 30.0)
+        self.generation = 0
+        self._targets = {}
+        self._versions = {}
+        self._lock = threading.Lock()
+        self._stop_event = threading.Event()
+        self._thread = None
+        self.logger = get_logger(__name__, 'checkpoint.log', config)
+
+    def register(self, name, target):
+        if len(name.encode('ascii')) > NAME_SIZE:
+            raise ValueError(f"Section name too long: {name}")
+        self._targets[name] = target
+
+    def restore(self):
+        """استعادة الأقسام المسجلة من الملف عبر mmap وإرجاع أسماء المستعادة"""
+        if not os.path.exists(self.path) or not os.path.getsize(self.path):
+            return []
+
+        restored = []
+        started = time.perf_counter()
+        with self._lock, open(self.path, 'rb') as f, mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mapped:
+            view = memoryview(mapped)
+            try:
+                self.generation, _, sections = read_sections(view)
+                for name, target in self._targets.items():
+                    entry = sections.get(name)
+                    if entry is None:
+                        continue
+                    try:
+                        target.import_state(entry[0])
+                    except (CheckpointError, ValueError, KeyError) as e:
+                        # نمرر النص فقط: الاستثناء نفسه يبقي إطارات تشير إلى الذاكرة المعينة
+                        self.logger.warning("Could not restore section %s: %s", name, str(e))
+                        continue
+                    self._versions[name] = target.state_version
+                    restored.append(name)
+            except CheckpointError as e:
+                self.logger.warning("Ignoring unreadable checkpoint %s: %s", self.path, str(e))
+                restored = []
+            finally:
+                sections = entry = None
+                view.release()
+
+        self.logger.info("Restored %s from %s in %.2fms", restored, self.path,
+                         (time.perf_counter() - started) * 1000)
+        return restored
+
+    def save(self, force=False):
+        """كتابة نقطة حفظ إذا تغير أي قسم؛ يعيد أسماء الأقسام المعاد تسلسلها"""
+        with self._lock:
+            versions = {name: target.state_version for name, target in self._targets.items()}
+            previous = self._open_previous()
+            view, old_sections, mapped = previous or (None, {}, None)
+            previous = None
+            try:
+                changed = [
+                    name for name in self._targets
+                    if force or versions[name] is None or name not in old_sections
+                    or versions[name] != self._versions.get(name)
+                ]
+                if not changed:
+                    return []
+
+                payloads = []
+                for name in self._targets:
+                    if name in changed:
+                        data = self._targets[name].export_state()
+                        payloads.append((name, data, zlib.crc32(data)))
+                    else:
+                        data, crc = old_sections[name]
+                        payloads.append((name, data, crc))
+                self._write(payloads)
+            finally:
+                # إسقاط كل الشرائح قبل إغلاق الذاكرة المعينة
+                old_sections = payloads = data = None
+                if mapped is not None:
+                    view.release()
+                    mapped.close()
+
+            self._versions.update(versions)
+            return changed
+
+    def _open_previous(self):
+        try:
+            f = open(self.path, 'rb')
+        except FileNotFoundError:
+            return None
+        with f:
+            if not os.fstat(f.fileno()).st_size:
+                return None
+            mapped = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        view = memoryview(mapped)
+        try:
+            return view, read_sections(view)[2], mapped
+        except CheckpointError:
+            view.release()
+            mapped.close()
+            return None
+
+    def _write(self, payloads):
+        self.generation += 1
+        table_end = HEADER.size + ENTRY.size * len(payloads)
+        offset = -(-table_end // ALIGNMENT) * ALIGNMENT
+        entries = []
+        for name, data, crc in payloads:
+            entries.append(ENTRY.pack(name.encode('ascii'), offset, len(data), crc))
+            offset += -(-len(data) // ALIGNMENT) * ALIGNMENT
+
+        temp_path = f"{self.path}.tmp"
+        # الملف يحوي بصمات الجلسات والمفاتيح فنقصر صلاحياته على المالك
+        fd = os.open(temp_path, os.O_WRONLY | os.O_CREAT | os.O_TRUNC, 0o600)
+        try:
+            with os.fdopen(fd, 'wb') as f:
+                f.write(HEADER.pack(MAGIC, FORMAT_VERSION, len(payloads), self.generation, time.time()))
+                f.write(b''.join(entries))
+                position = table_end
+                for _, data, _ in payloads:
+                    padding = -position % ALIGNMENT
+                    f.write(b'\0' * padding)
+                    f.write(data)
+                    position += padding + len(data)
+                f.flush()
+                os.fsync(f.fileno())
+            os.replace(temp_path, self.path)
+        except BaseException:
+            if os.path.exists(temp_path):
+                os.remove(temp_path)
+            raise
+
+        directory = os.path.dirname(os.path.abspath(self.path))
+        try:
+            dir_fd = os.open(directory, os.O_RDONLY)
+        except OSError:
+            return
+        try:
+            os.fsync(dir_fd)
+        except OSError:
+            pass
+        finally:
+            os.close(dir_fd)
+
+    def start(self):
+        """حفظ دوري في الخلفية"""
+        if self._thread is not None:
+            return self._thread
+        self._stop_event.clear()
+        self._thread = threading.Thread(target=self._run, name='checkpointer')
+        self._thread.daemon = True
+        self._thread.start()
+        return self._thread
+
+    def _run(self):
+        while not self._stop_event.wait(self.interval):
+            try:
+                self.save()
+            except (OSError, CheckpointError) as e:
+                self.logger.error("Checkpoint failed: %s", e)
+
+    def stop(self):
+        """إيقاف الحفظ الدوري مع حفظ أخير"""
+        self._stop_event.set()
+        if self._thread is not None:
+            self._thread.join()
+            self._thread = None
+        self.save()
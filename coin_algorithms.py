@@ -0,0 +1,368 @@
+import hashlib
+import json
+import os
+import platform
+import re
+import struct
+import sys
+import time
+
+from log_pipeline import get_logger
+
+# كل معدلات الهاش داخلياً بوحدة H/s
+HASHRATE_UNITS = {
+    'h/s': 1.0,
+    'kh/s': 1e3,
+    'mh/s': 1e6,
+    'gh/s': 1e9,
+    'th/s': 1e12,
+    'ph/s': 1e15,
+    'eh/s': 1e18
+}
+
+_HASHRATE_RE = re.compile(r'\s*([0-9]*\.?[0-9]+(?:[eE][-+]?[0-9]+)?)\s*([kmgtpe]?h/s)?\s*\Z', re.IGNORECASE)
+
+
+def parse_hashrate(value):
+    """تحويل "50 MH/s" أو رقم (H/s) إلى H/s؛ None إذا تعذر الفهم"""
+    if isinstance(value, (int, float)):
+        return float(value)
+    if not isinstance(value, str):
+        return None
+    match = _HASHRATE_RE.match(value)
+    if match is None:
+        return None
+    return float(match.group(1)) * HASHRATE_UNITS[(match.group(2) or 'h/s').lower()]
+
+
+def format_hashrate(hashes_per_second):
+    """عرض معدل الهاش بأنسب وحدة"""
+    for unit in ('EH/s', 'PH/s', 'TH/s', 'GH/s', 'MH/s', 'KH/s'):
+        scale = HASHRATE_UNITS[unit.lower()]
+        if hashes_per_second >= scale:
+            return f"{hashes_per_second / scale:.2f} {unit}"
+    return f"{hashes_per_second:.2f} H/s"
+
+
+class CoinAlgorithm:
+    """واجهة إضافة لخوارزمية تعدين
+
+    كل إضافة تحدد: العملات التي تستخدمها مع معاملات الشبكة (زمن الكتلة، المكافأة،
+    وقيم احتياطية للسعر والصعوبة)، تحويل الصعوبة إلى معدل هاش الشبكة، ملفات
+    الأجهزة (H/s، واط) لكل فئة جهاز، ودالة hash للقياس المحلي على المعالج.
+    """
+
+    name = None
+    # إصدار دالة القياس؛ تغييره يبطل النتائج المخزنة
+    version = 1
+    # هل دالة hash هي الخوارزمية الفعلية؛ البدائل التقريبية لا تعطي معدلاً مطلقاً صالحاً للربحية
+    exact = True
+    coins = {}
+    profiles = {}
+
+    def network_hashrate(self, coin, difficulty):
+        """معدل هاش الشبكة (H/s) من الصعوبة؛ الافتراضي صيغة بيتكوين difficulty * 2^32 / زمن الكتلة"""
+        return difficulty * 2 ** 32 / self.coins[coin]['block_time']
+
+    def prepare(self):
+        """تجهيز ما تحتاجه دالة القياس (ذاكرة DAG أو scratchpad) قبل بدء التوقيت"""
+
+    def hash(self, header, nonce):
+        raise NotImplementedError
+
+
+class Sha256Algorithm(CoinAlgorithm):
+    name = 'sha256'
+    coins = {
+        'BTC': {'price_id': 'bitcoin', 'block_time': 600, 'block_reward': 6.25,
+                'price': 60000, 'difficulty': 62463471666286}
+    }
+    profiles = {
+        'asic': {'hash_rate': 110e12, 'power': 3250},
+        'gpu': {'hash_rate': 1.5e9, 'power': 250},
+        'cpu': {'hash_rate': 20e6, 'power': 65}
+    }
+
+    def hash(self, header, nonce):
+        return hashlib.sha256(hashlib.sha256(header + struct.pack('<I', nonce)).digest()).digest()
+
+
+class EthashAlgorithm(CoinAlgorithm):
+    """بديل تقريبي لـ Ethash: 64 قراءة عشوائية من DAG في الذاكرة مع Keccak
+
+    لا يطابق Ethash الحقيقي (DAG بحجم جيجابايتات) لكنه يحافظ على طبيعته المحدودة
+    بعرض نطاق الذاكرة، فالقياس مؤشر نسبي وليس معدلاً قابلاً للمقارنة بالمجمع.
+    """
+
+    name = 'ethash'
+    exact = False
+    coins = {
+        'ETH': {'price_id': 'ethereum', 'block_time': 13.5, 'block_reward': 2.0,
+                'price': 3000, 'difficulty': 15500000000000000}
+    }
+    profiles = {
+        'asic': {'hash_rate': 2.5e9, 'power': 2400},
+        'gpu': {'hash_rate': 50e6, 'power': 250},
+        'cpu': {'hash_rate': 0.5e6, 'power': 65}
+    }
+    dag_size = 16 * 1024 * 1024
+    page_size = 128
+    accesses = 64
+
+    def __init__(self):
+        self._dag = None
+
+    def network_hashrate(self, coin, difficulty):
+        return difficulty / self.coins[coin]['block_time']
+
+    def prepare(self):
+        if self._dag is None:
+            self._dag = memoryview(os.urandom(self.dag_size))
+
+    def hash(self, header, nonce):
+        dag = self._dag
+        pages = self.dag_size // self.page_size
+        mix = hashlib.sha3_512(header + struct.pack('<Q', nonce)).digest()
+        for _ in range(self.accesses):
+            offset = int.from_bytes(mix[:4], 'little') % pages * self.page_size
+            mix = hashlib.sha3_512(mix + dag[offset:offset + self.page_size]).digest()
+        return hashlib.sha3_256(mix).digest()
+
+
+class ScryptAlgorithm(CoinAlgorithm):
+    """Scrypt بمعاملات لايتكوين (N=1024, r=1, p=1) عبر hashlib.scrypt"""
+
+    name = 'scrypt'
+    coins = {
+        'LTC': {'price_id': 'litecoin', 'block_time': 150, 'block_reward': 6.25,
+                'price': 150, 'difficulty': 35000000}
+    }
+    profiles = {
+        'asic': {'hash_rate': 9.5e9, 'power': 3425},
+        'gpu': {'hash_rate': 2e6, 'power': 250},
+        'cpu': {'hash_rate': 50e3, 'power': 65}
+    }
+
+    def hash(self, header, nonce):
+        data = header + struct.pack('<I', nonce)
+        return hashlib.scrypt(data, salt=data, n=1024, r=1, p=1, dklen=32)
+
+
+class RandomXAlgorithm(CoinAlgorithm):
+    """بديل تقريبي لـ RandomX: قراءات وكتابات عشوائية في scratchpad بحجم 2 ميجابايت مع BLAKE2b
+
+    RandomX الحقيقي آلة افتراضية مُجمّعة JIT؛ هذا البديل يقيس فقط سلوك الذاكرة
+    والتجزئة على هذا المعالج كمؤشر نسبي.
+    """
+
+    name = 'randomx'
+    exact = False
+    coins = {
+        'XMR': {'price_id': 'monero', 'block_time': 120, 'block_reward': 0.6,
+                'price': 160, 'difficulty': 300000000000}
+    }
+    profiles = {
+        'asic': {'hash_rate': 0.0, 'power': 0},
+        'gpu': {'hash_rate': 2e3, 'power': 250},
+        'cpu': {'hash_rate': 8e3, 'power': 65}
+    }
+    scratchpad_size = 2 * 1024 * 1024
+    line_size = 64
+    rounds = 32
+
+    def __init__(self):
+        self._scratchpad = None
+
+    def network_hashrate(self, coin, difficulty):
+        return difficulty / self.coins[coin]['block_time']
+
+    def prepare(self):
+        if self._scratchpad is None:
+            self._scratchpad = bytearray(os.urandom(self.scratchpad_size))
+
+    def hash(self, header, nonce):
+        pad = self._scratchpad
+        lines = self.scratchpad_size // self.line_size
+        mix = hashlib.blake2b(header + struct.pack('<Q', nonce)).digest()
+        for _ in range(self.rounds):
+            offset = int.from_bytes(mix[:4], 'little') % lines * self.line_size
+            mix = hashlib.blake2b(mix + pad[offset:offset + self.line_size]).digest()
+            pad[offset:offset + self.line_size] = mix
+        return mix[:32]
+
+
+# سجل الإضافات: اسم الخوارزمية -> الكائن، ورمز العملة -> الخوارزمية
+ALGORITHMS = {}
+COINS = {}
+
+
+def register_algorithm(algorithm):
+    """تسجيل خوارزمية (كائن من صنف فرعي لـ CoinAlgorithm) وعملاتها"""
+    ALGORITHMS[algorithm.name] = algorithm
+    for coin in algorithm.coins:
+        COINS[coin] = algorithm
+    return algorithm
+
+
+for _algorithm in (Sha256Algorithm(), EthashAlgorithm(), ScryptAlgorithm(), RandomXAlgorithm()):
+    register_algorithm(_algorithm)
+
+
+def algorithm_for(coin):
+    return COINS.get(coin)
+
+
+def supported_coins():
+    return tuple(COINS)
+
+
+def device_hashrate(algorithm, hardware_data, measured=None, device='gpu'):
+    """(H/s، واط، المصدر) لجهاز على خوارزمية
+
+    الأولوية: معدل صريح لكل خوارزمية في hardware_data['hash_rates']، ثم القياس
+    المحلي، ثم ملف فئة الجهاز. القياس يجري على معالج هذا الجهاز فلا يُستخدم إلا
+    لجهاز cpu ولخوارزمية فعلية (exact)؛ قياس البدائل التقريبية مؤشر نسبي فقط.
+    النص العام hash_rate (مثل "50 MH/s") لا يحدد الخوارزمية فلا يُستخدم إلا
+    لإضافة بلا ملف للجهاز.
+    """
+    hardware_data = hardware_data or {}
+    device = hardware_data.get('device', device)
+    power = hardware_data.get('power_consumption')
+    explicit = parse_hashrate((hardware_data.get('hash_rates') or {}).get(algorithm.name))
+    if explicit is not None:
+        return explicit, power or algorithm.profiles.get(device, {}).get('power', 0), 'hardware'
+
+    if measured and algorithm.name in measured and algorithm.exact and device == 'cpu':
+        result = measured[algorithm.name]
+        return result['hash_rate'], result['power'], 'measured'
+
+    profile = algorithm.profiles.get(device)
+    if profile is not None:
+        return profile['hash_rate'], power or profile['power'], 'profile'
+
+    parsed = parse_hashrate(hardware_data.get('hash_rate'))
+    return parsed or 0.0, power or 0, 'hardware'
+
+
+class HashrateBenchmark:
+    """قياس معدل الهاش والكفاءة لكل خوارزمية على معالج هذا الجهاز مع تخزين النتائج
+
+    النتائج تُحفظ في ملف JSON مفتاحه بصمة الجهاز (المعمارية، المعالج، عدد الأنوية،
+    إصدار بايثون، وإصدارات دوال القياس) فلا يُعاد القياس إلا عند تغيرها أو انتهاء صلاحيتها.
+    القدرة من عدادات RAPL إن كانت متاحة، وإلا تقدير watts_per_thread لكل خيط.
+    """
+
+    RAPL_PATH = '/sys/class/powercap/intel-rapl:0/energy_uj'
+
+    def __init__(self, cache_path=None, duration=None, threads=None, watts_per_thread=None,
+                 max_age=None, config=None):
+        settings = (config or {}).get('algorithms', {})
+        self.cache_path = cache_path or settings.get('benchmark_cache', 'hashrate_benchmark.json')
+        self.duration = duration or settings.get('benchmark_duration', 0.5)
+        self.threads = threads or settings.get('benchmark_threads', 1)
+        self.watts_per_thread = watts_per_thread or settings.get('watts_per_thread', 15.0)
+        self.max_age = max_age or settings.get('benchmark_max_age', 30 * 86400)
+        self.logger = get_logger(__name__, 'coin_algorithms.log', config)
+
+    def fingerprint(self):
+        versions = ','.join(f"{name}:{algorithm.version}" for name, algorithm in sorted(ALGORITHMS.items()))
+        return '|'.join((
+            platform.machine(), platform.processor() or 'unknown', str(os.cpu_count()),
+            f"py{sys.version_info[0]}.{sys.version_info[1]}", str(self.threads), versions
+        ))
+
+    def _read_energy(self):
+        try:
+            with open(self.RAPL_PATH) as f:
+                return int(f.read()) / 1e6
+        except (OSError, ValueError):
+            return None
+
+    def measure(self, algorithm):
+        """قياس خوارزمية واحدة لمدة duration على خيط واحد ثم التوسيع لعدد الخيوط"""
+        algorithm.prepare()
+        header = hashlib.sha256(algorithm.name.encode()).digest() * 2 + b'\0' * 12
+        algorithm.hash(header, 0)
+
+        energy_start = self._read_energy()
+        cpu_start = time.process_time()
+        started = time.perf_counter()
+        deadline = started + self.duration
+        hashes = 0
+        while True:
+            # دفعات صغيرة حتى لا تطغى قراءة الساعة على الدوال السريعة
+            for nonce in range(hashes, hashes + 64):
+                algorithm.hash(header, nonce)
+            hashes += 64
+            now = time.perf_counter()
+            if now >= deadline:
+                break
+        elapsed = now - started
+        cpu_seconds = time.process_time() - cpu_start
+        energy_end = self._read_energy()
+
+        per_thread = hashes / elapsed
+        if energy_start is not None and energy_end is not None and energy_end >= energy_start:
+            # RAPL يقيس الحزمة كاملة فلا يُضرب في عدد الخيوط
+            power, power_source = (energy_end - energy_start) / elapsed, 'rapl'
+        else:
+            power, power_source = self.watts_per_thread * min(1.0, cpu_seconds / elapsed), 'estimate'
+            power *= self.threads
+        hash_rate = per_thread * self.threads
+        return {
+            'hash_rate': hash_rate,
+            'exact': algorithm.exact,
+            'per_thread_hash_rate': per_thread,
+            'display': format_hashrate(hash_rate),
+            'power': power,
+            'power_source': power_source,
+            'efficiency': hash_rate / power if power else None,
+            'hashes': hashes,
+            'seconds': elapsed
+        }
+
+    def run(self, algorithms=None):
+        names = algorithms or sorted(ALGORITHMS)
+        results = {}
+        for name in names:
+            results[name] = self.measure(ALGORITHMS[name])
+            self.logger.info("Measured %s: %s (%.1f W, %s)", name, results[name]['display'],
+                             results[name]['power'], results[name]['power_source'])
+        return results
+
+    def _load_cache(self):
+        try:
+            with open(self.cache_path, 'r', encoding='utf-8') as f:
+                return json.load(f)
+        except (FileNotFoundError, ValueError):
+            return {}
+
+    def load_or_run(self, force=False):
+        """النتائج المخزنة لهذا الجهاز إن كانت صالحة، وإلا قياس جديد وحفظه"""
+        cache = self._load_cache()
+        fingerprint = self.fingerprint()
+        entry = cache.get(fingerprint)
+        if not force and entry and time.time() - entry['timestamp'] < self.max_age \
+                and set(ALGORITHMS) <= set(entry['results']):
+            return entry['results']
+
+        results = self.run()
+        cache[fingerprint] = {'timestamp': time.time(), 'results': results}
+        temp_path = f"{self.cache_path}.tmp"
+        with open(temp_path, 'w', encoding='utf-8') as f:
+            json.dump(cache, f, indent=2)
+        os.replace(temp_path, self.cache_path)
+        return results
+
+
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description='Per-algorithm CPU hashrate benchmark')
+    parser.add_argument('--duration', type=float, default=0.5)
+    parser.add_argument('--threads', type=int, default=1)
+    parser.add_argument('--force', action='store_true', help='ignore cached results')
+    args = parser.parse_args()
+
+    benchmark = HashrateBenchmark(duration=args.duration, threads=args.threads)
+    print(json.dumps(benchmark.load_or_run(force=args.force), indent=2))
@@ -2,17 +2,42 @@ import requests
 import json
 import time
 from datetime import datetime
+from instrumentation import timed
+from price_sources import PriceAggregator
+from price_stream import PriceStream
 
 class DataCollector:
-    def __init__(self):
+    def __init__(self, config=None):
         self.crypto_api_url = "https://api.coingecko.com/api/v3/simple/price"
+        # مجمع أسعار متعدد المزودين عند ضبط قسم price_sources؛ بدونه يُستخدم crypto_api_url وحده
+        self.price_aggregator = None
+        if (config or {}).get('price_sources', {}).get('providers'):
+            self.price_aggregator = PriceAggregator.from_config(config)
+        # تغذية WebSocket اختيارية؛ يشغلها البوت عبر watch_prices وتُستخدم ما دامت حديثة
+        self.price_stream = None
+        if (config or {}).get('price_stream', {}).get('url'):
+            self.price_stream = PriceStream(config=config)
+        # مصدر اختياري لبيانات الصعوبة؛ بدونه تُستخدم القيم الثابتة
+        self.difficulty_api_url = None
         self.mining_pools = {
             "BTC": "https://api.slushpool.com/stats/json/btc",
             "ETH": "https://api.ethermine.org/poolStats"
         }
+        # جلب إحصاءات المجمعات في كل دورة لتسجيلها في دفتر الحصص والمدفوعات
+        self.fetch_pool_stats = bool((config or {}).get('ledger', {}).get('pool_stats', False))
+        # روابط سجل المدفوعات لكل عملة (حساب المعدّن في المجمع) لمطابقة الربح المحقق بالمتوقع
+        self.payout_urls = dict((config or {}).get('ledger', {}).get('payout_urls') or {})
+        # فئة الجهاز من الإعدادات (cpu يفعّل معدلات القياس المحلي في المحلل)
+        self.device = (config or {}).get('algorithms', {}).get('device', 'gpu')
         
     def get_crypto_prices(self, coins=["bitcoin", "ethereum"]):
         """جمع أسعار العملات المشفرة من API"""
+        if self.price_stream is not None and self.price_stream.fresh:
+            prices = self.price_stream.prices_snapshot(coins)
+            if prices:
+                return prices
+        if self.price_aggregator is not None:
+            return self.price_aggregator.fetch(coins)
         try:
             params = {
                 'ids': ','.join(coins),
@@ -31,6 +56,16 @@ class DataCollector:
     
     def get_mining_difficulty(self, coin="BTC"):
         """جمع بيانات صعوبة التعدين"""
+        if self.difficulty_api_url:
+            try:
+                response = requests.get(self.difficulty_api_url, params={'coin': coin}, timeout=10)
+                if response.status_code == 200:
+                    return response.json()
+                print(f"Error fetching mining difficulty: {response.status_code}")
+            except Exception as e:
+                print(f"Exception in get_mining_difficulty: {e}")
+            return {}
+        
         # هذه دالة وهمية - في التطبيق الحقيقي ستتصل بـ APIs حقيقية
         difficulty_data = {
             "BTC": {"difficulty": 62463471666286, "hash_rate": "400 EH/s"},
@@ -38,6 +73,35 @@ class DataCollector:
         }
         return difficulty_data.get(coin, {})
     
+    def get_pool_stats(self, coin="BTC"):
+        """جلب إحصاءات المجمع من رابط mining_pools للعملة"""
+        url = self.mining_pools.get(coin)
+        if not url:
+            return {}
+        try:
+            response = requests.get(url, timeout=10)
+            if response.status_code == 200:
+                return response.json()
+            print(f"Error fetching pool stats: {response.status_code}")
+        except Exception as e:
+            print(f"Exception in get_pool_stats: {e}")
+        return {}
+    
+    def get_pool_payouts(self, coin="BTC"):
+        """جلب سجل مدفوعات الحساب من المجمع (قائمة سجلات، أو data في صيغة ethermine)"""
+        url = self.payout_urls.get(coin)
+        if not url:
+            return []
+        try:
+            response = requests.get(url, timeout=10)
+            if response.status_code == 200:
+                payload = response.json()
+                return payload.get('data', []) if isinstance(payload, dict) else payload
+            print(f"Error fetching pool payouts: {response.status_code}")
+        except Exception as e:
+            print(f"Exception in get_pool_payouts: {e}")
+        return []
+    
     def get_energy_costs(self):
         """جمع بيانات تكلفة الطاقة"""
         # في التطبيق الحقيقي، يمكن جمع هذه البيانات من مصادر محلية أو APIs
@@ -54,9 +118,11 @@ class DataCollector:
             "gpu_usage": 95,  # نسبة الاستخدام
             "power_consumption": 250,  # واط
             "hash_rate": "50 MH/s",
+            "device": self.device,  # فئة الجهاز لملفات الخوارزميات
             "fan_speed": 75  # نسبة سرعة المروحة
         }
     
+    @timed('collector.collect_all_data')
     def collect_all_data(self):
         """جمع جميع البيانات المطلوبة"""
         print("جاري جمع البيانات...")
@@ -71,6 +137,10 @@ class DataCollector:
             "energy_costs": self.get_energy_costs(),
             "hardware_status": self.get_hardware_status()
         }
+        if self.fetch_pool_stats:
+            data["pool_stats"] = {coin: self.get_pool_stats(coin) for coin in self.mining_pools}
+        if self.payout_urls:
+            data["pool_payouts"] = {coin: self.get_pool_payouts(coin) for coin in self.payout_urls}
         
         print("تم جمع البيانات بنجاح")
         return data
@@ -0,0 +1,370 @@
+import functools
+import itertools
+import json
+import sys
+import threading
+import time
+import weakref
+from collections import Counter
+
+# مدرج HDR مبسط: 16 خانة فرعية لكل قوة من 2 (خطأ نسبي أقل من 6.25%)
+_SUB_BITS = 4
+_SUB_COUNT = 1 << _SUB_BITS
+_LINEAR_LIMIT = _SUB_COUNT * 2
+_BUCKET_COUNT = _SUB_COUNT * 64
+
+# حدود تصدير Prometheus بالثواني
+PROMETHEUS_BUCKETS = (
+    0.000001, 0.000005, 0.00001, 0.00005, 0.0001, 0.0005, 0.001, 0.005,
+    0.01, 0.05, 0.1, 0.5, 1.0, 5.0, 10.0, 60.0
+)
+
+
+def _bucket_index(value):
+    if value < _LINEAR_LIMIT:
+        return value if value > 0 else 0
+    shift = value.bit_length() - (_SUB_BITS + 1)
+    return _SUB_COUNT * shift + (value >> shift)
+
+
+def _bucket_lower_bound(index):
+    if index < _LINEAR_LIMIT:
+        return index
+    shift = index // _SUB_COUNT - 1
+    return (index - _SUB_COUNT * shift) << shift
+
+
+def _bucket_midpoint(index):
+    if index < _LINEAR_LIMIT:
+        return index
+    shift = index // _SUB_COUNT - 1
+    return _bucket_lower_bound(index) + ((1 << shift) >> 1)
+
+
+class _Shard:
+    """عدادات خيط واحد؛ لا يكتب فيها إلا ذلك الخيط فلا حاجة لأقفال"""
+
+    __slots__ = ('counts', 'total', 'count', 'minimum', 'maximum')
+
+    def __init__(self):
+        self.counts = [0] * _BUCKET_COUNT
+        self.total = 0
+        self.count = 0
+        self.minimum = None
+        self.maximum = 0
+
+    def record(self, value):
+        if value < _LINEAR_LIMIT:
+            index = value if value > 0 else 0
+        else:
+            shift = value.bit_length() - (_SUB_BITS + 1)
+            index = _SUB_COUNT * shift + (value >> shift)
+        self.counts[index] += 1
+        self.total += value
+        self.count += 1
+        if value > self.maximum:
+            self.maximum = value
+        if self.minimum is None or value < self.minimum:
+            self.minimum = value
+
+    def merge(self, other):
+        for index, value in enumerate(other.counts):
+            if value:
+                self.counts[index] += value
+        self.total += other.total
+        self.count += other.count
+        self.maximum = max(self.maximum, other.maximum)
+        if other.minimum is not None and (self.minimum is None or other.minimum < self.minimum):
+            self.minimum = other.minimum
+
+
+class Histogram:
+    """مدرج زمني بالنانوثانية مقسم حسب الخيط ويُدمج عند التصدير فقط
+
+    شرائح الخيوط المنتهية تُطوى في شريحة أساسية عند التصدير أو عند تسجيل خيط
+    جديد، فلا تنمو القائمة مع الخيوط قصيرة العمر.
+    """
+
+    def __init__(self, name, sample_every=1):
+        self.name = name
+        # كل قيمة مسجلة تمثل sample_every استدعاءً (timed مع أخذ العينات)
+        self.sample_every = sample_every
+        self._local = threading.local()
+        # (مرجع ضعيف للخيط، شريحته)
+        self._shards = []
+        self._base = _Shard()
+        self._lock = threading.Lock()
+
+    def _shard(self):
+        shard = _Shard()
+        self._local.shard = shard
+        with self._lock:
+            self._fold_dead()
+            self._shards.append((weakref.ref(threading.current_thread()), shard))
+        return shard
+
+    def _fold_dead(self):
+        """دمج شرائح الخيوط المنتهية في الشريحة الأساسية (يُستدعى مع القفل)"""
+        live = []
+        for thread_ref, shard in self._shards:
+            thread = thread_ref()
+            if thread is None or not thread.is_alive():
+                self._base.merge(shard)
+            else:
+                live.append((thread_ref, shard))
+        self._shards = live
+
+    def record(self, value_ns):
+        """تسجيل قيمة (نانوثانية) في شريحة الخيط الحالي"""
+        try:
+            shard = self._local.shard
+        except AttributeError:
+            shard = self._shard()
+        shard.record(value_ns)
+
+    def snapshot(self):
+        """دمج كل الشرائح في لقطة واحدة"""
+        merged = _Shard()
+        with self._lock:
+            self._fold_dead()
+            merged.merge(self._base)
+            shards = [shard for _, shard in self._shards]
+
+        for shard in shards:
+            merged.merge(shard)
+        return HistogramSnapshot(
+            self.name, merged.counts, merged.count, merged.total, merged.minimum or 0, merged.maximum,
+            self.sample_every
+        )
+
+    def reset(self):
+        with self._lock:
+            self._fold_dead()
+            for shard in [self._base] + [shard for _, shard in self._shards]:
+                shard.counts = [0] * _BUCKET_COUNT
+                shard.total = shard.count = shard.maximum = 0
+                shard.minimum = None
+
+
+class HistogramSnapshot:
+    """لقطة مدمجة من مدرج: المئينات والملخصات
+
+    count و total للقيم المقاسة فعلاً؛ مع أخذ العينات تقدير عدد الاستدعاءات
+    ومجموع أزمنتها هو ضربهما في sample_every.
+    """
+
+    def __init__(self, name, counts, count, total, minimum, maximum, sample_every=1):
+        self.name = name
+        self.counts = counts
+        self.count = count
+        self.total = total
+        self.minimum = minimum
+        self.maximum = maximum
+        self.sample_every = sample_every
+
+    def percentile(self, percent):
+        """القيمة التقريبية للمئين (نانوثانية)"""
+        if not self.count:
+            return 0
+        target = max(1, int(round(self.count * percent / 100.0)))
+        seen = 0
+        for index, value in enumerate(self.counts):
+            seen += value
+            if seen >= target:
+                return min(max(_bucket_midpoint(index), self.minimum), self.maximum)
+        return self.maximum
+
+    def to_dict(self):
+        return {
+            'count': self.count,
+            'sample_every': self.sample_every,
+            'sum_ns': self.total,
+            'mean_ns': self.total / self.count if self.count else 0,
+            'min_ns': self.minimum,
+            'max_ns': self.maximum,
+            'p50_ns': self.percentile(50),
+            'p90_ns': self.percentile(90),
+            'p99_ns': self.percentile(99),
+            'p999_ns': self.percentile(99.9)
+        }
+
+    def cumulative_counts(self, bounds_ns):
+        """عدد القيم الأقل من أو تساوي كل حد (لتصدير Prometheus)"""
+        result = []
+        index = 0
+        running = 0
+        for bound in bounds_ns:
+            while index < _BUCKET_COUNT and _bucket_lower_bound(index) <= bound:
+                running += self.counts[index]
+                index += 1
+            result.append(running)
+        return result
+
+
+class _Span:
+    __slots__ = ('histogram', 'start')
+
+    def __init__(self, histogram):
+        self.histogram = histogram
+
+    def __enter__(self):
+        self.start = time.perf_counter_ns()
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.histogram.record(time.perf_counter_ns() - self.start)
+        return False
+
+
+class _NullSpan:
+    __slots__ = ()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        return False
+
+
+_NULL_SPAN = _NullSpan()
+
+
+class Instrumentation:
+    """سجل المدرجات: مقاطع زمنية دائمة التشغيل بتكلفة منخفضة وتصدير Prometheus/JSON"""
+
+    def __init__(self, enabled=True, prefix='smartminingbot'):
+        self.enabled = enabled
+        self.prefix = prefix
+        self._histograms = {}
+        self._lock = threading.Lock()
+
+    def histogram(self, name):
+        histogram = self._histograms.get(name)
+        if histogram is None:
+            with self._lock:
+                histogram = self._histograms.setdefault(name, Histogram(name))
+        return histogram
+
+    def span(self, name):
+        """مدير سياق يقيس زمن الكتلة بـ perf_counter_ns"""
+        if not self.enabled:
+            return _NULL_SPAN
+        return _Span(self.histogram(name))
+
+    def record(self, name, value_ns):
+        if self.enabled:
+            self.histogram(name).record(int(value_ns))
+
+    def timed(self, name, sample_every=1):
+        """مزخرف يقيس زمن الاستدعاءات؛ sample_every > 1 يقيس استدعاءً واحداً من كل N
+
+        أخذ العينات مخصص للدوال التي تستغرق ميكروثوانٍ (مثل التحقق من المفاتيح)
+        حيث تكون تكلفة القياس نفسها نسبة ملحوظة من زمن الدالة.
+        """
+        def decorator(func):
+            histogram = self.histogram(name)
+            histogram.sample_every = max(1, sample_every)
+            clock = time.perf_counter_ns
+            # next() على itertools.count ذري في CPython فلا يضيع عد بين الخيوط
+            calls = itertools.count(1)
+
+            @functools.wraps(func)
+            def wrapper(*args, **kwargs):
+                if not self.enabled:
+                    return func(*args, **kwargs)
+                if sample_every > 1 and next(calls) % sample_every:
+                    return func(*args, **kwargs)
+                start = clock()
+                try:
+                    return func(*args, **kwargs)
+                finally:
+                    histogram.record(clock() - start)
+            return wrapper
+        return decorator
+
+    def snapshots(self):
+        with self._lock:
+            histograms = list(self._histograms.values())
+        return {histogram.name: histogram.snapshot() for histogram in histograms}
+
+    def reset(self):
+        with self._lock:
+            histograms = list(self._histograms.values())
+        for histogram in histograms:
+            histogram.reset()
+
+    def to_json(self, indent=None):
+        """تصدير ملخص كل المقاطع بصيغة JSON"""
+        return json.dumps(
+            {name: snapshot.to_dict() for name, snapshot in self.snapshots().items()},
+            indent=indent
+        )
+
+    def to_prometheus(self):
+        """تصدير المدرجات بصيغة Prometheus النصية"""
+        metric = f"{self.prefix}_span_duration_seconds"
+        lines = [
+            f"# HELP {metric} Duration of instrumented bot spans.",
+            f"# TYPE {metric} histogram"
+        ]
+        bounds_ns = [int(bound * 1e9) for bound in PROMETHEUS_BUCKETS]
+        for name, snapshot in sorted(self.snapshots().items()):
+            label = name.replace('\\', '\\\\').replace('"', '\\"')
+            # المقاطع المأخوذة عيناتها تُضرب في معامل العينة حتى تطابق عدد الاستدعاءات
+            scale = snapshot.sample_every
+            for bound, cumulative in zip(PROMETHEUS_BUCKETS, snapshot.cumulative_counts(bounds_ns)):
+                lines.append(f'{metric}_bucket{{span="{label}",le="{bound}"}} {cumulative * scale}')
+            lines.append(f'{metric}_bucket{{span="{label}",le="+Inf"}} {snapshot.count * scale}')
+            lines.append(f'{metric}_sum{{span="{label}"}} {snapshot.total * scale / 1e9}')
+            lines.append(f'{metric}_count{{span="{label}"}} {snapshot.count * scale}')
+        return '\n'.join(lines) + '\n'
+
+
+class SamplingProfiler:
+    """محلل أخذ عينات اختياري: يلتقط مكدسات كل الخيوط دورياً بصيغة collapsed stacks"""
+
+    def __init__(self, interval=0.01, max_depth=32):
+        self.interval = interval
+        self.max_depth = max_depth
+        self.samples = Counter()
+        self._stop_event = threading.Event()
+        self._thread = None
+
+    def start(self):
+        if self._thread is not None:
+            return
+        self._stop_event.clear()
+        self._thread = threading.Thread(target=self._run, name='sampling-profiler')
+        self._thread.daemon = True
+        self._thread.start()
+
+    def stop(self):
+        if self._thread is None:
+            return
+        self._stop_event.set()
+        self._thread.join()
+        self._thread = None
+
+    def _run(self):
+        own_id = threading.get_ident()
+        while not self._stop_event.wait(self.interval):
+            for thread_id, frame in sys._current_frames().items():
+                if thread_id == own_id:
+                    continue
+                stack = []
+                while frame is not None and len(stack) < self.max_depth:
+                    code = frame.f_code
+                    stack.append(f"{code.co_filename.rsplit('/', 1)[-1]}:{code.co_name}")
+                    frame = frame.f_back
+                self.samples[';'.join(reversed(stack))] += 1
+
+    def collapsed(self):
+        """المكدسات بصيغة flamegraph.pl"""
+        return '\n'.join(f"{stack} {count}" for stack, count in self.samples.most_common())
+
+
+# السجل الافتراضي المشترك بين وحدات البوت
+INSTRUMENTATION = Instrumentation()
+span = INSTRUMENTATION.span
+timed = INSTRUMENTATION.timed
+record = INSTRUMENTATION.record
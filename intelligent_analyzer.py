@@ -2,42 +2,71 @@ import numpy as np
 import json
 from datetime import datetime, timedelta
 import math
+import time
+from instrumentation import timed
+from checkpoint import BinaryReader, BinaryWriter
+from coin_algorithms import HashrateBenchmark, algorithm_for, device_hashrate
+from system_monitor import RingSeries
 
 class IntelligentAnalyzer:
-    def __init__(self):
+    def __init__(self, config=None):
+        settings = (config or {}).get('algorithms', {})
+        # العملات المرشحة، وفئة الجهاز الافتراضية لملفات الخوارزميات
+        self.coins = tuple(settings.get('coins', ('BTC', 'ETH')))
+        self.device = settings.get('device', 'gpu')
+        # في وضع القياس تُستخدم معدلات الهاش المقاسة على هذا الجهاز (مخزنة بين التشغيلات)
+        self.measured_hashrates = None
+        if settings.get('mode') == 'benchmark':
+            self.measured_hashrates = HashrateBenchmark(config=config).load_or_run()
         self.historical_data = []
         self.profitability_threshold = 0.1  # 10% ربح أدنى
         self.risk_tolerance = 0.2  # 20% تحمل للمخاطر
+        # سجل دائري للربح المتوقع من كل توصية (للوحات الرسم)
+        self.profit_history = RingSeries(('timestamp', 'expected_daily_profit'), 10080, None)
         
-    def calculate_profitability(self, coin_data, hardware_data, energy_cost):
+    @property
+    def state_version(self):
+        return (len(self.historical_data), self.profit_history.state_version)
+
+    def export_state(self):
+        """تسلسل السجل التاريخي وسجل الربح لنقاط الحفظ"""
+        writer = BinaryWriter()
+        writer.text(json.dumps(self.historical_data, ensure_ascii=False))
+        writer.blob(self.profit_history.export_state())
+        return writer.getvalue()
+
+    def import_state(self, data):
+        """استعادة السجل التاريخي وسجل الربح بعد إعادة التشغيل"""
+        reader = BinaryReader(data)
+        self.historical_data = json.loads(reader.text())
+        self.profit_history.import_state(reader.blob())
+        
+    @timed('analyzer.calculate_profitability')
+    def calculate_profitability(self, coin_data, hardware_data, energy_cost, price=None, difficulty=None):
         """حساب الربحية المتوقعة للعملة"""
         try:
-            # استخراج البيانات الأساسية
-            if coin_data == "BTC":
-                price = 60000  # سعر وهمي
-                hash_rate = 50  # TH/s
-                difficulty = 62463471666286
-                block_reward = 6.25
-            elif coin_data == "ETH":
-                price = 3000  # سعر وهمي
-                hash_rate = 50  # MH/s
-                difficulty = 15500000000000000
-                block_reward = 2.0
-            else:
+            algorithm = algorithm_for(coin_data)
+            if algorithm is None:
                 return 0
-            
-            # حساب الإيرادات المتوقعة يومياً
-            daily_blocks = 144 if coin_data == "BTC" else 6400  # عدد البلوكات يومياً
-            network_hash_rate = difficulty / (2**32) if coin_data == "BTC" else difficulty / (2**13)
+            coin = algorithm.coins[coin_data]
+            # السعر والصعوبة من البيانات المجمعة إن وُجدت، وإلا القيم الاحتياطية للإضافة
+            price = price or coin['price']
+            difficulty = difficulty or coin['difficulty']
+            
+            # معدل الهاش والقدرة بوحدات موحدة (H/s، واط) لهذه الخوارزمية
+            hash_rate, power_consumption, hash_rate_source = device_hashrate(
+                algorithm, hardware_data, self.measured_hashrates, self.device
+            )
+            daily_blocks = 86400 / coin['block_time']  # عدد البلوكات يومياً
+            network_hash_rate = algorithm.network_hashrate(coin_data, difficulty)
             
             # نسبة الهاش ريت الخاص بنا من إجمالي الشبكة
             our_share = hash_rate / network_hash_rate
             
             # الإيرادات اليومية
-            daily_revenue = our_share * daily_blocks * block_reward * price
+            daily_revenue = our_share * daily_blocks * coin['block_reward'] * price
             
             # التكاليف اليومية (الطاقة)
-            power_consumption = hardware_data.get('power_consumption', 250)  # واط
             daily_energy_cost = (power_consumption / 1000) * 24 * energy_cost
             
             # الربح الصافي
@@ -48,6 +77,9 @@ class IntelligentAnalyzer:
             
             return {
                 'coin': coin_data,
+                'algorithm': algorithm.name,
+                'hash_rate': hash_rate,
+                'hash_rate_source': hash_rate_source,
                 'daily_revenue': daily_revenue,
                 'daily_cost': daily_energy_cost,
                 'daily_profit': daily_profit,
@@ -128,15 +160,28 @@ class IntelligentAnalyzer:
         
         return analysis
     
+    @timed('analyzer.recommend_mining_strategy')
     def recommend_mining_strategy(self, data):
         """اقتراح استراتيجية التعدين المثلى"""
         try:
             energy_cost = data.get('energy_costs', {}).get('cost_per_kwh', 0.12)
             hardware_data = data.get('hardware_status', {})
             
-            # تحليل ربحية العملات المختلفة
-            btc_profit = self.calculate_profitability('BTC', hardware_data, energy_cost)
-            eth_profit = self.calculate_profitability('ETH', hardware_data, energy_cost)
+            # تحليل ربحية العملات المختلفة بالأسعار والصعوبة المجمعة
+            prices = data.get('crypto_prices') or {}
+            difficulties = data.get('mining_difficulty') or {}
+            profits = []
+            for coin in self.coins:
+                algorithm = algorithm_for(coin)
+                if algorithm is None:
+                    continue
+                price_data = prices.get(algorithm.coins[coin]['price_id'])
+                difficulty_data = difficulties.get(coin)
+                profits.append(self.calculate_profitability(
+                    coin, hardware_data, energy_cost,
+                    price_data.get('usd') if isinstance(price_data, dict) else None,
+                    difficulty_data.get('difficulty') if isinstance(difficulty_data, dict) else None
+                ))
             
             # تحليل السوق
             market_analysis = self.analyze_market_conditions(data)
@@ -145,11 +190,13 @@ class IntelligentAnalyzer:
             best_coin = None
             max_profit = 0
             
-            for profit_data in [btc_profit, eth_profit]:
+            for profit_data in profits:
                 if profit_data and profit_data['daily_profit'] > max_profit:
                     max_profit = profit_data['daily_profit']
                     best_coin = profit_data['coin']
             
+            self.profit_history.append((time.time(), max_profit))
+            
             # إنشاء التوصية
             recommendation = {
                 'recommended_coin': best_coin,
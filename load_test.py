@@ -0,0 +1,232 @@
+import argparse
+import contextlib
+import gc
+import json
+import os
+import threading
+import time
+
+import numpy as np
+import psutil
+
+from data_collector import DataCollector
+from instrumentation import Histogram
+from intelligent_analyzer import IntelligentAnalyzer
+from mining_bot import MiningBot
+from mock_services import MockPriceServer, RigFleet
+
+
+class LoadTestHarness:
+    """مولد حمل لدورة البوت الكاملة (جمع ← تحليل ← قرار ← تحكم) مقابل بدائل محلية"""
+
+    def __init__(self, latency=0.005, jitter=0.002, error_rate=0.01, rigs_per_bot=1000,
+                 switch_latency=0.0, price_volatility=0.01, tick_interval=0.1, seed=None):
+        self.rigs_per_bot = rigs_per_bot
+        self.switch_latency = switch_latency
+        self.price_volatility = price_volatility
+        self.tick_interval = tick_interval
+        self.seed = seed
+        self.server = MockPriceServer(latency=latency, jitter=jitter, error_rate=error_rate, seed=seed)
+        self._ticker = None
+        self._ticker_stop = threading.Event()
+
+    def start(self):
+        self.server.start()
+        # تحريك الأسعار والصعوبة باستمرار حتى تتغير القرارات أثناء الاختبار
+        self._ticker_stop.clear()
+        self._ticker = threading.Thread(target=self._tick, name='loadtest-ticker')
+        self._ticker.daemon = True
+        self._ticker.start()
+        return self
+
+    def stop(self):
+        self._ticker_stop.set()
+        if self._ticker is not None:
+            self._ticker.join()
+            self._ticker = None
+        self.server.stop()
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, exc_type, exc, tb):
+        self.stop()
+        return False
+
+    def _tick(self):
+        while not self._ticker_stop.wait(self.tick_interval):
+            self.server.random_walk(self.price_volatility)
+
+    def make_bot(self, index=0):
+        """بوت كامل موصول بالخادم المحلي وأسطول أجهزة خاص به"""
+        collector = DataCollector()
+        collector.crypto_api_url = self.server.url
+        collector.difficulty_api_url = self.server.difficulty_url
+        seed = None if self.seed is None else self.seed + index
+        rigs = RigFleet(self.rigs_per_bot, switch_latency=self.switch_latency, seed=seed)
+        return MiningBot(collector=collector, analyzer=IntelligentAnalyzer(), rigs=rigs)
+
+    def _drive(self, bots, duration, on_sample=None, sample_interval=1.0):
+        """تشغيل كل بوت في خيط بحلقة مغلقة حتى انتهاء المدة"""
+        histogram = Histogram('loadtest.decision_latency')
+        deadline = time.perf_counter() + duration
+        cycles = [0] * len(bots)
+        failures = [0] * len(bots)
+
+        def worker(slot, bot):
+            clock = time.perf_counter_ns
+            while time.perf_counter() < deadline:
+                start = clock()
+                try:
+                    bot.run_cycle()
+                except Exception:
+                    failures[slot] += 1
+                    continue
+                histogram.record(clock() - start)
+                cycles[slot] += 1
+
+        errors_before = self.server.errors
+        requests_before = self.server.requests
+        threads = [
+            threading.Thread(target=worker, args=(slot, bot), name=f'loadtest-bot-{slot}')
+            for slot, bot in enumerate(bots)
+        ]
+
+        # البوت يطبع في كل دورة؛ نوجه stdout إلى devnull وليس إلى ذاكرة تنمو مع الوقت
+        with open(os.devnull, 'w') as devnull, contextlib.redirect_stdout(devnull):
+            started = time.perf_counter()
+            for thread in threads:
+                thread.start()
+            if on_sample is not None:
+                while time.perf_counter() < deadline:
+                    time.sleep(min(sample_interval, max(0.0, deadline - time.perf_counter())))
+                    on_sample(time.perf_counter() - started, sum(cycles))
+            for thread in threads:
+                thread.join()
+            elapsed = time.perf_counter() - started
+
+        snapshot = histogram.snapshot()
+        total = sum(cycles)
+        return {
+            'concurrency': len(bots),
+            'rigs': len(bots) * self.rigs_per_bot,
+            'duration': elapsed,
+            'cycles': total,
+            'failed_cycles': sum(failures),
+            'throughput_cycles_per_second': total / elapsed if elapsed > 0 else 0.0,
+            'latency_seconds': {
+                'mean': snapshot.total / snapshot.count / 1e9 if snapshot.count else 0.0,
+                'p50': snapshot.percentile(50) / 1e9,
+                'p90': snapshot.percentile(90) / 1e9,
+                'p99': snapshot.percentile(99) / 1e9,
+                'max': snapshot.maximum / 1e9
+            },
+            'api_requests': self.server.requests - requests_before,
+            'api_errors': self.server.errors - errors_before
+        }
+
+    def run_level(self, concurrency, duration=5.0):
+        """قياس مستوى حمل واحد بعدد بوتات متزامنة"""
+        bots = [self.make_bot(index) for index in range(concurrency)]
+        return self._drive(bots, duration)
+
+    def ramp(self, levels=(1, 2, 4, 8, 16, 32, 64), duration=5.0, min_gain=0.05, latency_budget=None):
+        """زيادة الحمل تدريجياً حتى التشبع: توقف نمو الإنتاجية أو تجاوز ميزانية زمن p99"""
+        results = []
+        saturation = None
+        for concurrency in levels:
+            result = self.run_level(concurrency, duration)
+            results.append(result)
+
+            over_budget = latency_budget is not None and result['latency_seconds']['p99'] > latency_budget
+            if len(results) > 1:
+                previous = results[-2]['throughput_cycles_per_second']
+                gain = (result['throughput_cycles_per_second'] - previous) / previous if previous else 0.0
+                result['throughput_gain'] = gain
+                if gain < min_gain:
+                    saturation = results[-2]
+            if over_budget and saturation is None:
+                saturation = results[-2] if len(results) > 1 else result
+            if saturation is not None:
+                break
+
+        best = max(results, key=lambda item: item['throughput_cycles_per_second'])
+        return {
+            'levels': results,
+            'saturated': saturation is not None,
+            'saturation_concurrency': saturation['concurrency'] if saturation else None,
+            'max_throughput_cycles_per_second': best['throughput_cycles_per_second'],
+            'max_throughput_concurrency': best['concurrency']
+        }
+
+    def soak(self, concurrency=4, duration=600.0, sample_interval=5.0):
+        """تشغيل طويل بحمل ثابت مع تتبع نمو الذاكرة بمرور الوقت"""
+        process = psutil.Process()
+        bots = [self.make_bot(index) for index in range(concurrency)]
+        gc.collect()
+        samples = [(0.0, process.memory_info().rss, len(gc.get_objects()), 0)]
+
+        def on_sample(elapsed, cycles):
+            samples.append((elapsed, process.memory_info().rss, len(gc.get_objects()), cycles))
+
+        result = self._drive(bots, duration, on_sample=on_sample, sample_interval=sample_interval)
+        gc.collect()
+        samples.append((result['duration'], process.memory_info().rss, len(gc.get_objects()), result['cycles']))
+
+        times = np.array([sample[0] for sample in samples])
+        rss_mb = np.array([sample[1] for sample in samples]) / 1024 / 1024
+        # الميل الخطي أثبت من الفرق بين أول وآخر عينة أمام ضجيج المجمع
+        slope = float(np.polyfit(times, rss_mb, 1)[0]) if len(samples) > 2 else 0.0
+        result['memory'] = {
+            'rss_start_mb': float(rss_mb[0]),
+            'rss_end_mb': float(rss_mb[-1]),
+            'rss_peak_mb': float(rss_mb.max()),
+            'rss_growth_mb': float(rss_mb[-1] - rss_mb[0]),
+            'rss_growth_mb_per_hour': slope * 3600,
+            'gc_objects_start': samples[0][2],
+            'gc_objects_end': samples[-1][2]
+        }
+        result['samples'] = [
+            {'elapsed': elapsed, 'rss_mb': rss / 1024 / 1024, 'gc_objects': objects, 'cycles': cycles}
+            for elapsed, rss, objects, cycles in samples
+        ]
+        return result
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Smart mining bot load test")
+    parser.add_argument('mode', choices=('ramp', 'soak'))
+    parser.add_argument('--duration', type=float, default=None, help="seconds per ramp level / total soak time")
+    parser.add_argument('--concurrency', type=int, default=4, help="bots for soak mode")
+    parser.add_argument('--levels', default='1,2,4,8,16,32,64', help="comma separated ramp levels")
+    parser.add_argument('--rigs', type=int, default=1000, help="simulated rigs per bot")
+    parser.add_argument('--latency', type=float, default=0.005, help="mock API latency in seconds")
+    parser.add_argument('--error-rate', type=float, default=0.01, help="mock API error rate")
+    parser.add_argument('--latency-budget', type=float, default=None, help="p99 decision latency budget (ramp)")
+    parser.add_argument('--output', help="write the JSON report to this file")
+    args = parser.parse_args()
+
+    harness = LoadTestHarness(latency=args.latency, error_rate=args.error_rate, rigs_per_bot=args.rigs)
+    with harness:
+        if args.mode == 'ramp':
+            levels = tuple(int(level) for level in args.levels.split(','))
+            report = harness.ramp(levels, duration=args.duration or 5.0, latency_budget=args.latency_budget)
+            for level in report['levels']:
+                latency = level['latency_seconds']
+                print(f"bots={level['concurrency']:4d} rigs={level['rigs']:7d} "
+                      f"cycles/s={level['throughput_cycles_per_second']:8.1f} "
+                      f"p50={latency['p50'] * 1000:7.2f}ms p99={latency['p99'] * 1000:7.2f}ms "
+                      f"api_errors={level['api_errors']}")
+            print(f"Saturation at {report['saturation_concurrency']} bots; "
+                  f"max {report['max_throughput_cycles_per_second']:.1f} cycles/s")
+        else:
+            report = harness.soak(args.concurrency, duration=args.duration or 600.0)
+            memory = report['memory']
+            print(f"cycles={report['cycles']} cycles/s={report['throughput_cycles_per_second']:.1f} "
+                  f"p99={report['latency_seconds']['p99'] * 1000:.2f}ms")
+            print(f"RSS {memory['rss_start_mb']:.1f} -> {memory['rss_end_mb']:.1f} MB "
+                  f"({memory['rss_growth_mb_per_hour']:+.1f} MB/hour)")
+
+    if args.output:
+        with open(args.output, 'w', encoding='utf-8') as f:
+            json.dump(report, f, ensure_ascii=False, indent=2)
@@ -0,0 +1,389 @@
+import atexit
+import gzip
+import logging
+import os
+import shutil
+import sys
+import threading
+import time
+from collections import deque
+
+_SIZE_UNITS = {'B': 1, 'KB': 1024, 'MB': 1024 ** 2, 'GB': 1024 ** 3}
+
+DEFAULT_FORMAT = '%(asctime)s - %(levelname)s - %(message)s'
+
+
+def parse_size(value, default=10 * 1024 ** 2):
+    """تحويل حجم مثل "10MB" إلى عدد البايتات"""
+    if isinstance(value, (int, float)):
+        return int(value)
+    if not value:
+        return default
+
+    text = str(value).strip().upper()
+    for unit in ('GB', 'MB', 'KB', 'B'):
+        if text.endswith(unit):
+            number = text[:-len(unit)].strip()
+            try:
+                return int(float(number) * _SIZE_UNITS[unit])
+            except ValueError:
+                return default
+    try:
+        return int(text)
+    except ValueError:
+        return default
+
+
+class _SampleWindows:
+    """حد معدل لكل مفتاح رسالة: أول burst رسالة في كل نافذة ثم عينة 1 من sample_rate
+
+    النوافذ مرتبة حسب بدايتها (تُعاد إضافة النافذة عند تجديدها)، فتُحذف المنتهية
+    من البداية مرة كل interval، والأقدم عند بلوغ max_keys.
+    """
+
+    def __init__(self, burst=20, interval=60.0, sample_rate=100, max_keys=10000):
+        self.burst = burst
+        self.interval = interval
+        self.sample_rate = max(1, sample_rate)
+        self.max_keys = max_keys
+        # المفتاح -> [بداية النافذة، عدد الرسائل، عدد المحذوف]
+        self._windows = {}
+        self._last_prune = time.monotonic()
+        self._lock = threading.Lock()
+
+    def __len__(self):
+        return len(self._windows)
+
+    def check(self, key):
+        """إرجاع (هل تُكتب الرسالة، عدد الرسائل المحذوفة منذ آخر نافذة)"""
+        now = time.monotonic()
+        with self._lock:
+            window = self._windows.get(key)
+            if window is None or now - window[0] >= self.interval:
+                suppressed = window[2] if window is not None else 0
+                self._windows.pop(key, None)
+                if now - self._last_prune >= self.interval or len(self._windows) >= self.max_keys:
+                    self._prune(now)
+                self._windows[key] = [now, 1, 0]
+                return True, suppressed
+
+            window[1] += 1
+            if window[1] <= self.burst or window[1] % self.sample_rate == 0:
+                return True, 0
+
+            window[2] += 1
+            return False, 0
+
+    def _prune(self, now):
+        """حذف النوافذ المنتهية ثم الأقدم حتى يبقى مكان لمفتاح جديد"""
+        self._last_prune = now
+        windows = self._windows
+        while windows:
+            key = next(iter(windows))
+            if now - windows[key][0] < self.interval and len(windows) < self.max_keys:
+                break
+            del windows[key]
+
+
+class SamplingFilter(logging.Filter):
+    """تقليل رسائل النجاح المتكررة بحد معدل لكل قالب رسالة ثم أخذ عينة"""
+
+    def __init__(self, burst=20, interval=60.0, sample_rate=100, max_level=logging.INFO):
+        super().__init__()
+        self.max_level = max_level
+        self._windows = _SampleWindows(burst, interval, sample_rate)
+
+    def filter(self, record):
+        # التحذيرات والأخطاء والرسائل التي أُخذت عينتها مسبقاً تمر دائماً
+        if record.levelno > self.max_level or getattr(record, 'presampled', False):
+            return True
+
+        emit, suppressed = self._windows.check((record.name, record.msg))
+        if emit and suppressed:
+            record.msg = f"{record.getMessage()} [+{suppressed} similar suppressed]"
+            record.args = None
+        return emit
+
+
+_PRESAMPLED = {'presampled': True}
+
+
+class SampledLog:
+    """تسجيل رسائل النجاح المتكررة مع قرار أخذ العينة قبل إنشاء LogRecord
+
+    SamplingFilter يعمل بعد إنشاء السجل؛ في المسارات الساخنة (كل طلب موثق)
+    يكون إنشاء السجل نفسه هو التكلفة الأكبر، لذا نقرر هنا أولاً.
+    """
+
+    def __init__(self, logger, level=logging.INFO, burst=20, interval=60.0, sample_rate=100):
+        self.logger = logger
+        self.level = level
+        self._windows = _SampleWindows(burst, interval, sample_rate)
+
+    def __call__(self, msg, *args):
+        if not self.logger.isEnabledFor(self.level):
+            return
+        emit, suppressed = self._windows.check(msg)
+        if not emit:
+            return
+        if suppressed:
+            self.logger.log(self.level, msg + " [+%s similar suppressed]", *args, suppressed, extra=_PRESAMPLED)
+        else:
+            self.logger.log(self.level, msg, *args, extra=_PRESAMPLED)
+
+
+class _CachedTimeFormatter(logging.Formatter):
+    """منسق يعيد استخدام نص الوقت لنفس الثانية بدلاً من strftime لكل سجل"""
+
+    def __init__(self, fmt):
+        super().__init__(fmt)
+        self._cached_second = None
+        self._cached_text = ''
+
+    def formatTime(self, record, datefmt=None):
+        second = int(record.created)
+        if second != self._cached_second:
+            self._cached_second = second
+            self._cached_text = time.strftime(self.default_time_format, self.converter(record.created))
+        return self.default_msec_format % (self._cached_text, record.msecs)
+
+
+class _EnqueueHandler(logging.Handler):
+    """معالج المسار الساخن: يضع السجل في الطابور فقط دون تنسيق أو I/O"""
+
+    def __init__(self, records, max_queue):
+        super().__init__()
+        self.records = records
+        self.max_queue = max_queue
+        self.dropped = 0
+
+    def handle(self, record):
+        # لا حاجة لقفل المعالج: deque.append ذري
+        if self.filter(record):
+            if len(self.records) < self.max_queue:
+                self.records.append(record)
+            else:
+                self.dropped += 1
+            return True
+        return False
+
+    def emit(self, record):
+        self.handle(record)
+
+
+class LogPipeline:
+    """خط سجلات غير متزامن: المسار الساخن يضع في طابور وخيط خلفي يكتب على دفعات"""
+
+    def __init__(self, filename, max_bytes=10 * 1024 ** 2, backup_count=5,
+                 compress=True, batch_size=512, flush_interval=0.5,
+                 max_queue=100000, fmt=DEFAULT_FORMAT):
+        self.filename = filename
+        self.max_bytes = max_bytes
+        self.backup_count = backup_count
+        self.compress = compress
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.formatter = _CachedTimeFormatter(fmt)
+
+        self.records = deque()
+        self.handler = _EnqueueHandler(self.records, max_queue)
+        self.records_written = 0
+        self.batches_written = 0
+        # دفعات تعذرت كتابتها بعد إعادة فتح الملف، وأخطاء التدوير
+        self.records_failed = 0
+        self.batches_failed = 0
+        self.rotation_errors = 0
+
+        self._stream = None
+        self._size = 0
+        self._stop_event = threading.Event()
+        self._thread = None
+        self._lock = threading.Lock()
+
+    def start(self):
+        """تشغيل خيط الكتابة الخلفي"""
+        with self._lock:
+            if self._thread is not None:
+                return
+            self._open()
+            self._stop_event.clear()
+            self._thread = threading.Thread(target=self._run, name=f"log-writer:{self.filename}")
+            self._thread.daemon = True
+            self._thread.start()
+
+    def stop(self):
+        """إيقاف الخيط بعد تفريغ كل السجلات المتبقية"""
+        with self._lock:
+            if self._thread is None:
+                return
+            self._stop_event.set()
+            self._thread.join()
+            self._thread = None
+            if self._stream is not None:
+                self._stream.close()
+                self._stream = None
+
+    def flush(self, timeout=5.0):
+        """انتظار تفريغ الطابور (مفيد للاختبارات والإيقاف)"""
+        deadline = time.monotonic() + timeout
+        while self.records and time.monotonic() < deadline:
+            time.sleep(0.01)
+
+    def _open(self):
+        directory = os.path.dirname(self.filename)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        self._stream = open(self.filename, 'a', encoding='utf-8')
+        self._size = self._stream.tell()
+
+    def _run(self):
+        while True:
+            stopping = self._stop_event.wait(self.flush_interval)
+            while self.records:
+                try:
+                    self._write_batch(self._drain())
+                except OSError as exc:
+                    # خطأ في التدوير أو إعادة الفتح لا يجب أن يوقف خيط الكتابة
+                    self.rotation_errors += 1
+                    self._report(f"log rotation failed for {self.filename}: {exc}")
+            if stopping:
+                break
+
+    def _drain(self):
+        """سحب دفعة من السجلات المتراكمة دون انتظار"""
+        batch = []
+        pop = self.records.popleft
+        try:
+            while len(batch) < self.batch_size:
+                batch.append(pop())
+        except IndexError:
+            pass
+        return batch
+
+    def _write_batch(self, batch):
+        lines = []
+        for record in batch:
+            try:
+                lines.append(self.formatter.format(record))
+            except Exception:
+                lines.append(f"<unformattable log record: {record.msg!r}>")
+        payload = '\n'.join(lines) + '\n'
+
+        if not self._write(payload):
+            # محاولة ثانية بعد إعادة فتح الملف (حذف الملف أو إغلاق الدفق)
+            try:
+                self._reopen()
+            except OSError as exc:
+                self._report(f"log reopen failed for {self.filename}: {exc}")
+            if not self._write(payload):
+                self.records_failed += len(batch)
+                self.batches_failed += 1
+                self._report(f"dropped {len(batch)} log records for {self.filename} "
+                             f"({self.batches_failed} batches failed so far)")
+                return
+
+        self._size += len(payload.encode('utf-8'))
+        self.records_written += len(batch)
+        self.batches_written += 1
+
+        if self.max_bytes and self._size >= self.max_bytes:
+            self._rotate()
+
+    def _write(self, payload):
+        if self._stream is None:
+            return False
+        try:
+            self._stream.write(payload)
+            self._stream.flush()
+            return True
+        except (OSError, ValueError):
+            return False
+
+    def _reopen(self):
+        if self._stream is not None:
+            try:
+                self._stream.close()
+            except OSError:
+                pass
+            self._stream = None
+        self._open()
+
+    @staticmethod
+    def _report(message):
+        # لا يمكن تسجيل فشل خط السجلات عبره؛ stderr هو الملاذ الأخير
+        print(f"log_pipeline: {message}", file=sys.stderr)
+
+    def _rotate(self):
+        """تدوير الملف وضغط النسخ الاحتياطية (يُعاد فتح الملف حتى عند الفشل)"""
+        self._stream.close()
+        self._stream = None
+        suffix = '.gz' if self.compress else ''
+
+        try:
+            if self.backup_count > 0:
+                for index in range(self.backup_count - 1, 0, -1):
+                    source = f"{self.filename}.{index}{suffix}"
+                    target = f"{self.filename}.{index + 1}{suffix}"
+                    if os.path.exists(source):
+                        os.replace(source, target)
+
+                first_backup = f"{self.filename}.1"
+                os.replace(self.filename, first_backup)
+                if self.compress:
+                    with open(first_backup, 'rb') as src, gzip.open(first_backup + '.gz', 'wb') as dst:
+                        shutil.copyfileobj(src, dst)
+                    os.remove(first_backup)
+            else:
+                os.remove(self.filename)
+        finally:
+            self._open()
+
+
+_pipelines = {}
+_pipelines_lock = threading.Lock()
+
+
+def get_pipeline(filename, config=None):
+    """إرجاع خط السجلات الخاص بالملف (واحد لكل ملف في العملية)"""
+    performance = (config or {}).get('performance', {})
+    with _pipelines_lock:
+        pipeline = _pipelines.get(filename)
+        if pipeline is None:
+            pipeline = LogPipeline(
+                filename,
+                max_bytes=parse_size(performance.get('max_log_size', '10MB')),
+                backup_count=5 if performance.get('backup_logs', True) else 0,
+            )
+            pipeline.handler.addFilter(SamplingFilter())
+            pipeline.start()
+            _pipelines[filename] = pipeline
+        return pipeline
+
+
+def get_logger(name, filename, config=None):
+    """إعداد مسجل مرتبط بخط سجلات غير متزامن بدلاً من logging.basicConfig"""
+    performance = (config or {}).get('performance', {})
+    level = logging.getLevelName(str(performance.get('log_level', 'INFO')).upper())
+    if not isinstance(level, int):
+        level = logging.INFO
+
+    pipeline = get_pipeline(filename, config)
+    logger = logging.getLogger(name)
+    logger.setLevel(level)
+    if pipeline.handler not in logger.handlers:
+        logger.addHandler(pipeline.handler)
+    # عدم تمرير السجلات إلى الجذر حتى لا تتكرر الكتابة المتزامنة
+    logger.propagate = False
+    return logger
+
+
+def shutdown():
+    """تفريغ وإيقاف جميع خطوط السجلات"""
+    with _pipelines_lock:
+        pipelines = list(_pipelines.values())
+        _pipelines.clear()
+    for pipeline in pipelines:
+        pipeline.stop()
+
+
+atexit.register(shutdown)
@@ -1,11 +1,41 @@
+import json
+import threading
 import time
+from checkpoint import BinaryReader, BinaryWriter
+from coin_algorithms import algorithm_for
+from instrumentation import span, timed
 
 class MiningBot:
-    def __init__(self):
+    def __init__(self, collector=None, analyzer=None, rigs=None, ledger=None, security=None):
         self.data = {}
         self.mining_status = "idle"
+        self.target_coin = None
+        self.recommendation = None
+        self.cycles = 0
+        # مكونات اختيارية؛ بدونها تعمل المراحل بالسلوك التجريبي الحالي
+        self.collector = collector
+        self.analyzer = analyzer
+        self.rigs = rigs
+        # دفتر اختياري لمقارنة الربح المحقق بالمتوقع
+        self.ledger = ledger
+        # وحدة أمان اختيارية تُحفظ جلساتها ومفاتيحها مع نقاط حفظ البوت
+        self.security = security
+        self.price_stream = None
+        # الدورة الدورية وإعادة التحليل عند تغير السعر لا تتداخلان
+        self._lock = threading.Lock()
+        # عداد التعديلات لنقاط الحفظ: يتغير مع أي تغيير في الحالة المصدرة وليس مع الدورات فقط
+        self._version = 0
 
+    @timed('bot.collect_data')
     def collect_data(self):
+        if self.collector is not None:
+            self.data = self.collector.collect_all_data()
+            if self.rigs is not None:
+                self.data["hardware_status"] = self.rigs.hardware_status()
+            if self.ledger is not None:
+                self._record_earnings()
+            self._version += 1
+            return
         # Placeholder for data collection logic
         print("Collecting data...")
         self.data = {
@@ -16,7 +46,37 @@ class MiningBot:
         time.sleep(1)
         print("Data collected.")
 
+    def _record_earnings(self):
+        """تسجيل إحصاءات المجمع وحصص الأجهزة والمدفوعات في الدفتر"""
+        for coin, stats in self.data.get("pool_stats", {}).items():
+            self.ledger.ingest_pool_stats(coin, stats)
+        if self.rigs is not None and hasattr(self.rigs, "collect_shares"):
+            self.ledger.add_shares(self.rigs.collect_shares())
+        prices = self.data.get("crypto_prices") or {}
+        for coin, payouts in self.data.get("pool_payouts", {}).items():
+            algorithm = algorithm_for(coin)
+            price_id = algorithm.coins[coin]['price_id'] if algorithm is not None else None
+            price = (prices.get(price_id) or {}).get('usd')
+            if price is None:
+                # بدون سعر حالي تُؤجل المدفوعات للدورة التالية (txid يمنع التكرار)
+                continue
+            self.ledger.ingest_payouts(coin, payouts, price)
+
+    def profit_reconciliation(self, days=7):
+        """الربح اليومي المحقق مقابل المتوقع لآخر days يوماً من الدفتر"""
+        if self.ledger is None:
+            return []
+        now = time.time()
+        return self.ledger.daily_profit(now - days * 86400, now)
+
+    @timed('bot.analyze_data')
     def analyze_data(self):
+        if self.analyzer is not None:
+            self.recommendation = self.analyzer.recommend_mining_strategy(self.data)
+            if self.ledger is not None and self.recommendation and self.recommendation.get('recommended_coin'):
+                self.ledger.add_expected_profit(self.recommendation['recommended_coin'],
+                                                self.recommendation['expected_daily_profit'])
+            return self.recommendation.get('recommended_coin') if self.recommendation else None
         # Placeholder for intelligent analysis logic
         print("Analyzing data...")
         # This is where AI/ML algorithms would go
@@ -25,35 +85,138 @@ class MiningBot:
         print("Data analyzed.")
         return profitable_coin
 
+    @timed('bot.make_decision')
     def make_decision(self, profitable_coin):
+        # التوصية والبيانات تتغير قبل كل قرار (في الدورة وفي إعادة التحليل)
+        self._version += 1
+        if self.analyzer is not None:
+            self.target_coin = profitable_coin
+            self.mining_status = f"mining {profitable_coin}" if profitable_coin else "idle"
+            return
         # Placeholder for decision-making logic
         print(f"Deciding to mine: {profitable_coin}")
         self.mining_status = f"mining {profitable_coin}"
         time.sleep(1)
         print("Decision made.")
 
+    @timed('bot.control_mining')
     def control_mining(self):
+        if self.rigs is not None:
+            self.rigs.switch(self.target_coin)
+            return
         # Placeholder for mining control logic
         print(f"Controlling mining operations: {self.mining_status}")
         # Interact with mining software/hardware here
         time.sleep(2)
         print("Mining operations controlled.")
 
-    def run(self):
-        print("Mining bot started.")
-        while True:
+    def run_cycle(self):
+        """دورة واحدة كاملة: جمع ← تحليل ← قرار ← تحكم"""
+        with self._lock, span('bot.cycle'):
             self.collect_data()
             profitable_coin = self.analyze_data()
             self.make_decision(profitable_coin)
             self.control_mining()
+            self.cycles += 1
+        return self.mining_status
+
+    def watch_prices(self, stream):
+        """الاشتراك في تغذية أسعار: الجمع يقرأ من الجدول الحي وكل تغير يعيد التحليل فوراً"""
+        self.price_stream = stream
+        stream.on_change = lambda _: self.reanalyze()
+        if self.collector is not None:
+            self.collector.price_stream = stream
+        stream.start()
+
+    def reanalyze(self):
+        """تحليل وقرار بأحدث أسعار التغذية دون انتظار الدورة التالية"""
+        if self.analyzer is None or not self.data or self.price_stream is None:
+            return None
+        with self._lock, span('bot.reanalyze'):
+            self.data["crypto_prices"] = self.price_stream.prices_snapshot()
+            self.make_decision(self.analyze_data())
+            self.control_mining()
+        return self.mining_status
+
+    @property
+    def state_version(self):
+        return self._version
+
+    def export_state(self):
+        """تسلسل حالة البوت (الحالة، العملة، آخر بيانات وتوصية) لنقاط الحفظ"""
+        writer = BinaryWriter()
+        # إعادة التحليل تعدل الحالة من خيط التغذية أثناء الحفظ
+        with self._lock:
+            writer.text(json.dumps({
+                "mining_status": self.mining_status,
+                "target_coin": self.target_coin,
+                "data": self.data,
+                "recommendation": self.recommendation,
+                "cycles": self.cycles
+            }, ensure_ascii=False))
+        return writer.getvalue()
+
+    def import_state(self, data):
+        state = json.loads(BinaryReader(data).text())
+        self.mining_status = state["mining_status"]
+        self.target_coin = state["target_coin"]
+        self.data = state["data"]
+        self.recommendation = state["recommendation"]
+        self.cycles = state["cycles"]
+        self._version += 1
+
+    def resume(self, checkpointer):
+        """استعادة الحالة واتخاذ قرار فوري من آخر بيانات محفوظة قبل أول جمع جديد"""
+        checkpointer.register("bot", self)
+        if self.analyzer is not None and hasattr(self.analyzer, "export_state"):
+            checkpointer.register("analyzer", self.analyzer)
+        if self.security is not None:
+            self.security.register_checkpoint(checkpointer)
+        restored = checkpointer.restore()
+        if "bot" in restored and self.data and self.analyzer is not None:
+            # القفل نفسه الذي تأخذه الدورة وإعادة التحليل من خيط التغذية
+            with self._lock, span('bot.resume'):
+                self.make_decision(self.analyze_data())
+                self.control_mining()
+        return restored
+
+    def run(self, checkpointer=None):
+        print("Mining bot started.")
+        # الاستعادة قبل الاشتراك في التغذية حتى لا يعمل reanalyze على حالة لم تُستعد بعد
+        if checkpointer is not None:
+            restored = self.resume(checkpointer)
+            if restored:
+                print(f"Resumed from checkpoint: {self.mining_status}")
+        stream = getattr(self.collector, "price_stream", None)
+        if stream is not None and self.price_stream is None:
+            self.watch_prices(stream)
+        while True:
+            self.run_cycle()
+            if checkpointer is not None:
+                checkpointer.save()
             print("\nCycle complete. Waiting for next cycle...")
             time.sleep(5) # Wait for 5 seconds before next cycle
 
 if __name__ == "__main__":
-    bot = MiningBot()
+    from checkpoint import Checkpointer
+    from data_collector import DataCollector
+    from intelligent_analyzer import IntelligentAnalyzer
+    from security_module import SecurityModule
+
+    try:
+        with open('config.json', 'r', encoding='utf-8') as f:
+            config = json.load(f)
+    except FileNotFoundError:
+        config = {}
+
+    # المحلل ووحدة الأمان يُسجلان في نقاط الحفظ عبر resume فتشملهما الاستعادة الدافئة
+    bot = MiningBot(collector=DataCollector(config), analyzer=IntelligentAnalyzer(config),
+                    security=SecurityModule(config))
+    checkpointer = Checkpointer(config=config)
     try:
-        bot.run()
+        bot.run(checkpointer)
     except KeyboardInterrupt:
+        checkpointer.save()
         print("\nMining bot stopped by user.")
 
 
@@ -0,0 +1,367 @@
+import json
+import random
+import threading
+import time
+from collections import deque
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlparse
+
+from api_server import WebSocketBroadcaster, encode_frame
+from price_sources import BINANCE_SYMBOLS
+
+DEFAULT_PRICES = {
+    'bitcoin': {'usd': 60000.0, 'usd_24h_change': 2.5},
+    'ethereum': {'usd': 3000.0, 'usd_24h_change': -1.2},
+    'litecoin': {'usd': 150.0, 'usd_24h_change': 0.8},
+    'monero': {'usd': 160.0, 'usd_24h_change': 0.3}
+}
+
+DEFAULT_DIFFICULTY = {
+    'BTC': {'difficulty': 62463471666286, 'hash_rate': '400 EH/s'},
+    'ETH': {'difficulty': 15500000000000000, 'hash_rate': '900 TH/s'}
+}
+
+
+class MockPriceServer:
+    """خادم HTTP محلي يحاكي CoinGecko وBinance وCoinCap وتغذية الصعوبة بزمن استجابة ونسبة أخطاء قابلة للضبط
+
+    bias يضرب كل الأسعار المعروضة لمحاكاة مزود يعطي أسعاراً منحرفة.
+    """
+
+    def __init__(self, latency=0.0, jitter=0.0, error_rate=0.0, prices=None, difficulty=None, seed=None, bias=0.0):
+        self.latency = latency
+        self.jitter = jitter
+        self.error_rate = error_rate
+        self.bias = bias
+        self.prices = json.loads(json.dumps(prices or DEFAULT_PRICES))
+        self.difficulty = json.loads(json.dumps(difficulty or DEFAULT_DIFFICULTY))
+        self.requests = 0
+        self.errors = 0
+        # سجل المدفوعات لكل عملة بصيغة ethermine (paidOn, amount, txHash)
+        self.payouts = {}
+        self._random = random.Random(seed)
+        self._lock = threading.Lock()
+        self._server = None
+        self._thread = None
+
+    @property
+    def url(self):
+        host, port = self._server.server_address[:2]
+        return f"http://{host}:{port}/api/v3/simple/price"
+
+    @property
+    def binance_url(self):
+        host, port = self._server.server_address[:2]
+        return f"http://{host}:{port}/api/v3/ticker/24hr"
+
+    @property
+    def coincap_url(self):
+        host, port = self._server.server_address[:2]
+        return f"http://{host}:{port}/v2/assets"
+
+    @property
+    def pool_stats_url(self):
+        host, port = self._server.server_address[:2]
+        return f"http://{host}:{port}/poolStats"
+
+    def payouts_url(self, coin):
+        host, port = self._server.server_address[:2]
+        return f"http://{host}:{port}/payouts?coin={coin}"
+
+    @property
+    def difficulty_url(self):
+        host, port = self._server.server_address[:2]
+        return f"http://{host}:{port}/difficulty"
+
+    def start(self):
+        """تشغيل الخادم على منفذ عشوائي متاح"""
+        owner = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_GET(self):
+                owner._handle(self)
+
+            def log_message(self, *args):
+                pass
+
+        self._server = ThreadingHTTPServer(('127.0.0.1', 0), Handler)
+        self._server.daemon_threads = True
+        self._thread = threading.Thread(target=self._server.serve_forever, name='mock-price-server')
+        self._thread.daemon = True
+        self._thread.start()
+        return self
+
+    def stop(self):
+        if self._server is not None:
+            self._server.shutdown()
+            self._server.server_close()
+            self._server = None
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, exc_type, exc, tb):
+        self.stop()
+        return False
+
+    def set_price(self, coin, usd, change=None):
+        """تحديث سعر عملة أثناء التشغيل"""
+        with self._lock:
+            entry = self.prices.setdefault(coin, {'usd': usd, 'usd_24h_change': 0.0})
+            entry['usd'] = usd
+            if change is not None:
+                entry['usd_24h_change'] = change
+
+    def add_payout(self, coin, amount, timestamp=None):
+        """إضافة دفعة إلى سجل المجمع الوهمي"""
+        with self._lock:
+            entries = self.payouts.setdefault(coin, [])
+            entries.append({
+                'paidOn': int(time.time() if timestamp is None else timestamp),
+                'amount': amount,
+                'txHash': f"0x{self._random.getrandbits(256):064x}"
+            })
+
+    def random_walk(self, volatility=0.001):
+        """تحريك كل الأسعار (والصعوبة بتقلب أقل) خطوة عشوائية صغيرة"""
+        with self._lock:
+            for entry in self.prices.values():
+                entry['usd'] *= 1 + self._random.gauss(0, volatility)
+            for entry in self.difficulty.values():
+                entry['difficulty'] = int(entry['difficulty'] * (1 + self._random.gauss(0, volatility / 10)))
+
+    def _handle(self, handler):
+        with self._lock:
+            self.requests += 1
+            delay = max(0.0, self.latency + self._random.uniform(-self.jitter, self.jitter))
+            fail = self._random.random() < self.error_rate
+            if fail:
+                self.errors += 1
+
+        if delay:
+            time.sleep(delay)
+
+        if fail:
+            handler.send_response(429)
+            handler.send_header('Content-Length', '0')
+            handler.end_headers()
+            return
+
+        url = urlparse(handler.path)
+        query = parse_qs(url.query)
+        with self._lock:
+            if url.path == '/difficulty':
+                body = json.dumps(self.difficulty.get(query.get('coin', [''])[0], {})).encode()
+            elif url.path == '/poolStats':
+                # بصيغة ethermine: معدل هاش المجمع وعدد العمال
+                body = json.dumps({'status': 'OK', 'data': {'poolStats': {
+                    'hashRate': 9.2e14 * (1 + self._random.gauss(0, 0.01)),
+                    'workers': 250000 + self._random.randint(-500, 500)
+                }}}).encode()
+            elif url.path == '/payouts':
+                body = json.dumps({'status': 'OK', 'data': self.payouts.get(query.get('coin', [''])[0], [])}).encode()
+            elif url.path == '/api/v3/ticker/24hr':
+                body = json.dumps(self._binance_tickers(json.loads(query.get('symbols', ['[]'])[0]))).encode()
+            else:
+                coins = query.get('ids', [''])[0].split(',')
+                prices = {
+                    coin: dict(self.prices[coin], usd=self.prices[coin]['usd'] * (1 + self.bias))
+                    for coin in coins if coin in self.prices
+                }
+                if url.path == '/v2/assets':
+                    prices = {'data': [
+                        {'id': coin, 'priceUsd': str(entry['usd']), 'changePercent24Hr': str(entry['usd_24h_change'])}
+                        for coin, entry in prices.items()
+                    ]}
+                body = json.dumps(prices).encode()
+
+        handler.send_response(200)
+        handler.send_header('Content-Type', 'application/json')
+        handler.send_header('Content-Length', str(len(body)))
+        handler.end_headers()
+        handler.wfile.write(body)
+
+
+    def _binance_tickers(self, symbols):
+        tickers = []
+        for coin, symbol in BINANCE_SYMBOLS.items():
+            if symbol in symbols and coin in self.prices:
+                entry = self.prices[coin]
+                tickers.append({
+                    'symbol': symbol,
+                    'lastPrice': f"{entry['usd'] * (1 + self.bias):.8f}",
+                    'priceChangePercent': f"{entry['usd_24h_change']:.3f}"
+                })
+        return tickers
+
+
+class MockTickerServer:
+    """تغذية أسعار WebSocket محلية: لقطة عند الاتصال ثم رسالة لكل تغير سعر
+
+    كل رسالة تحمل رقماً تسلسلياً، والاتصال بـ ?since=N يعيد إرسال ما فات من
+    ذاكرة الإعادة إن كان متاحاً (استئناف) وإلا لقطة كاملة.
+    """
+
+    def __init__(self, prices=None, replay=1024, seed=None, host='127.0.0.1', port=0):
+        self.prices = json.loads(json.dumps(prices or DEFAULT_PRICES))
+        self.seq = 0
+        self._replay = deque(maxlen=replay)
+        self._random = random.Random(seed)
+        self._lock = threading.Lock()
+        self.broadcaster = WebSocketBroadcaster(host, port, on_connect=self._snapshot_frame,
+                                                on_subscribe=self._subscribe)
+
+    @property
+    def url(self):
+        host, port = self.broadcaster.address
+        return f"ws://{host}:{port}/stream"
+
+    def start(self):
+        self.broadcaster.start()
+        return self
+
+    def stop(self):
+        self.broadcaster.stop()
+
+    def restart(self):
+        """قطع كل الاتصالات ثم الاستماع من جديد على نفس المنفذ (لمحاكاة انقطاع)"""
+        self.broadcaster.stop()
+        self.broadcaster.start()
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, exc_type, exc, tb):
+        self.stop()
+        return False
+
+    @property
+    def client_count(self):
+        return self.broadcaster.client_count
+
+    def _snapshot_frame(self):
+        with self._lock:
+            payload = {'type': 'snapshot', 'seq': self.seq, 'prices': self.prices}
+            return encode_frame(json.dumps(payload, separators=(',', ':')).encode())
+
+    def _subscribe(self, path):
+        since = parse_qs(urlparse(path).query).get('since', [None])[0]
+        with self._lock:
+            if since is not None and self._replay and self._replay[0][0] - 1 <= int(since) <= self.seq:
+                # الإطارات جاهزة مسبقاً فتُدمج كما هي في إرسال واحد
+                return b''.join(frame for seq, frame in self._replay if seq > int(since))
+        return self._snapshot_frame()
+
+    def publish(self, coin, usd, change=None):
+        """تحديث سعر عملة وبث رسالة ticker بها"""
+        with self._lock:
+            entry = self.prices.setdefault(coin, {'usd': usd, 'usd_24h_change': 0.0})
+            entry['usd'] = usd
+            if change is not None:
+                entry['usd_24h_change'] = change
+            self.seq += 1
+            payload = {'type': 'ticker', 'seq': self.seq, 'coin': coin, 'ts': time.time(), **entry}
+            frame = encode_frame(json.dumps(payload, separators=(',', ':')).encode())
+            self._replay.append((self.seq, frame))
+        self.broadcaster.broadcast(frame)
+        return self.seq
+
+    def add_payout(self, coin, amount, timestamp=None):
+        """إضافة دفعة إلى سجل المجمع الوهمي"""
+        with self._lock:
+            entries = self.payouts.setdefault(coin, [])
+            entries.append({
+                'paidOn': int(time.time() if timestamp is None else timestamp),
+                'amount': amount,
+                'txHash': f"0x{self._random.getrandbits(256):064x}"
+            })
+
+    def random_walk(self, volatility=0.001):
+        """تحريك كل الأسعار خطوة عشوائية وبث تحديث لكل عملة"""
+        for coin in list(self.prices):
+            self.publish(coin, self.prices[coin]['usd'] * (1 + self._random.gauss(0, volatility)))
+
+
+class SimulatedRig:
+    """جهاز تعدين وهمي بحالة بسيطة"""
+
+    __slots__ = ('name', 'coin', 'hash_rate', 'power', 'temperature', 'switches', 'share_progress')
+
+    def __init__(self, name, hash_rate, power, temperature):
+        self.name = name
+        self.coin = None
+        self.hash_rate = hash_rate
+        self.power = power
+        self.temperature = temperature
+        self.switches = 0
+        # كسر الحصة المتراكم منذ آخر حصة مرسلة
+        self.share_progress = 0.0
+
+
+class RigFleet:
+    """أسطول من الأجهزة الوهمية يتحكم فيه البوت ويقدم حالة مجمعة للأجهزة"""
+
+    def __init__(self, count=1000, switch_latency=0.0, seed=None, share_difficulty=4e9, pool='mock-pool'):
+        self._random = random.Random(seed)
+        self.switch_latency = switch_latency
+        # صعوبة الحصة بعدد الهاشات (4G كما في مجمعات Ethash)
+        self.share_difficulty = share_difficulty
+        self.pool = pool
+        self._last_shares = time.time()
+        self.rigs = [
+            SimulatedRig(
+                f"rig-{index}",
+                hash_rate=self._random.uniform(40, 60),
+                power=self._random.uniform(200, 300),
+                temperature=self._random.uniform(55, 75)
+            )
+            for index in range(count)
+        ]
+
+    def __len__(self):
+        return len(self.rigs)
+
+    def hardware_status(self):
+        """حالة مجمعة بنفس شكل DataCollector.get_hardware_status"""
+        count = len(self.rigs) or 1
+        active = [rig for rig in self.rigs if rig.coin is not None]
+        return {
+            "gpu_temp": sum(rig.temperature for rig in self.rigs) / count,
+            "gpu_usage": 100 * len(active) / count,
+            "power_consumption": sum(rig.power for rig in self.rigs) / count,
+            "hash_rate": f"{sum(rig.hash_rate for rig in active):.0f} MH/s",
+            "device": "gpu",
+            # معدل الجهاز الواحد بوحدة H/s على Ethash (الخوارزمية التي تقيسها الأجهزة الوهمية)
+            "hash_rates": {"ethash": sum(rig.hash_rate for rig in self.rigs) / count * 1e6},
+            "rigs": len(self.rigs)
+        }
+
+    def collect_shares(self, now=None, reject_rate=0.01):
+        """الحصص المرسلة منذ آخر استدعاء كصفوف (ts, coin, rig, pool, difficulty, accepted)"""
+        now = time.time() if now is None else now
+        elapsed = max(0.0, now - self._last_shares)
+        self._last_shares = now
+        rows = []
+        for rig in self.rigs:
+            if rig.coin is None:
+                continue
+            rig.share_progress += rig.hash_rate * 1e6 * elapsed / self.share_difficulty
+            while rig.share_progress >= 1.0:
+                rig.share_progress -= 1.0
+                accepted = int(self._random.random() >= reject_rate)
+                rows.append((now, rig.coin, rig.name, self.pool, self.share_difficulty, accepted))
+        return rows
+
+    def switch(self, coin):
+        """توجيه كل الأجهزة إلى عملة (None للإيقاف) وإرجاع عدد الأجهزة التي تغيرت"""
+        changed = 0
+        gauss = self._random.gauss
+        for rig in self.rigs:
+            rig.temperature = min(90.0, max(40.0, rig.temperature + gauss(0, 0.2)))
+            if rig.coin != coin:
+                rig.coin = coin
+                rig.switches += 1
+                changed += 1
+        if changed and self.switch_latency:
+            time.sleep(self.switch_latency)
+        return changed
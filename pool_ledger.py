@@ -0,0 +1,406 @@
+import json
+import os
+import sqlite3
+import threading
+import time
+from datetime import datetime, timezone
+
+from log_pipeline import get_logger
+
+SCHEMA = (
+    "CREATE TABLE IF NOT EXISTS shares ("
+    "ts REAL NOT NULL, coin TEXT NOT NULL, rig TEXT NOT NULL, pool TEXT, "
+    "difficulty REAL NOT NULL, accepted INTEGER NOT NULL)",
+    # فهرس مغطٍ: التجميع حسب العملة ومدى زمني لا يلمس الجدول نفسه
+    "CREATE INDEX IF NOT EXISTS shares_coin_ts ON shares (coin, ts, accepted, difficulty)",
+    "CREATE INDEX IF NOT EXISTS shares_rig_ts ON shares (rig, ts)",
+    "CREATE TABLE IF NOT EXISTS payouts ("
+    "ts REAL NOT NULL, coin TEXT NOT NULL, pool TEXT, amount REAL NOT NULL, "
+    "usd_value REAL NOT NULL, txid TEXT UNIQUE)",
+    "CREATE INDEX IF NOT EXISTS payouts_coin_ts ON payouts (coin, ts)",
+    "CREATE TABLE IF NOT EXISTS pool_stats ("
+    "ts REAL NOT NULL, coin TEXT NOT NULL, pool TEXT, hash_rate REAL, workers INTEGER, payload TEXT)",
+    "CREATE INDEX IF NOT EXISTS pool_stats_coin_ts ON pool_stats (coin, ts)",
+    "CREATE TABLE IF NOT EXISTS expected_profit ("
+    "ts REAL NOT NULL, coin TEXT NOT NULL, daily_profit REAL NOT NULL)",
+    "CREATE INDEX IF NOT EXISTS expected_profit_coin_ts ON expected_profit (coin, ts)"
+)
+
+INSERTS = {
+    'shares': "INSERT INTO shares VALUES (?, ?, ?, ?, ?, ?)",
+    'payouts': "INSERT OR IGNORE INTO payouts VALUES (?, ?, ?, ?, ?, ?)",
+    'pool_stats': "INSERT INTO pool_stats VALUES (?, ?, ?, ?, ?, ?)",
+    'expected_profit': "INSERT INTO expected_profit VALUES (?, ?, ?)"
+}
+
+# أعمدة التجميع المسموحة؛ اليوم يُحسب من الطابع الزمني (UTC)
+GROUP_COLUMNS = {
+    'coin': 'coin',
+    'rig': 'rig',
+    'pool': 'pool',
+    'day': 'CAST(ts / 86400 AS INTEGER)'
+}
+
+# أسماء حقول معدل الهاش وعدد العمال في واجهات المجمعات الشائعة
+HASH_RATE_KEYS = ('hashRate', 'hash_rate', 'hashrate', 'pool_scoring_hash_rate')
+WORKER_KEYS = ('workers', 'activeWorkers', 'active_workers', 'miners')
+# حقول سجل المدفوعات (ethermine: paidOn/amount/txHash، وصيغ عامة)
+PAYOUT_TIME_KEYS = ('paidOn', 'timestamp', 'ts', 'time', 'date')
+PAYOUT_AMOUNT_KEYS = ('amount', 'value', 'paid')
+PAYOUT_TXID_KEYS = ('txHash', 'txid', 'tx', 'hash', 'transaction')
+# ترتيب التخلص من المعلّق عند تجاوز الحد: الإحصاءات والحصص قبل المدفوعات
+DROP_ORDER = ('pool_stats', 'shares', 'expected_profit', 'payouts')
+
+SECONDS_PER_DAY = 86400
+
+
+def _day_string(day):
+    return datetime.fromtimestamp(day * SECONDS_PER_DAY, timezone.utc).date().isoformat()
+
+
+def _first_key(entry, keys):
+    for key in keys:
+        if entry.get(key) is not None:
+            return entry[key]
+    return None
+
+
+def _find_field(payload, keys):
+    """البحث عن أول حقل رقمي معروف في استجابة مجمع متداخلة"""
+    if isinstance(payload, dict):
+        for key in keys:
+            value = payload.get(key)
+            if isinstance(value, (int, float)):
+                return value
+        for value in payload.values():
+            found = _find_field(value, keys)
+            if found is not None:
+                return found
+    return None
+
+
+class PoolLedger:
+    """دفتر حصص ومدفوعات المجمعات في SQLite (WAL) بإدخال دفعي واستعلامات مفهرسة
+
+    الإدخالات تُجمع في الذاكرة وتُكتب بـ executemany في معاملة واحدة عند امتلاء
+    الدفعة أو كل flush_interval، فتبقى تكلفة الإدخال الواحد إلحاقاً بقائمة.
+    الاستعلامات تكتب المعلّق أولاً حتى تشمل كل ما أُدخل.
+    """
+
+    def __init__(self, db_path=None, batch_size=None, flush_interval=None, config=None):
+        settings = (config or {}).get('ledger', {})
+        self.db_path = db_path or settings.get('db_path', 'pool_ledger.db')
+        self.batch_size = batch_size or settings.get('batch_size', 5000)
+        self.flush_interval = flush_interval or settings.get('flush_interval', 1.0)
+        # حد المعلّق في الذاكرة عند تعذر الكتابة المستمر؛ الأقدم يُحذف بعده
+        self.max_pending = settings.get('max_pending', self.batch_size * 20)
+        self.dropped = 0
+        self._pending = {table: [] for table in INSERTS}
+        self._pending_count = 0
+        # بعد فشل كتابة لا يعيد الإدخال المحاولة قبل flush_interval حتى لا يكرر دفعة متضخمة مع كل حصة
+        self._retry_after = 0.0
+        self._buffer_lock = threading.Lock()
+        self._db_lock = threading.Lock()
+        self._stop_event = threading.Event()
+        self.logger = get_logger(__name__, 'pool_ledger.log', config)
+
+        directory = os.path.dirname(self.db_path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        self._db = sqlite3.connect(self.db_path, check_same_thread=False)
+        self._db.execute("PRAGMA journal_mode=WAL")
+        # مع WAL يكفي NORMAL: لا فساد عند انقطاع الطاقة، فقط قد تضيع آخر معاملة
+        self._db.execute("PRAGMA synchronous=NORMAL")
+        for statement in SCHEMA:
+            self._db.execute(statement)
+        self._db.commit()
+
+        self._flush_thread = threading.Thread(target=self._flush_loop, name='pool-ledger-flush')
+        self._flush_thread.daemon = True
+        self._flush_thread.start()
+
+    # ---- الإدخال ----
+
+    def _add(self, table, row):
+        with self._buffer_lock:
+            self._pending[table].append(row)
+            self._pending_count += 1
+            full = self._pending_count >= self.batch_size
+            self._trim_locked()
+        if full:
+            self._flush_logged()
+
+    def add_share(self, coin, rig, difficulty, accepted=True, pool=None, timestamp=None):
+        timestamp = time.time() if timestamp is None else timestamp
+        self._add('shares', (timestamp, coin, rig, pool, difficulty, int(accepted)))
+
+    def add_shares(self, rows):
+        """إدخال حصص جاهزة (ts, coin, rig, pool, difficulty, accepted) دفعة واحدة"""
+        rows = list(rows)
+        with self._buffer_lock:
+            self._pending['shares'].extend(rows)
+            self._pending_count += len(rows)
+            full = self._pending_count >= self.batch_size
+            self._trim_locked()
+        if full:
+            self._flush_logged()
+
+    def add_payout(self, coin, amount, price_usd, pool=None, txid=None, timestamp=None):
+        """دفعة مستلمة؛ txid يمنع تكرارها عند إعادة جلب سجل المجمع"""
+        timestamp = time.time() if timestamp is None else timestamp
+        self._add('payouts', (timestamp, coin, pool, amount, amount * price_usd, txid))
+
+    def add_expected_profit(self, coin, daily_profit, timestamp=None):
+        """تقدير الربح اليومي من المحلل للمقارنة بالمحقق"""
+        self._add('expected_profit', (time.time() if timestamp is None else timestamp, coin, daily_profit))
+
+    def ingest_payouts(self, coin, payouts, price_usd, pool=None):
+        """سجل مدفوعات من واجهة المجمع؛ المكرر يُتجاهل بـ txid ويعيد عدد المقروء
+
+        المبالغ بوحدة العملة والقيمة بالدولار بالسعر الحالي. سجلات بلا txid تُعرّف
+        بالعملة والوقت والمبلغ حتى لا تتكرر مع كل جلب.
+        """
+        count = 0
+        for entry in payouts or ():
+            if not isinstance(entry, dict):
+                continue
+            amount = _first_key(entry, PAYOUT_AMOUNT_KEYS)
+            timestamp = _first_key(entry, PAYOUT_TIME_KEYS)
+            if not isinstance(amount, (int, float)) or not isinstance(timestamp, (int, float)):
+                continue
+            txid = _first_key(entry, PAYOUT_TXID_KEYS) or f"{coin}:{timestamp}:{amount}"
+            self.add_payout(coin, amount, price_usd, pool=pool, txid=str(txid), timestamp=timestamp)
+            count += 1
+        return count
+
+    def ingest_pool_stats(self, coin, stats, pool=None, timestamp=None):
+        """حفظ استجابة إحصاءات مجمع مع استخراج معدل الهاش وعدد العمال إن وُجدا"""
+        if not stats:
+            return
+        self._add('pool_stats', (
+            time.time() if timestamp is None else timestamp, coin, pool,
+            _find_field(stats, HASH_RATE_KEYS), _find_field(stats, WORKER_KEYS),
+            json.dumps(stats, separators=(',', ':'))
+        ))
+
+    def flush(self):
+        """كتابة كل المعلّق في معاملة واحدة؛ يعيد عدد الصفوف
+
+        عند فشل المعاملة (تُلغى كاملة) تعود الصفوف إلى مقدمة المعلّق ثم يُرفع الخطأ.
+        """
+        with self._buffer_lock:
+            if not self._pending_count:
+                return 0
+            pending = self._pending
+            count = self._pending_count
+            self._pending = {table: [] for table in INSERTS}
+            self._pending_count = 0
+        try:
+            with self._db_lock:
+                with self._db:
+                    for table, rows in pending.items():
+                        if rows:
+                            self._db.executemany(INSERTS[table], rows)
+        except sqlite3.Error:
+            with self._buffer_lock:
+                for table, rows in pending.items():
+                    self._pending[table][:0] = rows
+                self._pending_count += count
+                self._retry_after = time.monotonic() + self.flush_interval
+                self._trim_locked()
+            raise
+        return count
+
+    def _trim_locked(self):
+        """إبقاء المعلّق تحت max_pending بحذف الأقدم (يُستدعى مع قفل المخزن)"""
+        excess = self._pending_count - self.max_pending
+        if excess <= 0:
+            return
+        for table in DROP_ORDER:
+            rows = self._pending[table]
+            removed = min(excess, len(rows))
+            if removed:
+                del rows[:removed]
+                excess -= removed
+                self._pending_count -= removed
+                self.dropped += removed
+            if excess <= 0:
+                break
+        self.logger.error("Ledger backlog over %s rows; dropped %s oldest rows so far",
+                          self.max_pending, self.dropped)
+
+    def _flush_logged(self, retry=False):
+        """كتابة من مسار الإدخال أو الخيط الخلفي: الفشل يُسجل والصفوف تبقى معلّقة لإعادة المحاولة"""
+        if not retry and time.monotonic() < self._retry_after:
+            return 0
+        try:
+            return self.flush()
+        except sqlite3.Error as e:
+            self.logger.error("Ledger flush failed, %s rows kept for retry: %s", self._pending_count, e)
+            return 0
+
+    def _flush_loop(self):
+        while not self._stop_event.wait(self.flush_interval):
+            self._flush_logged(retry=True)
+
+    # ---- الاستعلامات ----
+
+    def _query(self, sql, params):
+        self.flush()
+        with self._db_lock:
+            return self._db.execute(sql, params).fetchall()
+
+    def shares_between(self, start, end, coin=None, rig=None):
+        """الحصص في مدى زمني [start, end) لعملة أو جهاز (يستخدم الفهرس المركب)"""
+        if rig is not None:
+            sql, params = "SELECT * FROM shares WHERE rig = ? AND ts >= ? AND ts < ?", (rig, start, end)
+        elif coin is not None:
+            sql, params = "SELECT * FROM shares WHERE coin = ? AND ts >= ? AND ts < ?", (coin, start, end)
+        else:
+            sql, params = "SELECT * FROM shares WHERE ts >= ? AND ts < ?", (start, end)
+        return self._query(sql + " ORDER BY ts", params)
+
+    def share_totals(self, start, end, group_by='rig', coin=None):
+        """عدد الحصص والمقبول منها ومجموع الصعوبة لكل مجموعة"""
+        column = GROUP_COLUMNS[group_by]
+        where, params = "ts >= ? AND ts < ?", [start, end]
+        if coin is not None:
+            where, params = "coin = ? AND " + where, [coin] + params
+        rows = self._query(
+            f"SELECT {column} AS grp, COUNT(*), SUM(accepted), SUM(difficulty * accepted) "
+            f"FROM shares WHERE {where} GROUP BY grp ORDER BY grp",
+            params
+        )
+        return [
+            {
+                group_by: _day_string(group) if group_by == 'day' else group,
+                'shares': shares,
+                'accepted': accepted,
+                'accepted_difficulty': difficulty or 0.0
+            }
+            for group, shares, accepted, difficulty in rows
+        ]
+
+    def daily_profit(self, start, end, coin=None):
+        """الربح اليومي المحقق (مجموع المدفوعات بالدولار) مقابل المتوقع (متوسط التقديرات)"""
+        where, params = "ts >= ? AND ts < ?", [start, end]
+        if coin is not None:
+            where, params = "coin = ? AND " + where, [coin] + params
+        day = GROUP_COLUMNS['day']
+        realized = self._query(
+            f"SELECT {day} AS day, coin, SUM(usd_value) FROM payouts WHERE {where} GROUP BY day, coin", params
+        )
+        expected = self._query(
+            f"SELECT {day} AS day, coin, AVG(daily_profit) FROM expected_profit WHERE {where} GROUP BY day, coin",
+            params
+        )
+
+        days = {}
+        for day_index, coin_name, value in realized:
+            days.setdefault((day_index, coin_name), [0.0, None])[0] = value
+        for day_index, coin_name, value in expected:
+            days.setdefault((day_index, coin_name), [0.0, None])[1] = value
+        return [
+            {
+                'day': _day_string(day_index),
+                'coin': coin_name,
+                'realized_usd': realized_usd,
+                'expected_usd': expected_usd,
+                'difference_usd': None if expected_usd is None else realized_usd - expected_usd
+            }
+            for (day_index, coin_name), (realized_usd, expected_usd) in sorted(days.items())
+        ]
+
+    def latest_pool_stats(self, coin):
+        rows = self._query(
+            "SELECT ts, pool, hash_rate, workers FROM pool_stats WHERE coin = ? ORDER BY ts DESC LIMIT 1", (coin,)
+        )
+        if not rows:
+            return None
+        ts, pool, hash_rate, workers = rows[0]
+        return {'timestamp': ts, 'pool': pool, 'hash_rate': hash_rate, 'workers': workers}
+
+    def close(self):
+        """إيقاف خيط الكتابة وكتابة المتبقي"""
+        self._stop_event.set()
+        if self._flush_thread is not None:
+            self._flush_thread.join()
+            self._flush_thread = None
+        try:
+            self.flush()
+        finally:
+            with self._db_lock:
+                self._db.close()
+
+
+def benchmark_ingest(rigs=10000, seconds=600, share_interval=10.0, batch_size=5000, db_path=None):
+    """قياس معدل إدخال حصص أسطول كامل ثم زمن استعلامات المدى والتجميع
+
+    كل جهاز يرسل حصة كل share_interval ثانية تقريباً، فتُولد rigs * seconds / share_interval
+    حصة مع طوابع زمنية تغطي seconds ثانية.
+    """
+    import random
+    import shutil
+    import tempfile
+
+    # قاعدة مؤقتة تُحذف بعد القياس ما لم يحدد المستدعي مساراً
+    temp_dir = None
+    if db_path is None:
+        temp_dir = tempfile.mkdtemp(prefix='ledger_bench_')
+        db_path = os.path.join(temp_dir, 'ledger.db')
+    ledger = PoolLedger(db_path, batch_size=batch_size, flush_interval=3600)
+    generator = random.Random(1)
+    coins = ('BTC', 'ETH', 'LTC', 'XMR')
+    rig_names = [f"rig-{index}" for index in range(rigs)]
+    total = int(rigs * seconds / share_interval)
+    start = time.time() - seconds
+
+    try:
+        began = time.perf_counter()
+        for index in range(total):
+            rig = index % rigs
+            ledger.add_share(
+                coins[rig % len(coins)], rig_names[rig], 65536.0,
+                accepted=generator.random() > 0.01, pool='mock-pool',
+                timestamp=start + index * share_interval / rigs
+            )
+        ledger.flush()
+        ingest_seconds = time.perf_counter() - began
+
+        queries = {}
+        began = time.perf_counter()
+        ledger.shares_between(start + seconds / 2, start + seconds / 2 + 60, rig='rig-42')
+        queries['rig_range_ms'] = (time.perf_counter() - began) * 1000
+        began = time.perf_counter()
+        ledger.share_totals(start, start + seconds, group_by='coin')
+        queries['group_by_coin_ms'] = (time.perf_counter() - began) * 1000
+        began = time.perf_counter()
+        ledger.share_totals(start + seconds - 60, start + seconds, group_by='rig', coin='BTC')
+        queries['last_minute_by_rig_ms'] = (time.perf_counter() - began) * 1000
+    finally:
+        ledger.close()
+        if temp_dir is not None:
+            shutil.rmtree(temp_dir, ignore_errors=True)
+
+    return {
+        'shares': total,
+        'ingest_seconds': ingest_seconds,
+        'shares_per_second': total / ingest_seconds,
+        'fleet_share_rate': rigs / share_interval,
+        'headroom': (total / ingest_seconds) / (rigs / share_interval),
+        'queries': queries,
+        'db_path': db_path if temp_dir is None else None
+    }
+
+
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description='Pool ledger ingest benchmark')
+    parser.add_argument('--rigs', type=int, default=10000)
+    parser.add_argument('--seconds', type=int, default=600)
+    parser.add_argument('--share-interval', type=float, default=10.0)
+    parser.add_argument('--batch-size', type=int, default=5000)
+    args = parser.parse_args()
+
+    print(json.dumps(benchmark_ingest(args.rigs, args.seconds, args.share_interval, args.batch_size), indent=2))
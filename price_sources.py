@@ -0,0 +1,354 @@
+import json
+import threading
+import time
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+
+import numpy as np
+import requests
+
+from log_pipeline import get_logger
+
+# معرفات CoinGecko -> رموز أزواج Binance
+BINANCE_SYMBOLS = {
+    'bitcoin': 'BTCUSDT',
+    'ethereum': 'ETHUSDT',
+    'litecoin': 'LTCUSDT',
+    'monero': 'XMRUSDT'
+}
+
+
+class PriceSourceError(Exception):
+    """فشل مزود أسعار (خطأ شبكة، حالة HTTP، أو استجابة غير مفهومة)"""
+
+
+class PriceSource:
+    """مزود أسعار: يعيد {معرف العملة: {'usd': السعر، 'usd_24h_change': التغير}}"""
+
+    def __init__(self, name, url, timeout=10):
+        self.name = name
+        self.url = url
+        self.timeout = timeout
+        # جلسة لكل خيط: requests.Session غير آمنة للمشاركة بين خيوط المجمع
+        self._local = threading.local()
+        self._sessions = []
+        self._sessions_lock = threading.Lock()
+
+    @property
+    def session(self):
+        """جلسة الخيط الحالي (تُنشأ عند أول طلب وتعيد استخدام اتصالاتها بعد ذلك)"""
+        session = getattr(self._local, 'session', None)
+        if session is None:
+            session = requests.Session()
+            self._local.session = session
+            with self._sessions_lock:
+                self._sessions.append(session)
+        return session
+
+    def close(self):
+        with self._sessions_lock:
+            sessions, self._sessions = self._sessions, []
+        for session in sessions:
+            session.close()
+
+    def _get(self, params):
+        try:
+            response = self.session.get(self.url, params=params, timeout=self.timeout)
+        except requests.RequestException as e:
+            raise PriceSourceError(f"{self.name}: {e}") from e
+        if response.status_code != 200:
+            raise PriceSourceError(f"{self.name}: HTTP {response.status_code}")
+        try:
+            return response.json()
+        except ValueError as e:
+            raise PriceSourceError(f"{self.name}: invalid JSON") from e
+
+    def fetch(self, coins):
+        raise NotImplementedError
+
+
+class CoinGeckoSource(PriceSource):
+    def __init__(self, url="https://api.coingecko.com/api/v3/simple/price", name='coingecko', timeout=10):
+        super().__init__(name, url, timeout)
+
+    def fetch(self, coins):
+        data = self._get({'ids': ','.join(coins), 'vs_currencies': 'usd', 'include_24hr_change': 'true'})
+        return {
+            coin: {'usd': float(entry['usd']), 'usd_24h_change': float(entry.get('usd_24h_change') or 0.0)}
+            for coin, entry in data.items() if coin in coins and 'usd' in entry
+        }
+
+
+class BinanceSource(PriceSource):
+    def __init__(self, url="https://api.binance.com/api/v3/ticker/24hr", name='binance', timeout=10):
+        super().__init__(name, url, timeout)
+
+    def fetch(self, coins):
+        symbols = {BINANCE_SYMBOLS[coin]: coin for coin in coins if coin in BINANCE_SYMBOLS}
+        if not symbols:
+            return {}
+        data = self._get({'symbols': json.dumps(list(symbols), separators=(',', ':'))})
+        return {
+            symbols[entry['symbol']]: {
+                'usd': float(entry['lastPrice']),
+                'usd_24h_change': float(entry['priceChangePercent'])
+            }
+            for entry in data if entry.get('symbol') in symbols
+        }
+
+
+class CoinCapSource(PriceSource):
+    def __init__(self, url="https://api.coincap.io/v2/assets", name='coincap', timeout=10):
+        super().__init__(name, url, timeout)
+
+    def fetch(self, coins):
+        data = self._get({'ids': ','.join(coins)})
+        return {
+            entry['id']: {
+                'usd': float(entry['priceUsd']),
+                'usd_24h_change': float(entry.get('changePercent24Hr') or 0.0)
+            }
+            for entry in data.get('data', []) if entry.get('id') in coins
+        }
+
+
+SOURCE_TYPES = {
+    'coingecko': CoinGeckoSource,
+    'binance': BinanceSource,
+    'coincap': CoinCapSource
+}
+
+
+class ProviderStats:
+    """إحصاءات مزود بمتوسطات متحركة أسية للزمن ونسبة الأخطاء"""
+
+    def __init__(self, alpha=0.2, initial_latency=0.5):
+        self.alpha = alpha
+        self.latency = initial_latency
+        self.error_rate = 0.0
+        self.requests = 0
+        self.failures = 0
+        self.outliers = 0
+        self._lock = threading.Lock()
+
+    def record(self, latency, ok):
+        with self._lock:
+            self.requests += 1
+            self.latency += self.alpha * (latency - self.latency)
+            self.error_rate += self.alpha * ((0.0 if ok else 1.0) - self.error_rate)
+            if not ok:
+                self.failures += 1
+
+    def record_outlier(self):
+        """قيمة مرفوضة كقيمة شاذة تُحسب كخطأ بيانات"""
+        with self._lock:
+            self.outliers += 1
+            self.error_rate += self.alpha * (1.0 - self.error_rate)
+
+    @property
+    def score(self):
+        """الأقل أفضل: الزمن المتوقع مضخماً بنسبة الأخطاء"""
+        return self.latency * (1.0 + 4.0 * self.error_rate)
+
+    def to_dict(self):
+        return {
+            'latency_ewma': self.latency,
+            'error_rate_ewma': self.error_rate,
+            'requests': self.requests,
+            'failures': self.failures,
+            'outliers': self.outliers,
+            'score': self.score
+        }
+
+
+def reject_outliers(values, threshold=3.5, min_relative_spread=0.001):
+    """قناع القيم المقبولة حسب الانحراف عن الوسيط مقسوماً على MAD
+
+    مع أقل من ثلاث قيم لا يمكن تحديد الشاذ فتُقبل كلها. الحد الأدنى النسبي يمنع
+    رفض فروق ضئيلة عندما تتطابق معظم القيم (MAD = 0).
+    """
+    values = np.asarray(values, dtype=np.float64)
+    if len(values) < 3:
+        return np.ones(len(values), dtype=bool)
+    median = np.median(values)
+    spread = max(1.4826 * np.median(np.abs(values - median)), abs(median) * min_relative_spread)
+    return np.abs(values - median) / spread <= threshold
+
+
+class PriceAggregator:
+    """تجميع الأسعار من عدة مزودين بطلبات متحوطة ونصاب ورفض للقيم الشاذة
+
+    يبدأ بأفضل `quorum` مزودين حسب الإحصاءات، ويطلق مزوداً إضافياً عند كل فشل
+    أو كل hedge_delay دون اكتمال النصاب. رفض القيم الشاذة يحتاج ثلاث قيم، فإذا
+    اكتمل النصاب بقيمتين يختلفان بأكثر من max_spread يُطلب مزود ثالث للحسم.
+    الاستجابات المتأخرة تُحدّث الإحصاءات أيضاً حتى يُعاقب المزود البطيء في
+    الاختيارات القادمة، ومهلة كل مزود لا تتجاوز مهلة المجمع.
+    """
+
+    def __init__(self, sources, quorum=2, hedge_delay=0.15, timeout=5.0, mad_threshold=3.5, max_spread=0.01,
+                 config=None):
+        self.sources = list(sources)
+        self.quorum = max(1, min(quorum, len(self.sources)))
+        self.hedge_delay = hedge_delay
+        self.timeout = timeout
+        self.mad_threshold = mad_threshold
+        self.max_spread = max_spread
+        # الطلبات المتأخرة بعد انتهاء المهلة لا تشغل خيوط المجمع أطول من مهلته
+        for source in self.sources:
+            source.timeout = min(source.timeout, timeout)
+        self.stats = {source.name: ProviderStats() for source in self.sources}
+        self.last_result = None
+        self._executor = ThreadPoolExecutor(max_workers=len(self.sources) * 2, thread_name_prefix='price-source')
+        self.logger = get_logger(__name__, 'data_collector.log', config)
+
+    @classmethod
+    def from_config(cls, config):
+        """إنشاء المجمع من قسم price_sources في الإعدادات"""
+        settings = config.get('price_sources', {})
+        sources = []
+        for provider in settings.get('providers', []):
+            source_type = SOURCE_TYPES[provider['type']]
+            kwargs = {key: provider[key] for key in ('url', 'name', 'timeout') if key in provider}
+            sources.append(source_type(**kwargs))
+        return cls(
+            sources,
+            quorum=settings.get('quorum', 2),
+            hedge_delay=settings.get('hedge_delay', 0.15),
+            timeout=settings.get('timeout', 5.0),
+            mad_threshold=settings.get('mad_threshold', 3.5),
+            max_spread=settings.get('max_spread', 0.01),
+            config=config
+        )
+
+    def _call(self, source, coins):
+        started = time.perf_counter()
+        try:
+            result = source.fetch(coins)
+        except PriceSourceError:
+            self.stats[source.name].record(time.perf_counter() - started, False)
+            raise
+        except Exception as e:
+            self.stats[source.name].record(time.perf_counter() - started, False)
+            raise PriceSourceError(f"{source.name}: {e}") from e
+        self.stats[source.name].record(time.perf_counter() - started, True)
+        return result
+
+    def ranked_sources(self):
+        return sorted(self.sources, key=lambda source: self.stats[source.name].score)
+
+    def fetch(self, coins=("bitcoin", "ethereum")):
+        """جلب الأسعار المجمعة بصيغة CoinGecko، أو None إذا فشل كل المزودين"""
+        coins = list(coins)
+        pending_sources = self.ranked_sources()
+        deadline = time.perf_counter() + self.timeout
+        running = {}
+        responses = {}
+        errors = {}
+
+        def launch():
+            source = pending_sources.pop(0)
+            running[self._executor.submit(self._call, source, coins)] = source
+
+        for _ in range(self.quorum):
+            launch()
+
+        while True:
+            satisfied = len(responses) >= self.quorum
+            if satisfied and len(responses) < 3 and self._disputed(coins, responses):
+                # قيمتان متعارضتان لا تكشفان أيهما الشاذ؛ ننتظر مزوداً ثالثاً إن وُجد
+                satisfied = not running and not pending_sources
+                if not running and pending_sources:
+                    launch()
+            if satisfied or not running:
+                break
+            remaining = deadline - time.perf_counter()
+            if remaining <= 0:
+                break
+            wait_time = min(self.hedge_delay, remaining) if pending_sources else remaining
+            done, _ = wait(list(running), timeout=wait_time, return_when=FIRST_COMPLETED)
+            for future in done:
+                source = running.pop(future)
+                try:
+                    responses[source.name] = future.result()
+                except PriceSourceError as e:
+                    errors[source.name] = str(e)
+                    if pending_sources:
+                        launch()
+            # لا استجابة خلال مهلة التحوط: نطلق المزود التالي بالتوازي
+            if not done and pending_sources:
+                launch()
+
+        # ما لم يبدأ بعد يُلغى؛ الجاري ينتهي خلال مهلة المزود ويحدّث الإحصاءات فقط
+        for future in running:
+            future.cancel()
+        if len(responses) < self.quorum:
+            self.logger.warning("Price quorum not reached (%s/%s): %s", len(responses), self.quorum, errors)
+        if not responses:
+            self.last_result = {'prices': None, 'sources': [], 'errors': errors}
+            return None
+
+        prices, details = self._combine(coins, responses)
+        self.last_result = {'prices': prices, 'sources': list(responses), 'errors': errors, 'coins': details}
+        return prices
+
+    def _disputed(self, coins, responses):
+        """هل تختلف قيم أي عملة بأكثر من max_spread (نسبة إلى الوسيط)"""
+        for coin in coins:
+            values = [quote[coin]['usd'] for quote in responses.values() if coin in quote]
+            if len(values) < 2:
+                continue
+            median = float(np.median(values))
+            if median and (max(values) - min(values)) / abs(median) > self.max_spread:
+                return True
+        return False
+
+    def _combine(self, coins, responses):
+        prices = {}
+        details = {}
+        for coin in coins:
+            quotes = [(name, quote[coin]) for name, quote in responses.items() if coin in quote]
+            if not quotes:
+                continue
+            accepted = reject_outliers([entry['usd'] for _, entry in quotes], self.mad_threshold)
+            rejected = [name for (name, _), keep in zip(quotes, accepted) if not keep]
+            for name in rejected:
+                self.stats[name].record_outlier()
+            kept = [entry for (_, entry), keep in zip(quotes, accepted) if keep]
+            prices[coin] = {
+                'usd': float(np.median([entry['usd'] for entry in kept])),
+                'usd_24h_change': float(np.median([entry['usd_24h_change'] for entry in kept]))
+            }
+            details[coin] = {'sources': [name for (name, _), keep in zip(quotes, accepted) if keep], 'rejected': rejected}
+        return prices, details
+
+    def provider_stats(self):
+        return {name: stats.to_dict() for name, stats in self.stats.items()}
+
+    def close(self):
+        self._executor.shutdown(wait=False, cancel_futures=True)
+        for source in self.sources:
+            source.close()
+
+
+if __name__ == "__main__":
+    from mock_services import MockPriceServer
+
+    # ثلاثة مزودين محليين: سريع، بطيء متقطع، ومزود بأسعار منحرفة
+    servers = [
+        MockPriceServer(latency=0.01, seed=1).start(),
+        MockPriceServer(latency=0.3, error_rate=0.3, seed=2).start(),
+        MockPriceServer(latency=0.02, bias=0.05, seed=3).start()
+    ]
+    aggregator = PriceAggregator([
+        CoinGeckoSource(servers[0].url),
+        BinanceSource(servers[1].binance_url),
+        CoinCapSource(servers[2].coincap_url)
+    ], quorum=3)
+    try:
+        for _ in range(20):
+            aggregator.fetch(["bitcoin", "ethereum"])
+        print(json.dumps(aggregator.last_result, indent=2))
+        print(json.dumps(aggregator.provider_stats(), indent=2))
+    finally:
+        aggregator.close()
+        for server in servers:
+            server.stop()
@@ -0,0 +1,237 @@
+import json
+import random
+import threading
+import time
+
+import websocket
+
+from instrumentation import INSTRUMENTATION, record
+from log_pipeline import get_logger
+
+
+class StreamGap(Exception):
+    """رقم تسلسلي مفقود في التغذية؛ يُعاد الاتصال للاستئناف من آخر رقم مطبق"""
+
+
+class PriceStream:
+    """اشتراك WebSocket دائم في تغذية الأسعار بدلاً من استطلاع REST كل دورة
+
+    الرسائل: لقطة {'type': 'snapshot', 'seq', 'prices'} ثم {'type': 'ticker', 'seq',
+    'coin', 'usd', 'usd_24h_change'} لكل تغير. تُطبق التحديثات على جدول الأسعار في
+    مكانه، وعند الانقطاع يُعاد الاتصال بتراجع أسي مع ?since=آخر رقم لاستئناف ما فات.
+    عند تغير سعر بأكثر من threshold يُستدعى on_change في خيط منفصل، وتُدمج
+    التغيرات المتلاحقة أثناء التحليل في استدعاء واحد.
+    """
+
+    def __init__(self, url=None, threshold=None, on_change=None, backoff_initial=0.5, backoff_max=None,
+                 idle_timeout=None, max_age=None, config=None):
+        settings = (config or {}).get('price_stream', {})
+        self.url = url or settings.get('url')
+        self.threshold = threshold if threshold is not None else settings.get('threshold', 0.002)
+        self.on_change = on_change
+        self.backoff_initial = backoff_initial
+        self.backoff_max = backoff_max or settings.get('backoff_max', 30.0)
+        self.idle_timeout = idle_timeout or settings.get('idle_timeout', 30.0)
+        self.max_age = max_age or settings.get('max_age', 60.0)
+
+        self.prices = {}
+        self.seq = 0
+        self.connected = False
+        self.messages = 0
+        self.reconnects = 0
+        self._last_message = None
+        self._trigger_prices = {}
+        self._pending_since = None
+        self._lock = threading.Lock()
+        self._changed = threading.Event()
+        self._stop_event = threading.Event()
+        self._socket = None
+        self._threads = []
+        self.logger = get_logger(__name__, 'price_stream.log', config)
+
+    # ---- الاتصال ----
+
+    def start(self):
+        """تشغيل خيط الاستقبال (وخيط إعادة التحليل إذا حُدد on_change)"""
+        if self._threads:
+            return self
+        self._stop_event.clear()
+        self._threads = [threading.Thread(target=self._run, name='price-stream', daemon=True)]
+        if self.on_change is not None:
+            self._threads.append(threading.Thread(target=self._dispatch, name='price-reanalysis', daemon=True))
+        for thread in self._threads:
+            thread.start()
+        return self
+
+    def stop(self):
+        self._stop_event.set()
+        self._changed.set()
+        ws = self._socket
+        if ws is not None:
+            ws.abort()
+        for thread in self._threads:
+            thread.join()
+        self._threads = []
+
+    def _subscribe_url(self):
+        if not self.seq:
+            return self.url
+        separator = '&' if '?' in self.url else '?'
+        return f"{self.url}{separator}since={self.seq}"
+
+    def _run(self):
+        backoff = self.backoff_initial
+        while not self._stop_event.is_set():
+            try:
+                self._socket = websocket.create_connection(self._subscribe_url(), timeout=self.idle_timeout)
+                if self._stop_event.is_set():
+                    break
+                self.connected = True
+                self.logger.info("Price stream connected (since=%s)", self.seq)
+                for _ in self._receive(self._socket):
+                    # رسالة واحدة ناجحة تكفي لاعتبار الاتصال مستقراً
+                    backoff = self.backoff_initial
+            except (websocket.WebSocketException, OSError, ValueError, StreamGap) as e:
+                if not self._stop_event.is_set():
+                    self.logger.warning("Price stream disconnected: %s", e)
+            finally:
+                self.connected = False
+                if self._socket is not None:
+                    self._socket.close()
+                    self._socket = None
+
+            if self._stop_event.is_set():
+                break
+            self.reconnects += 1
+            # تراجع أسي مع عشوائية حتى لا تعيد كل النسخ الاتصال في اللحظة نفسها
+            self._stop_event.wait(backoff * random.uniform(0.5, 1.0))
+            backoff = min(backoff * 2, self.backoff_max)
+
+    def _receive(self, ws):
+        """استقبال الرسائل وتطبيقها؛ ping عند الخمول وقطع الاتصال إذا لم يرد الخادم"""
+        pinged = False
+        while not self._stop_event.is_set():
+            try:
+                opcode, payload = ws.recv_data(control_frame=True)
+            except websocket.WebSocketTimeoutException:
+                if pinged:
+                    raise
+                ws.ping()
+                pinged = True
+                continue
+            received = time.perf_counter_ns()
+            pinged = False
+            if opcode == websocket.ABNF.OPCODE_CLOSE:
+                return
+            if opcode != websocket.ABNF.OPCODE_TEXT:
+                continue
+            self._apply(json.loads(payload), received)
+            yield received
+
+    # ---- جدول الأسعار ----
+
+    def _apply(self, message, received):
+        with self._lock:
+            self.messages += 1
+            self._last_message = time.monotonic()
+            if message.get('type') == 'snapshot':
+                self.seq = message['seq']
+                self.prices = {coin: dict(entry) for coin, entry in message['prices'].items()}
+                for coin, entry in self.prices.items():
+                    self._check_change(coin, entry['usd'], received)
+                return
+
+            seq = message['seq']
+            if seq <= self.seq:
+                # مكرر بعد الاستئناف
+                return
+            if self.seq and seq != self.seq + 1:
+                raise StreamGap(f"expected seq {self.seq + 1}, got {seq}")
+            self.seq = seq
+            entry = self.prices.setdefault(message['coin'], {})
+            entry['usd'] = message['usd']
+            entry['usd_24h_change'] = message.get('usd_24h_change', entry.get('usd_24h_change', 0.0))
+            self._check_change(message['coin'], entry['usd'], received)
+
+    def _check_change(self, coin, usd, received):
+        base = self._trigger_prices.get(coin)
+        if base is not None and base and abs(usd - base) / abs(base) < self.threshold:
+            return
+        self._trigger_prices[coin] = usd
+        if self._pending_since is None:
+            self._pending_since = received
+        self._changed.set()
+
+    @property
+    def fresh(self):
+        """هل الجدول صالح للاستخدام بدلاً من REST (متصل، أو انقطع منذ أقل من max_age)"""
+        if not self.prices or self._last_message is None:
+            return False
+        return self.connected or time.monotonic() - self._last_message < self.max_age
+
+    def prices_snapshot(self, coins=None):
+        """نسخة من الجدول بصيغة CoinGecko"""
+        with self._lock:
+            return {
+                coin: dict(entry) for coin, entry in self.prices.items()
+                if coins is None or coin in coins
+            }
+
+    # ---- إعادة التحليل ----
+
+    def _dispatch(self):
+        while not self._stop_event.is_set():
+            self._changed.wait()
+            if self._stop_event.is_set():
+                return
+            with self._lock:
+                self._changed.clear()
+                since = self._pending_since
+                self._pending_since = None
+            if since is None:
+                continue
+            try:
+                self.on_change(self)
+            except Exception as e:
+                self.logger.error("Re-analysis after price change failed: %s", e)
+                continue
+            record('stream.tick_to_decision', time.perf_counter_ns() - since)
+
+    def stats(self):
+        latency = INSTRUMENTATION.histogram('stream.tick_to_decision').snapshot()
+        return {
+            'connected': self.connected,
+            'seq': self.seq,
+            'messages': self.messages,
+            'reconnects': self.reconnects,
+            'decisions': latency.count,
+            'tick_to_decision_p50_ms': latency.percentile(50) / 1e6,
+            'tick_to_decision_p99_ms': latency.percentile(99) / 1e6
+        }
+
+
+if __name__ == "__main__":
+    from data_collector import DataCollector
+    from intelligent_analyzer import IntelligentAnalyzer
+    from mining_bot import MiningBot
+    from mock_services import MockPriceServer, MockTickerServer, RigFleet
+
+    # تغذية محلية مع انقطاع في منتصف التشغيل لقياس الاستئناف وزمن التيك حتى القرار
+    with MockPriceServer() as rest, MockTickerServer(seed=1) as ticker:
+        collector = DataCollector()
+        collector.crypto_api_url = rest.url
+        bot = MiningBot(collector=collector, analyzer=IntelligentAnalyzer(), rigs=RigFleet(100, seed=1))
+        stream = PriceStream(ticker.url, threshold=0.001, backoff_initial=0.05)
+        bot.watch_prices(stream)
+        bot.run_cycle()
+        try:
+            for step in range(400):
+                ticker.random_walk(0.002)
+                if step == 200:
+                    ticker.restart()
+                time.sleep(0.005)
+            time.sleep(0.5)
+        finally:
+            stream.stop()
+        print(json.dumps(stream.stats(), indent=2))
+        print(f"Server seq: {ticker.seq}, client seq: {stream.seq}, status: {bot.mining_status}")
@@ -0,0 +1,233 @@
+import threading
+import time
+from collections import OrderedDict
+
+from checkpoint import BinaryReader, BinaryWriter
+
+
+class BoundedLRU:
+    """قاموس بحجم أقصى يطرد العناصر الأقل استخداماً مؤخراً"""
+
+    def __init__(self, capacity):
+        self.capacity = capacity
+        self._items = OrderedDict()
+        self.evictions = 0
+
+    def __len__(self):
+        return len(self._items)
+
+    def __contains__(self, key):
+        return key in self._items
+
+    def get(self, key):
+        item = self._items.get(key)
+        if item is not None:
+            self._items.move_to_end(key)
+        return item
+
+    def peek(self, key):
+        """قراءة دون تحديث ترتيب الاستخدام"""
+        return self._items.get(key)
+
+    def put(self, key, value):
+        self._items[key] = value
+        self._items.move_to_end(key)
+        if len(self._items) > self.capacity:
+            self._items.popitem(last=False)
+            self.evictions += 1
+
+    def pop(self, key, default=None):
+        return self._items.pop(key, default)
+
+    def keys(self):
+        return self._items.keys()
+
+    def items(self):
+        """العناصر من الأقدم استخداماً إلى الأحدث"""
+        return self._items.items()
+
+    def values(self):
+        return self._items.values()
+
+
+class SlidingWindowCounter:
+    """عداد نافذة منزلقة تقريبي بحجم ثابت: النافذة الحالية + السابقة"""
+
+    __slots__ = ('window', 'window_start', 'current', 'previous')
+
+    def __init__(self, window, now):
+        self.window = window
+        self.window_start = now - (now % window)
+        self.current = 0
+        self.previous = 0
+
+    def _roll(self, now):
+        elapsed_windows = int((now - self.window_start) // self.window)
+        if elapsed_windows >= 1:
+            self.previous = self.current if elapsed_windows == 1 else 0
+            self.current = 0
+            self.window_start += elapsed_windows * self.window
+
+    def add(self, now, amount=1):
+        self._roll(now)
+        self.current += amount
+        return self.estimate(now)
+
+    def estimate(self, now):
+        """عدد الأحداث التقديري خلال آخر نافذة"""
+        self._roll(now)
+        weight = 1.0 - (now - self.window_start) / self.window
+        return self.previous * weight + self.current
+
+
+class _IdentityState:
+    """عداد المحاولات ووقت انتهاء القفل لهوية واحدة داخل مدخل LRU نفسه"""
+
+    __slots__ = ('counter', 'locked_until')
+
+    def __init__(self, counter, locked_until=0.0):
+        self.counter = counter
+        self.locked_until = locked_until
+
+
+class LockoutTracker:
+    """تتبع المحاولات الفاشلة والقفل بذاكرة محدودة لكل هوية (مستخدم أو IP)
+
+    وقت انتهاء القفل محفوظ في مدخل الهوية داخل BoundedLRU، فلا توجد بنية ثانية
+    تنمو مع عدد الهويات المقفلة وتبقى الذاكرة محدودة بـ capacity حتى تحت الإغراق.
+    """
+
+    def __init__(self, max_attempts=5, lockout_duration=300, capacity=100000):
+        self.max_attempts = max_attempts
+        self.lockout_duration = lockout_duration
+        self._identities = BoundedLRU(capacity)
+        self._total = SlidingWindowCounter(lockout_duration, time.time())
+        self._lock = threading.Lock()
+        self._version = 0
+
+    def __len__(self):
+        return len(self._identities)
+
+    @property
+    def capacity(self):
+        return self._identities.capacity
+
+    @property
+    def state_version(self):
+        return self._version
+
+    def record_failure(self, identity, now=None):
+        """تسجيل محاولة فاشلة وإرجاع True إذا أصبحت الهوية مقفلة"""
+        now = time.time() if now is None else now
+        with self._lock:
+            self._version += 1
+            self._total.add(now)
+            state = self._identities.get(identity)
+            if state is None:
+                state = _IdentityState(SlidingWindowCounter(self.lockout_duration, now))
+                self._identities.put(identity, state)
+
+            if state.counter.add(now) >= self.max_attempts:
+                if state.locked_until <= now:
+                    state.locked_until = now + self.lockout_duration
+                return True
+            return False
+
+    def is_locked(self, identity, now=None):
+        """التحقق من حالة القفل بزمن ثابت"""
+        with self._lock:
+            state = self._identities.peek(identity)
+            return state is not None and state.locked_until > (time.time() if now is None else now)
+
+    def reset(self, identity):
+        """مسح سجل الهوية بعد دخول ناجح"""
+        with self._lock:
+            self._identities.pop(identity)
+            self._version += 1
+
+    def locked_count(self, now=None):
+        """عدد الهويات المقفلة حالياً (مرور على المدخلات، للتقارير فقط)"""
+        now = time.time() if now is None else now
+        with self._lock:
+            return sum(1 for state in self._identities.values() if state.locked_until > now)
+
+    def recent_failures(self, now=None):
+        """عدد المحاولات الفاشلة التقديري خلال نافذة القفل"""
+        with self._lock:
+            return int(round(self._total.estimate(time.time() if now is None else now)))
+
+    def export_state(self):
+        """تسلسل العدادات (بترتيب LRU) والهويات المقفلة مع أوقات انتهائها"""
+        writer = BinaryWriter()
+        now = time.time()
+        with self._lock:
+            writer.f64(self._total.window_start)
+            writer.f64(self._total.current)
+            writer.f64(self._total.previous)
+            writer.u32(len(self._identities))
+            for identity, state in self._identities.items():
+                writer.value(identity)
+                writer.f64(state.counter.window_start)
+                writer.f64(state.counter.current)
+                writer.f64(state.counter.previous)
+            locked = [(identity, state.locked_until) for identity, state in self._identities.items()
+                      if state.locked_until > now]
+            writer.u32(len(locked))
+            for identity, expires_at in locked:
+                writer.value(identity)
+                writer.f64(expires_at)
+        return writer.getvalue()
+
+    def import_state(self, data):
+        """استعادة العدادات والأقفال غير المنتهية من نقطة حفظ"""
+        reader = BinaryReader(data)
+        now = time.time()
+        with self._lock:
+            self._total.window_start = reader.f64()
+            self._total.current = reader.f64()
+            self._total.previous = reader.f64()
+            for _ in range(reader.u32()):
+                identity = reader.value()
+                counter = SlidingWindowCounter(self.lockout_duration, now)
+                counter.window_start = reader.f64()
+                counter.current = reader.f64()
+                counter.previous = reader.f64()
+                self._identities.put(identity, _IdentityState(counter))
+            for _ in range(reader.u32()):
+                identity = reader.value()
+                expires_at = reader.f64()
+                state = self._identities.peek(identity)
+                if state is not None and expires_at > now:
+                    state.locked_until = expires_at
+            self._version += 1
+
+
+class TokenBucketLimiter:
+    """محدد معدل بدلو الرموز لكل هوية بذاكرة محدودة"""
+
+    def __init__(self, rate=10.0, burst=20, capacity=100000):
+        self.rate = rate
+        self.burst = burst
+        # الهوية -> [الرموز المتاحة، آخر تحديث]
+        self._buckets = BoundedLRU(capacity)
+        self._lock = threading.Lock()
+
+    def __len__(self):
+        return len(self._buckets)
+
+    def allow(self, identity, cost=1.0, now=None):
+        """استهلاك رمز وإرجاع False عند تجاوز الحد"""
+        now = time.monotonic() if now is None else now
+        with self._lock:
+            bucket = self._buckets.get(identity)
+            if bucket is None:
+                bucket = [float(self.burst), now]
+                self._buckets.put(identity, bucket)
+            else:
+                bucket[0] = min(self.burst, bucket[0] + (now - bucket[1]) * self.rate)
+                bucket[1] = now
+
+            if bucket[0] >= cost:
+                bucket[0] -= cost
+                return True
+            return False
@@ -1,34 +1,59 @@
-import hashlib
-import hmac
 import secrets
-import time
 import json
-import logging
-from datetime import datetime, timedelta
-from cryptography.fernet import Fernet
+from datetime import datetime
+from cryptography.fernet import Fernet, MultiFernet
 import os
+from log_pipeline import SampledLog, get_logger
+from session_store import SessionStore
+from rate_limiter import LockoutTracker, TokenBucketLimiter
+from api_keys import ApiKeyStore
+from stream_cipher import StreamCipher, key_id_for
+from validators import BatchValidator, is_base58, validate_address
+from instrumentation import timed
 
 class SecurityModule:
-    def __init__(self):
-        self.api_keys = {}
-        self.session_tokens = {}
-        self.failed_attempts = {}
-        self.max_attempts = 5
-        self.lockout_duration = 300  # 5 minutes
+    def __init__(self, config=None):
+        security_config = (config or {}).get('security', {})
+        self.api_keys = ApiKeyStore(db_path=security_config.get('api_key_db'))
+        self.session_tokens = SessionStore(
+            default_ttl=security_config.get('session_timeout', 24 * 3600),
+            db_path=security_config.get('session_db')
+        )
+        self.max_attempts = security_config.get('max_failed_attempts', 5)
+        self.lockout_duration = security_config.get('lockout_duration', 300)  # 5 minutes
+        max_tracked = security_config.get('max_tracked_identities', 100000)
+        # عدادات بحجم ثابت لكل هوية مع حد أقصى لعدد الهويات المتتبعة
+        self.failed_attempts = LockoutTracker(self.max_attempts, self.lockout_duration, max_tracked)
+        self.ip_failed_attempts = LockoutTracker(self.max_attempts * 4, self.lockout_duration, max_tracked)
+        self.ip_rate_limiter = TokenBucketLimiter(
+            rate=security_config.get('ip_rate_limit', 10.0),
+            burst=security_config.get('ip_rate_burst', 20),
+            capacity=max_tracked
+        )
+        self.key_file = security_config.get('key_file', 'encryption.key')
+        self.retired_keys_file = self.key_file + '.retired'
         self.encryption_key = self._generate_encryption_key()
-        self.cipher_suite = Fernet(self.encryption_key)
+        self.retired_keys = self._load_retired_keys()
+        self._build_ciphers()
         
-        # إعداد نظام السجلات
-        logging.basicConfig(
-            filename='mining_bot_security.log',
-            level=logging.INFO,
-            format='%(asctime)s - %(levelname)s - %(message)s'
-        )
-        self.logger = logging.getLogger(__name__)
+        # إعداد نظام السجلات (غير متزامن: المسار الساخن يضع السجل في طابور فقط)
+        self.logger = get_logger(__name__, 'mining_bot_security.log', config)
+        # رسائل النجاح المتكررة في كل طلب تُؤخذ عينتها قبل إنشاء السجل
+        self.log_success = SampledLog(self.logger)
+        
+        # مخطط التحقق يُجمّع مرة واحدة ويعاد استخدامه لكل الدفعات
+        self.validator = BatchValidator()
+    
+    def register_checkpoint(self, checkpointer):
+        """تسجيل الجلسات والمفاتيح وعدادات القفل كأقسام في نقطة الحفظ"""
+        checkpointer.register('sessions', self.session_tokens)
+        checkpointer.register('api_keys', self.api_keys)
+        checkpointer.register('user_lockouts', self.failed_attempts)
+        checkpointer.register('ip_lockouts', self.ip_failed_attempts)
     
     def _generate_encryption_key(self):
         """توليد مفتاح التشفير"""
-        key_file = 'encryption.key'
+        key_file = self.key_file
         if os.path.exists(key_file):
             with open(key_file, 'rb') as f:
                 return f.read()
@@ -38,69 +63,113 @@ class SecurityModule:
                 f.write(key)
             return key
     
+    def _load_retired_keys(self):
+        """تحميل المفاتيح القديمة (تستخدم لفك التشفير فقط بعد التدوير)"""
+        if not os.path.exists(self.retired_keys_file):
+            return []
+        with open(self.retired_keys_file, 'rb') as f:
+            return [line.strip() for line in f if line.strip()]
+    
+    def _build_ciphers(self):
+        """بناء أدوات التشفير: المفتاح الحالي للتشفير وكل المفاتيح لفك التشفير"""
+        keys = [self.encryption_key] + self.retired_keys
+        self.cipher_suite = MultiFernet([Fernet(key) for key in keys])
+        self.stream_cipher = StreamCipher(keys)
+    
+    def rotate_encryption_key(self):
+        """تدوير مفتاح التشفير مع إبقاء المفاتيح القديمة لفك التشفير"""
+        new_key = Fernet.generate_key()
+        
+        with open(self.retired_keys_file, 'ab') as f:
+            f.write(self.encryption_key + b'\n')
+        temp_file = self.key_file + '.tmp'
+        with open(temp_file, 'wb') as f:
+            f.write(new_key)
+        os.replace(temp_file, self.key_file)
+        
+        self.retired_keys.insert(0, self.encryption_key)
+        self.encryption_key = new_key
+        self._build_ciphers()
+        
+        key_id = key_id_for(new_key).hex()
+        self.logger.info("Encryption key rotated, new key id: %s", key_id)
+        return key_id
+    
     def generate_api_key(self, user_id):
-        """توليد مفتاح API آمن للمستخدم"""
-        api_key = secrets.token_urlsafe(32)
-        key_hash = hashlib.sha256(api_key.encode()).hexdigest()
+        """توليد مفتاح API آمن للمستخدم (تبقى المفاتيح السابقة صالحة)"""
+        api_key = self.api_keys.generate(user_id)
         
-        self.api_keys[user_id] = {
-            'key_hash': key_hash,
-            'created_at': datetime.now().isoformat(),
-            'last_used': None,
-            'usage_count': 0
-        }
-        
-        self.logger.info(f"API key generated for user: {user_id}")
+        self.logger.info("API key generated for user: %s", user_id)
         return api_key
     
-    def validate_api_key(self, user_id, provided_key):
+    def revoke_api_key(self, key_id):
+        """إلغاء مفتاح API بمعرفه"""
+        if self.api_keys.revoke(key_id):
+            self.logger.info("API key revoked: %s", key_id)
+            return True
+        return False
+    
+    @timed('security.validate_api_key', sample_every=16)
+    def validate_api_key(self, user_id, provided_key, ip_address=None):
         """التحقق من صحة مفتاح API"""
-        if user_id not in self.api_keys:
-            self.logger.warning(f"Invalid user ID attempted: {user_id}")
+        if ip_address is not None and not self.check_ip_allowed(ip_address):
             return False
         
-        provided_hash = hashlib.sha256(provided_key.encode()).hexdigest()
-        stored_hash = self.api_keys[user_id]['key_hash']
+        if user_id not in self.api_keys:
+            self.logger.warning("Invalid user ID attempted: %s", user_id)
+            if ip_address is not None:
+                self.ip_failed_attempts.record_failure(ip_address)
+            return False
         
-        if hmac.compare_digest(provided_hash, stored_hash):
-            # تحديث معلومات الاستخدام
-            self.api_keys[user_id]['last_used'] = datetime.now().isoformat()
-            self.api_keys[user_id]['usage_count'] += 1
-            self.logger.info(f"Valid API key used by user: {user_id}")
+        if self.api_keys.verify(provided_key, user_id) is not None:
+            self.log_success("Valid API key used by user: %s", user_id)
             return True
         else:
-            self._record_failed_attempt(user_id)
-            self.logger.warning(f"Invalid API key attempt by user: {user_id}")
+            self._record_failed_attempt(user_id, ip_address)
+            self.logger.warning("Invalid API key attempt by user: %s", user_id)
             return False
     
-    def _record_failed_attempt(self, user_id):
+    @timed('security.authenticate_api_key', sample_every=16)
+    def authenticate_api_key(self, provided_key, ip_address=None):
+        """التحقق من مفتاح API بدون معرف مستخدم (واجهات HTTP و WebSocket) وإرجاع المستخدم أو None"""
+        if ip_address is not None and not self.check_ip_allowed(ip_address):
+            return None
+
+        record = self.api_keys.verify(provided_key)
+        if record is not None:
+            self.log_success("Valid API key used by user: %s", record['user_id'])
+            return record['user_id']
+        if ip_address is not None and self.ip_failed_attempts.record_failure(ip_address):
+            self.logger.warning("IP locked after repeated failures: %s", ip_address)
+        self.logger.warning("Invalid API key presented from: %s", ip_address)
+        return None
+    
+    def _record_failed_attempt(self, user_id, ip_address=None):
         """تسجيل محاولة دخول فاشلة"""
-        current_time = time.time()
-        
-        if user_id not in self.failed_attempts:
-            self.failed_attempts[user_id] = []
-        
-        # إزالة المحاولات القديمة
-        self.failed_attempts[user_id] = [
-            attempt for attempt in self.failed_attempts[user_id]
-            if current_time - attempt < self.lockout_duration
-        ]
-        
-        self.failed_attempts[user_id].append(current_time)
+        if self.failed_attempts.record_failure(user_id):
+            self.logger.warning("User locked after repeated failures: %s", user_id)
+        if ip_address is not None and self.ip_failed_attempts.record_failure(ip_address):
+            self.logger.warning("IP locked after repeated failures: %s", ip_address)
     
     def is_user_locked(self, user_id):
         """التحقق من حالة قفل المستخدم"""
-        if user_id not in self.failed_attempts:
+        return self.failed_attempts.is_locked(user_id)
+    
+    def is_ip_locked(self, ip_address):
+        """التحقق من حالة قفل عنوان IP"""
+        return self.ip_failed_attempts.is_locked(ip_address)
+    
+    def check_ip_allowed(self, ip_address):
+        """تطبيق حد المعدل والقفل الخاص بعنوان IP"""
+        if self.ip_failed_attempts.is_locked(ip_address):
+            self.logger.warning("Request denied for locked IP: %s", ip_address)
             return False
-        
-        current_time = time.time()
-        recent_attempts = [
-            attempt for attempt in self.failed_attempts[user_id]
-            if current_time - attempt < self.lockout_duration
-        ]
-        
-        return len(recent_attempts) >= self.max_attempts
+        if not self.ip_rate_limiter.allow(ip_address):
+            self.logger.warning("Rate limit exceeded for IP: %s", ip_address)
+            return False
+        return True
     
+    @timed('security.encrypt_sensitive_data', sample_every=16)
     def encrypt_sensitive_data(self, data):
         """تشفير البيانات الحساسة"""
         try:
@@ -110,95 +179,146 @@ class SecurityModule:
                 data = str(data)
             
             encrypted_data = self.cipher_suite.encrypt(data.encode())
-            self.logger.info("Data encrypted successfully")
+            self.log_success("Data encrypted successfully")
             return encrypted_data
         except Exception as e:
-            self.logger.error(f"Encryption failed: {e}")
+            self.logger.error("Encryption failed: %s", e)
             return None
     
+    @timed('security.decrypt_sensitive_data', sample_every=16)
     def decrypt_sensitive_data(self, encrypted_data):
         """فك تشفير البيانات الحساسة"""
         try:
             decrypted_data = self.cipher_suite.decrypt(encrypted_data)
-            self.logger.info("Data decrypted successfully")
+            self.log_success("Data decrypted successfully")
             return decrypted_data.decode()
         except Exception as e:
-            self.logger.error(f"Decryption failed: {e}")
+            self.logger.error("Decryption failed: %s", e)
+            return None
+    
+    def reencrypt_sensitive_data(self, encrypted_data):
+        """إعادة تشفير بيانات قديمة بالمفتاح الحالي بعد التدوير"""
+        try:
+            return self.cipher_suite.rotate(encrypted_data)
+        except Exception as e:
+            self.logger.error("Re-encryption failed: %s", e)
             return None
     
+    def encrypt_stream(self, chunks):
+        """تشفير مكرر من الكتل (bytes) إلى إطارات موثقة دون تحميل كامل البيانات"""
+        return self.stream_cipher.encrypt_iter(chunks)
+    
+    def decrypt_stream(self, chunks):
+        """فك تشفير مكرر من البايتات المشفرة؛ يرفع StreamDecryptionError عند التلاعب"""
+        return self.stream_cipher.decrypt_iter(chunks)
+    
+    @timed('security.encrypt_file')
+    def encrypt_file(self, source_path, target_path):
+        """تشفير ملف كبير (أرشيف لقطات أو سجلات) على شكل كتل"""
+        try:
+            size = self.stream_cipher.encrypt_file(source_path, target_path)
+            self.logger.info("File encrypted: %s (%s bytes)", source_path, size)
+            return True
+        except Exception as e:
+            self.logger.error("File encryption failed for %s: %s", source_path, e)
+            return False
+    
+    @timed('security.decrypt_file')
+    def decrypt_file(self, source_path, target_path):
+        """فك تشفير ملف مشفر على شكل كتل"""
+        try:
+            size = self.stream_cipher.decrypt_file(source_path, target_path)
+            self.logger.info("File decrypted: %s (%s bytes)", source_path, size)
+            return True
+        except Exception as e:
+            self.logger.error("File decryption failed for %s: %s", source_path, e)
+            return False
+    
+    def reencrypt_file(self, source_path, target_path, chunk_size=1024 * 1024):
+        """إعادة تشفير ملف بالمفتاح الحالي دون كتابة النص الأصلي على القرص"""
+        def read_chunks():
+            with open(source_path, 'rb') as f:
+                while True:
+                    chunk = f.read(chunk_size)
+                    if not chunk:
+                        return
+                    yield chunk
+        
+        temp_path = target_path + '.tmp'
+        try:
+            with open(temp_path, 'wb') as f:
+                for frame in self.encrypt_stream(self.decrypt_stream(read_chunks())):
+                    f.write(frame)
+            os.replace(temp_path, target_path)
+            self.logger.info("File re-encrypted with current key: %s", source_path)
+            return True
+        except Exception as e:
+            if os.path.exists(temp_path):
+                os.remove(temp_path)
+            self.logger.error("File re-encryption failed for %s: %s", source_path, e)
+            return False
+    
+    @timed('security.generate_session_token')
     def generate_session_token(self, user_id):
         """توليد رمز جلسة آمن"""
         if self.is_user_locked(user_id):
-            self.logger.warning(f"Session token request denied for locked user: {user_id}")
+            self.logger.warning("Session token request denied for locked user: %s", user_id)
             return None
         
         token = secrets.token_urlsafe(32)
-        expiry_time = datetime.now() + timedelta(hours=24)
+        self.session_tokens.create(token, user_id)
         
-        self.session_tokens[token] = {
-            'user_id': user_id,
-            'created_at': datetime.now().isoformat(),
-            'expires_at': expiry_time.isoformat(),
-            'is_active': True
-        }
-        
-        self.logger.info(f"Session token generated for user: {user_id}")
+        self.logger.info("Session token generated for user: %s", user_id)
         return token
     
+    @timed('security.validate_session_token', sample_every=16)
     def validate_session_token(self, token):
         """التحقق من صحة رمز الجلسة"""
-        if token not in self.session_tokens:
-            self.logger.warning("Invalid session token attempted")
-            return False
-        
-        session = self.session_tokens[token]
-        expiry_time = datetime.fromisoformat(session['expires_at'])
-        
-        if datetime.now() > expiry_time or not session['is_active']:
-            self.logger.info(f"Expired or inactive session token: {token[:8]}...")
+        session = self.session_tokens.get(token)
+        if session is None:
+            self.logger.warning("Invalid or expired session token attempted")
             return False
         
-        self.logger.info(f"Valid session token used by user: {session['user_id']}")
+        self.log_success("Valid session token used by user: %s", session['user_id'])
         return True
     
     def revoke_session_token(self, token):
         """إلغاء رمز الجلسة"""
-        if token in self.session_tokens:
-            self.session_tokens[token]['is_active'] = False
-            user_id = self.session_tokens[token]['user_id']
-            self.logger.info(f"Session token revoked for user: {user_id}")
+        session = self.session_tokens.revoke(token)
+        if session is not None:
+            self.logger.info("Session token revoked for user: %s", session['user_id'])
             return True
         return False
     
     def validate_mining_parameters(self, params):
         """التحقق من صحة معاملات التعدين"""
-        required_fields = ['coin', 'hash_rate', 'power_limit']
-        
-        # التحقق من وجود الحقول المطلوبة
-        for field in required_fields:
-            if field not in params:
-                self.logger.warning(f"Missing required field: {field}")
-                return False, f"Missing required field: {field}"
-        
-        # التحقق من صحة العملة
-        valid_coins = ['BTC', 'ETH', 'LTC', 'XMR']
-        if params['coin'] not in valid_coins:
-            self.logger.warning(f"Invalid coin specified: {params['coin']}")
-            return False, "Invalid coin specified"
-        
-        # التحقق من حدود الطاقة
-        if not isinstance(params['power_limit'], (int, float)) or params['power_limit'] <= 0:
-            self.logger.warning("Invalid power limit specified")
-            return False, "Invalid power limit"
-        
-        # التحقق من معدل الهاش
-        if not isinstance(params['hash_rate'], (int, float)) or params['hash_rate'] <= 0:
-            self.logger.warning("Invalid hash rate specified")
-            return False, "Invalid hash rate"
+        errors = self.validator.validate_parameters(params)
+        if errors:
+            self.logger.warning("Invalid mining parameters: %s", errors[0]['error'])
+            return False, errors[0]['error']
         
         self.logger.info("Mining parameters validated successfully")
         return True, "Parameters valid"
     
+    @timed('security.validate_mining_parameters_batch')
+    def validate_mining_parameters_batch(self, params_list):
+        """التحقق من إعدادات أسطول كامل في استدعاء واحد مع أخطاء لكل عنصر"""
+        results = self.validator.validate_parameters_batch(params_list)
+        invalid = sum(1 for result in results if not result['valid'])
+        if invalid:
+            self.logger.warning("Mining parameter batch: %s of %s entries invalid", invalid, len(results))
+        else:
+            self.logger.info("Mining parameter batch validated: %s entries", len(results))
+        return results
+    
+    def validate_wallet_addresses(self, entries):
+        """التحقق من قائمة (العملة، العنوان) مع فحص المجموع الاختباري لكل عملة"""
+        results = self.validator.validate_addresses_batch(entries)
+        invalid = sum(1 for result in results if not result['valid'])
+        if invalid:
+            self.logger.warning("Wallet address batch: %s of %s entries invalid", invalid, len(results))
+        return results
+    
     def detect_suspicious_activity(self, activity_data):
         """كشف النشاط المشبوه"""
         suspicious_indicators = []
@@ -225,16 +345,16 @@ class SecurityModule:
             suspicious_indicators.append("Multiple failed connection attempts")
         
         if suspicious_indicators:
-            self.logger.warning(f"Suspicious activity detected: {suspicious_indicators}")
+            self.logger.warning("Suspicious activity detected: %s", suspicious_indicators)
             return True, suspicious_indicators
         
         return False, []
     
-    def secure_wallet_connection(self, wallet_address):
+    def secure_wallet_connection(self, wallet_address, coin=None):
         """تأمين اتصال المحفظة"""
         # التحقق من صحة عنوان المحفظة
-        if not self._validate_wallet_address(wallet_address):
-            self.logger.error(f"Invalid wallet address: {wallet_address}")
+        if not self._validate_wallet_address(wallet_address, coin):
+            self.logger.error("Invalid wallet address: %s", wallet_address)
             return False, "Invalid wallet address"
         
         # تشفير عنوان المحفظة
@@ -245,27 +365,29 @@ class SecurityModule:
         self.logger.info("Wallet connection secured successfully")
         return True, encrypted_address
     
-    def _validate_wallet_address(self, address):
+    def _validate_wallet_address(self, address, coin=None):
         """التحقق من صحة عنوان المحفظة"""
+        # مع تحديد العملة نتحقق من الصيغة والمجموع الاختباري الحقيقيين
+        if coin is not None:
+            return validate_address(coin, address) is None
+        
         # فحص أساسي لطول العنوان
         if len(address) < 26 or len(address) > 62:
             return False
         
         # فحص الأحرف المسموحة
-        allowed_chars = set('123456789ABCDEFGHJKLMNPQRSTUVWXYZabcdefghijkmnopqrstuvwxyz')
-        if not all(c in allowed_chars for c in address):
-            return False
-        
-        return True
+        return is_base58(address)
     
+    @timed('security.generate_security_report')
     def generate_security_report(self):
         """إنشاء تقرير أمني"""
         report = {
             'timestamp': datetime.now().isoformat(),
             'total_api_keys': len(self.api_keys),
-            'active_sessions': sum(1 for s in self.session_tokens.values() if s['is_active']),
-            'locked_users': len([u for u in self.failed_attempts.keys() if self.is_user_locked(u)]),
-            'total_failed_attempts': sum(len(attempts) for attempts in self.failed_attempts.values()),
+            'active_sessions': self.session_tokens.active_count(),
+            'locked_users': self.failed_attempts.locked_count(),
+            'locked_ips': self.ip_failed_attempts.locked_count(),
+            'total_failed_attempts': self.failed_attempts.recent_failures(),
             'security_status': 'SECURE'
         }
         
@@ -276,7 +398,7 @@ class SecurityModule:
         if report['total_failed_attempts'] > 50:
             report['security_status'] = 'CRITICAL'
         
-        self.logger.info(f"Security report generated: {report['security_status']}")
+        self.logger.info("Security report generated: %s", report['security_status'])
         return report
 
 if __name__ == "__main__":
@@ -0,0 +1,300 @@
+import hashlib
+import os
+import sqlite3
+import threading
+import time
+
+from checkpoint import BinaryReader, BinaryWriter
+
+
+class TimingWheel:
+    """عجلة توقيت هرمية: إضافة وحذف O(1) وانتهاء صلاحية مطفأ O(1) لكل عنصر"""
+
+    def __init__(self, tick=1.0, slots=64, levels=4, start=None):
+        self.tick = tick
+        self.slots = slots
+        self.levels = levels
+        self.wheels = [[{} for _ in range(slots)] for _ in range(levels)]
+        self.current_tick = int((time.time() if start is None else start) / tick)
+        # المفتاح -> (المستوى، الخانة، وقت الانتهاء)
+        self._locations = {}
+        # العناصر الأبعد من مدى العجلة
+        self._overflow = {}
+
+    def __len__(self):
+        return len(self._locations)
+
+    def __contains__(self, key):
+        return key in self._locations
+
+    def items(self):
+        """أزواج (المفتاح، وقت الانتهاء) لكل العناصر المجدولة"""
+        return [(key, location[2]) for key, location in self._locations.items()]
+
+    def add(self, key, expires_at):
+        """جدولة مفتاح للانتهاء في وقت محدد (ثوان منذ epoch)"""
+        self.remove(key)
+        self._place(key, expires_at)
+
+    def remove(self, key):
+        """إلغاء جدولة مفتاح"""
+        location = self._locations.pop(key, None)
+        if location is None:
+            return False
+        level, slot, _ = location
+        if level < 0:
+            self._overflow.pop(key, None)
+        else:
+            self.wheels[level][slot].pop(key, None)
+        return True
+
+    def _place(self, key, expires_at):
+        expiry_tick = max(int(expires_at / self.tick), self.current_tick + 1)
+        delta = expiry_tick - self.current_tick
+
+        span = self.slots
+        for level in range(self.levels):
+            if delta < span:
+                slot = (expiry_tick // (span // self.slots)) % self.slots
+                self.wheels[level][slot][key] = expires_at
+                self._locations[key] = (level, slot, expires_at)
+                return
+            span *= self.slots
+
+        self._overflow[key] = expires_at
+        self._locations[key] = (-1, -1, expires_at)
+
+    def advance(self, now=None):
+        """تحريك العجلة حتى الوقت الحالي وإرجاع المفاتيح المنتهية"""
+        target_tick = int((time.time() if now is None else now) / self.tick)
+        expired = []
+
+        # إذا توقفت العملية لفترة أطول من مدى العجلة كاملاً نعيد توزيع كل شيء مرة واحدة
+        if target_tick - self.current_tick > self.slots ** self.levels:
+            return self._rebuild(target_tick)
+
+        level0 = self.wheels[0]
+        while self.current_tick < target_tick:
+            # القفز إلى حد الدورة التالي مع تفريغ الخانات غير الفارغة فقط
+            boundary = min((self.current_tick // self.slots + 1) * self.slots, target_tick)
+            for tick in range(self.current_tick + 1, boundary + 1):
+                if tick % self.slots == 0:
+                    self.current_tick = tick
+                    self._cascade()
+                slot = level0[tick % self.slots]
+                if slot:
+                    for key in slot:
+                        del self._locations[key]
+                    expired.extend(slot)
+                    slot.clear()
+            self.current_tick = boundary
+        return expired
+
+    def _cascade(self):
+        """نقل عناصر المستويات العليا إلى الأدنى عند اكتمال دورة"""
+        span = self.slots
+        for level in range(1, self.levels):
+            if self.current_tick % span:
+                return
+            slot_index = (self.current_tick // span) % self.slots
+            slot = self.wheels[level][slot_index]
+            if slot:
+                entries = list(slot.items())
+                slot.clear()
+                for key, expires_at in entries:
+                    del self._locations[key]
+                    self._place(key, expires_at)
+            span *= self.slots
+
+        if self.current_tick % span == 0 and self._overflow:
+            entries = list(self._overflow.items())
+            self._overflow.clear()
+            for key, expires_at in entries:
+                del self._locations[key]
+                self._place(key, expires_at)
+
+    def _rebuild(self, target_tick):
+        entries = [(key, location[2]) for key, location in self._locations.items()]
+        self.wheels = [[{} for _ in range(self.slots)] for _ in range(self.levels)]
+        self._overflow = {}
+        self._locations = {}
+        self.current_tick = target_tick
+
+        expired = []
+        for key, expires_at in entries:
+            if int(expires_at / self.tick) <= target_tick:
+                expired.append(key)
+            else:
+                self._place(key, expires_at)
+        return expired
+
+
+class SessionStore:
+    """مخزن رموز الجلسات بانتهاء صلاحية رقمي وإزالة تلقائية واستمرارية اختيارية"""
+
+    def __init__(self, default_ttl=24 * 3600, db_path=None):
+        self.default_ttl = default_ttl
+        self.db_path = db_path
+        self._sessions = {}
+        self._wheel = TimingWheel()
+        self._lock = threading.Lock()
+        self._db = None
+        # يزداد مع كل تغيير؛ تستخدمه نقاط الحفظ لتخطي الأقسام غير المتغيرة
+        self._version = 0
+
+        if db_path:
+            self._open_db()
+            self._load()
+
+    @property
+    def state_version(self):
+        return self._version
+
+    @staticmethod
+    def _token_id(token):
+        # لا نخزن الرمز نفسه، فقط بصمته
+        return hashlib.sha256(token.encode()).hexdigest()
+
+    def __len__(self):
+        return self.active_count()
+
+    def __contains__(self, token):
+        return self.get(token) is not None
+
+    def create(self, token, user_id, ttl=None, now=None):
+        """تسجيل جلسة جديدة"""
+        now = time.time() if now is None else now
+        session = {
+            'user_id': user_id,
+            'created_at': now,
+            'expires_at': now + (self.default_ttl if ttl is None else ttl)
+        }
+        token_id = self._token_id(token)
+
+        with self._lock:
+            self._expire(now)
+            self._sessions[token_id] = session
+            self._wheel.add(token_id, session['expires_at'])
+            self._version += 1
+            if self._db is not None:
+                self._db.execute(
+                    "INSERT OR REPLACE INTO sessions VALUES (?, ?, ?, ?)",
+                    (token_id, str(user_id), session['created_at'], session['expires_at'])
+                )
+                self._db.commit()
+        return session
+
+    def get(self, token, now=None):
+        """إرجاع الجلسة إن كانت صالحة، وإلا None"""
+        now = time.time() if now is None else now
+        token_id = self._token_id(token)
+
+        with self._lock:
+            session = self._sessions.get(token_id)
+            if session is None:
+                return None
+            if session['expires_at'] <= now:
+                self._discard([token_id])
+                return None
+            return session
+
+    def revoke(self, token):
+        """إلغاء جلسة وإزالتها فوراً"""
+        token_id = self._token_id(token)
+        with self._lock:
+            session = self._sessions.get(token_id)
+            if session is None:
+                return None
+            self._discard([token_id])
+            return session
+
+    def active_count(self, now=None):
+        """عدد الجلسات الفعالة بزمن ثابت (بعد إزالة المنتهية المستحقة)"""
+        with self._lock:
+            self._expire(time.time() if now is None else now)
+            return len(self._sessions)
+
+    def expire(self, now=None):
+        """إزالة الجلسات المنتهية وإرجاع عددها"""
+        with self._lock:
+            return self._expire(time.time() if now is None else now)
+
+    def _expire(self, now):
+        expired = self._wheel.advance(now)
+        if expired:
+            self._discard(expired)
+        return len(expired)
+
+    def _discard(self, token_ids):
+        for token_id in token_ids:
+            self._sessions.pop(token_id, None)
+            self._wheel.remove(token_id)
+        self._version += 1
+        if self._db is not None:
+            self._db.executemany("DELETE FROM sessions WHERE token_id = ?", [(t,) for t in token_ids])
+            self._db.commit()
+
+    def _open_db(self):
+        directory = os.path.dirname(self.db_path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        self._db = sqlite3.connect(self.db_path, check_same_thread=False)
+        self._db.execute("PRAGMA journal_mode=WAL")
+        self._db.execute(
+            "CREATE TABLE IF NOT EXISTS sessions ("
+            "token_id TEXT PRIMARY KEY, user_id TEXT, created_at REAL, expires_at REAL)"
+        )
+        self._db.commit()
+
+    def _load(self):
+        """استعادة الجلسات غير المنتهية بعد إعادة التشغيل"""
+        now = time.time()
+        self._db.execute("DELETE FROM sessions WHERE expires_at <= ?", (now,))
+        self._db.commit()
+        rows = self._db.execute("SELECT token_id, user_id, created_at, expires_at FROM sessions")
+        for token_id, user_id, created_at, expires_at in rows:
+            self._sessions[token_id] = {
+                'user_id': user_id,
+                'created_at': created_at,
+                'expires_at': expires_at
+            }
+            self._wheel.add(token_id, expires_at)
+
+    def export_state(self):
+        """تسلسل الجلسات الفعالة (بصمة الرمز، المستخدم، الإنشاء، الانتهاء)"""
+        writer = BinaryWriter()
+        with self._lock:
+            writer.u32(len(self._sessions))
+            for token_id, session in self._sessions.items():
+                writer.blob(bytes.fromhex(token_id))
+                writer.value(session['user_id'])
+                writer.f64(session['created_at'])
+                writer.f64(session['expires_at'])
+        return writer.getvalue()
+
+    def import_state(self, data):
+        """استعادة الجلسات غير المنتهية من نقطة حفظ"""
+        reader = BinaryReader(data)
+        now = time.time()
+        with self._lock:
+            for _ in range(reader.u32()):
+                token_id = reader.blob().hex()
+                user_id = reader.value()
+                created_at = reader.f64()
+                expires_at = reader.f64()
+                if expires_at <= now:
+                    continue
+                self._sessions[token_id] = {
+                    'user_id': user_id,
+                    'created_at': created_at,
+                    'expires_at': expires_at
+                }
+                self._wheel.add(token_id, expires_at)
+            self._version += 1
+
+    def close(self):
+        """إغلاق قاعدة البيانات"""
+        with self._lock:
+            if self._db is not None:
+                self._db.close()
+                self._db = None
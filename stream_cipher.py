@@ -0,0 +1,249 @@
+import base64
+import hashlib
+import os
+import struct
+
+from cryptography.exceptions import InvalidTag
+from cryptography.hazmat.primitives import hashes
+from cryptography.hazmat.primitives.ciphers.aead import AESGCM
+from cryptography.hazmat.primitives.kdf.hkdf import HKDF
+
+MAGIC = b'SMBE'
+VERSION = 1
+DEFAULT_CHUNK_SIZE = 64 * 1024
+MAX_CHUNK_SIZE = 64 * 1024 * 1024
+
+# الرأس: السحر، الإصدار، معرف المفتاح، بادئة nonce، حجم الكتلة
+_HEADER = struct.Struct('>4sB8s7sI')
+_FRAME_LENGTH = struct.Struct('>I')
+_TAG_SIZE = 16
+
+
+class StreamDecryptionError(Exception):
+    """فشل التحقق من سلامة تدفق مشفر"""
+
+
+def key_id_for(fernet_key):
+    """معرف قصير للمفتاح يُكتب في رأس التدفق لاختيار مفتاح فك التشفير"""
+    return hashlib.sha256(fernet_key).digest()[:8]
+
+
+def derive_stream_key(fernet_key):
+    """اشتقاق مفتاح AES-256-GCM من مفتاح Fernet المخزن"""
+    raw = base64.urlsafe_b64decode(fernet_key)
+    return HKDF(
+        algorithm=hashes.SHA256(),
+        length=32,
+        salt=None,
+        info=b'smartminingbot-stream-v1',
+    ).derive(raw)
+
+
+class StreamCipher:
+    """تشفير متدفق بكتل ثابتة الحجم وإطارات موثقة (AES-GCM بأسلوب STREAM)"""
+
+    def __init__(self, fernet_keys, chunk_size=DEFAULT_CHUNK_SIZE):
+        """fernet_keys: المفتاح الأساسي أولاً ثم المفاتيح القديمة لفك التشفير فقط"""
+        if not fernet_keys:
+            raise ValueError("At least one key is required")
+        if not 0 < chunk_size <= MAX_CHUNK_SIZE:
+            raise ValueError("Invalid chunk size")
+        self.chunk_size = chunk_size
+        self._ciphers = {}
+        for fernet_key in fernet_keys:
+            self._ciphers[key_id_for(fernet_key)] = AESGCM(derive_stream_key(fernet_key))
+        self.primary_key_id = key_id_for(fernet_keys[0])
+
+    @staticmethod
+    def _nonce(prefix, counter, final):
+        return prefix + struct.pack('>IB', counter, 1 if final else 0)
+
+    def _new_header(self):
+        return _HEADER.pack(MAGIC, VERSION, self.primary_key_id, os.urandom(7), self.chunk_size)
+
+    def encrypt_iter(self, chunks):
+        """تشفير مكرر من الكتل وإرجاع مكرر من الإطارات المشفرة"""
+        header = self._new_header()
+        _, _, _, prefix, _ = _HEADER.unpack(header)
+        cipher = self._ciphers[self.primary_key_id]
+        yield header
+
+        counter = 0
+        pending = None
+        for chunk in self._rechunk(chunks):
+            if pending is not None:
+                yield b''.join(self._seal(cipher, prefix, counter, pending, header, False))
+                counter += 1
+            pending = chunk
+        yield b''.join(self._seal(cipher, prefix, counter, pending or b'', header, True))
+
+    def _rechunk(self, chunks):
+        """إعادة تقسيم المدخلات إلى كتل بحجم chunk_size بالضبط (عدا الأخيرة)"""
+        buffer = bytearray()
+        for chunk in chunks:
+            if not chunk:
+                continue
+            if not buffer and len(chunk) == self.chunk_size:
+                yield chunk
+                continue
+            buffer += chunk
+            while len(buffer) >= self.chunk_size:
+                yield bytes(buffer[:self.chunk_size])
+                del buffer[:self.chunk_size]
+        if buffer:
+            yield bytes(buffer)
+
+    def decrypt_iter(self, chunks):
+        """فك تشفير مكرر من البايتات المشفرة (بحدود عشوائية) وإرجاع النص الأصلي"""
+        buffer = bytearray()
+        header = None
+        cipher = prefix = None
+        max_frame = 0
+        counter = 0
+        finished = False
+
+        for chunk in chunks:
+            buffer += chunk
+            if header is None:
+                if len(buffer) < _HEADER.size:
+                    continue
+                header = bytes(buffer[:_HEADER.size])
+                cipher, prefix = self._open_header(header)
+                max_frame = _HEADER.unpack(header)[4] + _TAG_SIZE
+                del buffer[:_HEADER.size]
+
+            while len(buffer) >= _FRAME_LENGTH.size:
+                (frame_length,) = _FRAME_LENGTH.unpack_from(buffer)
+                frame_length &= 0x7FFFFFFF
+                if frame_length > max_frame:
+                    raise StreamDecryptionError("Frame larger than chunk size")
+                if len(buffer) < _FRAME_LENGTH.size + frame_length:
+                    break
+                if finished:
+                    raise StreamDecryptionError("Data after final frame")
+                frame, finished = self._open_frame(cipher, prefix, counter, buffer, header)
+                del buffer[:_FRAME_LENGTH.size + frame_length]
+                counter += 1
+                yield frame
+
+        if header is None or not finished or buffer:
+            raise StreamDecryptionError("Truncated or corrupted stream")
+
+    def encrypt_file(self, source_path, target_path):
+        """تشفير ملف إلى ملف باستخدام مخازن مؤقتة يعاد استخدامها"""
+        header = self._new_header()
+        _, _, _, prefix, _ = _HEADER.unpack(header)
+        cipher = self._ciphers[self.primary_key_id]
+
+        # مخزنان متناوبان: نقرأ الكتلة التالية قبل تشفير الحالية لمعرفة الكتلة الأخيرة
+        buffers = [bytearray(self.chunk_size), bytearray(self.chunk_size)]
+        views = [memoryview(buffers[0]), memoryview(buffers[1])]
+        total = 0
+
+        temp_path = target_path + '.tmp'
+        try:
+            with open(source_path, 'rb') as src, open(temp_path, 'wb') as dst:
+                dst.write(header)
+                current = 0
+                current_length = src.readinto(buffers[current])
+                counter = 0
+                while True:
+                    following = 1 - current
+                    following_length = src.readinto(buffers[following]) if current_length else 0
+                    final = following_length == 0
+                    length, ciphertext = self._seal(
+                        cipher, prefix, counter, views[current][:current_length], header, final
+                    )
+                    dst.write(length)
+                    dst.write(ciphertext)
+                    total += current_length
+                    if final:
+                        break
+                    counter += 1
+                    current, current_length = following, following_length
+        except BaseException:
+            if os.path.exists(temp_path):
+                os.remove(temp_path)
+            raise
+
+        os.replace(temp_path, target_path)
+        return total
+
+    def decrypt_file(self, source_path, target_path):
+        """فك تشفير ملف إلى ملف؛ لا يُكتب الناتج النهائي إلا بعد التحقق من كل الإطارات"""
+        total = 0
+        temp_path = target_path + '.tmp'
+        try:
+            with open(source_path, 'rb') as src, open(temp_path, 'wb') as dst:
+                header = src.read(_HEADER.size)
+                cipher, prefix = self._open_header(header)
+                chunk_size = _HEADER.unpack(header)[4]
+                length_buffer = bytearray(_FRAME_LENGTH.size)
+                frame_buffer = bytearray(chunk_size + _FRAME_LENGTH.size + _TAG_SIZE)
+                frame_view = memoryview(frame_buffer)
+                counter = 0
+                finished = False
+
+                while True:
+                    read = src.readinto(length_buffer)
+                    if not read:
+                        break
+                    if finished:
+                        raise StreamDecryptionError("Data after final frame")
+                    if read != _FRAME_LENGTH.size:
+                        raise StreamDecryptionError("Truncated frame length")
+                    (frame_length,) = _FRAME_LENGTH.unpack(length_buffer)
+                    frame_length &= 0x7FFFFFFF
+                    if frame_length > len(frame_buffer) - _FRAME_LENGTH.size:
+                        raise StreamDecryptionError("Frame larger than chunk size")
+                    frame_view[:_FRAME_LENGTH.size] = length_buffer
+                    body = frame_view[_FRAME_LENGTH.size:_FRAME_LENGTH.size + frame_length]
+                    if src.readinto(body) != frame_length:
+                        raise StreamDecryptionError("Truncated frame")
+                    plaintext, finished = self._open_frame(cipher, prefix, counter, frame_view, header)
+                    dst.write(plaintext)
+                    total += len(plaintext)
+                    counter += 1
+
+                if not finished:
+                    raise StreamDecryptionError("Truncated or corrupted stream")
+        except BaseException:
+            if os.path.exists(temp_path):
+                os.remove(temp_path)
+            raise
+
+        os.replace(temp_path, target_path)
+        return total
+
+    def _seal(self, cipher, prefix, counter, data, header, final):
+        """إرجاع (بادئة الطول، النص المشفر) دون دمجهما لتجنب نسخة إضافية"""
+        ciphertext = cipher.encrypt(self._nonce(prefix, counter, final), data, header)
+        # البت الأعلى في الطول يحدد الإطار الأخير حتى يمكن كشف الاقتطاع
+        length = len(ciphertext) | (0x80000000 if final else 0)
+        return _FRAME_LENGTH.pack(length), ciphertext
+
+    def _open_header(self, header):
+        if len(header) < _HEADER.size:
+            raise StreamDecryptionError("Missing stream header")
+        magic, version, key_id, prefix, chunk_size = _HEADER.unpack(header)
+        if magic != MAGIC or version != VERSION:
+            raise StreamDecryptionError("Unknown stream format")
+        if not 0 < chunk_size <= MAX_CHUNK_SIZE:
+            raise StreamDecryptionError("Invalid chunk size in header")
+        cipher = self._ciphers.get(key_id)
+        if cipher is None:
+            raise StreamDecryptionError("Stream was encrypted with an unknown key")
+        return cipher, prefix
+
+    def _open_frame(self, cipher, prefix, counter, buffer, header):
+        (raw_length,) = _FRAME_LENGTH.unpack_from(buffer)
+        final = bool(raw_length & 0x80000000)
+        frame_length = raw_length & 0x7FFFFFFF
+        with memoryview(buffer) as view:
+            ciphertext = view[_FRAME_LENGTH.size:_FRAME_LENGTH.size + frame_length]
+            try:
+                return cipher.decrypt(self._nonce(prefix, counter, final), ciphertext, header), final
+            except InvalidTag:
+                raise StreamDecryptionError(f"Authentication failed for frame {counter}") from None
+            finally:
+                ciphertext.release()
@@ -0,0 +1,314 @@
+import os
+import threading
+import time
+
+import numpy as np
+import psutil
+
+from checkpoint import BinaryReader, BinaryWriter
+
+# (دقة الحفظ بالثواني، عدد النقاط) للمستويات المخفضة؛ المستوى الخام يضاف أمامها بدقة المراقبة
+DEFAULT_RESOLUTIONS = (
+    (60, 24 * 60),        # دقيقة لمدة يوم
+    (900, 7 * 24 * 4),    # ربع ساعة لمدة أسبوع
+    (3600, 30 * 24)       # ساعة لمدة شهر
+)
+
+BASE_COLUMNS = (
+    'timestamp',
+    'cpu_percent',
+    'memory_percent',
+    'net_sent_rate',
+    'net_recv_rate',
+    'disk_read_rate',
+    'disk_write_rate',
+    'process_cpu_percent',
+    'process_rss_mb',
+    'process_threads',
+    'process_read_rate',
+    'process_write_rate'
+)
+
+
+class RingSeries:
+    """سلسلة زمنية دائرية بمصفوفة مسبقة الحجز بطول مضاعف
+
+    كل عينة تُكتب في موضعين (i و i + capacity) فتبقى آخر capacity عينة دائماً
+    شريحة متصلة من المصفوفة، ويمكن إرجاعها كعرض (view) بدون نسخ.
+
+    العروض صالحة حتى الإضافة التالية فقط: append يكتب فوق مواضع يشملها العرض.
+    القارئ في خيط آخر غير الكاتب يستخدم read_since الذي ينسخ الجزء المطلوب.
+    """
+
+    def __init__(self, columns, capacity, resolution):
+        self.columns = tuple(columns)
+        self.capacity = capacity
+        self.resolution = resolution
+        self._index = {name: index for index, name in enumerate(self.columns)}
+        self._buffer = np.full((capacity * 2, len(self.columns)), np.nan, dtype=np.float64)
+        self._written = 0
+
+    def __len__(self):
+        return min(self._written, self.capacity)
+
+    def append(self, row):
+        slot = self._written % self.capacity
+        self._buffer[slot] = row
+        self._buffer[slot + self.capacity] = row
+        self._written += 1
+
+    def view(self, last=None):
+        """آخر العينات كعرض للقراءة فقط على المصفوفة الأصلية (بدون نسخ)"""
+        count = len(self)
+        start = self._written % self.capacity if self._written > self.capacity else 0
+        if last is not None and last < count:
+            start += count - last
+            count = last
+        view = self._buffer[start:start + count]
+        view.flags.writeable = False
+        return view
+
+    def column(self, name, last=None):
+        """عمود واحد كعرض متخطٍ (strided) بدون نسخ"""
+        return self.view(last)[:, self._index[name]]
+
+    def read_since(self, names, since=None):
+        """نسخ الطوابع والأعمدة المطلوبة للعينات الأحدث من since (آمنة بعد إضافات لاحقة)"""
+        view = self.view()
+        timestamps = view[:, 0]
+        start = 0 if since is None else np.searchsorted(timestamps, since, side='right')
+        return timestamps[start:].copy(), [view[start:, self._index[name]].copy() for name in names]
+
+    @property
+    def state_version(self):
+        return self._written
+
+    def export_state(self):
+        """الصفوف الحالية كبايتات خام لنقاط الحفظ"""
+        writer = BinaryWriter()
+        writer.array(self.view())
+        return writer.getvalue()
+
+    def import_state(self, data):
+        """إعادة ملء السلسلة من نقطة حفظ"""
+        rows = BinaryReader(data).array()
+        if rows.shape[1] != len(self.columns):
+            raise ValueError("Checkpoint columns do not match series")
+        for row in rows[-self.capacity:]:
+            self.append(row)
+
+
+class _Downsampler:
+    """يجمع العينات في دلاء زمنية ويكتب متوسط كل دلو عند اكتماله"""
+
+    def __init__(self, series):
+        self.series = series
+        self._sum = np.zeros(len(series.columns), dtype=np.float64)
+        # عدد القيم المتاحة لكل عمود؛ NaN (قيمة غير متاحة) لا تُحسب صفراً
+        self._counts = np.zeros(len(series.columns), dtype=np.int64)
+        self._count = 0
+        self._bucket = None
+
+    def add(self, row):
+        """إضافة عينة وإرجاع الصف المخفض إذا اكتمل دلو سابق"""
+        bucket = int(row[0] // self.series.resolution)
+        completed = None
+        if self._bucket is not None and bucket != self._bucket and self._count:
+            # عمود بلا أي قيمة متاحة في الدلو يبقى NaN حتى تظهر الفجوة في الرسم
+            with np.errstate(invalid='ignore', divide='ignore'):
+                completed = np.where(self._counts > 0, self._sum / self._counts, np.nan)
+            # الطابع الزمني للدلو هو بدايته وليس متوسط الطوابع
+            completed[0] = self._bucket * self.series.resolution
+            self.series.append(completed)
+            self._sum[:] = 0
+            self._counts[:] = 0
+            self._count = 0
+        self._bucket = bucket
+        available = ~np.isnan(row)
+        np.add(self._sum, row, out=self._sum, where=available)
+        self._counts += available
+        self._count += 1
+        return completed
+
+
+class SystemMonitor:
+    """مراقب نظام منخفض التكلفة: معدلات من فروق العدادات، لكل نواة ولكل عملية، مع تخفيض متعدد الدقة"""
+
+    def __init__(self, interval=5.0, raw_capacity=720, resolutions=DEFAULT_RESOLUTIONS, pid=None):
+        self.interval = interval
+        self.process = psutil.Process(pid or os.getpid())
+        self.core_count = psutil.cpu_count() or 1
+        self.columns = BASE_COLUMNS + tuple(f'cpu{core}_percent' for core in range(self.core_count))
+
+        self.levels = [RingSeries(self.columns, raw_capacity, interval)]
+        self.levels.extend(RingSeries(self.columns, capacity, resolution) for resolution, capacity in resolutions)
+        self._downsamplers = [_Downsampler(series) for series in self.levels[1:]]
+
+        self._row = np.zeros(len(self.columns), dtype=np.float64)
+        self._previous = None
+        self._stop_event = threading.Event()
+        self._thread = None
+        self._lock = threading.Lock()
+
+    # ---- جمع العينات ----
+
+    def _read_counters(self):
+        network = psutil.net_io_counters()
+        disk = psutil.disk_io_counters()
+        try:
+            process_io = self.process.io_counters()
+            process_read, process_write = process_io.read_bytes, process_io.write_bytes
+        except (AttributeError, psutil.Error):
+            # io_counters غير متاح على كل الأنظمة
+            process_read = process_write = 0
+        return (
+            time.time(),
+            network.bytes_sent if network else 0,
+            network.bytes_recv if network else 0,
+            disk.read_bytes if disk else 0,
+            disk.write_bytes if disk else 0,
+            process_read,
+            process_write
+        )
+
+    def prime(self):
+        """أخذ قراءة أساسية للعدادات؛ نسب المعالج في psutil تحسب منذ الاستدعاء السابق"""
+        psutil.cpu_percent(percpu=True)
+        self.process.cpu_percent()
+        self._previous = self._read_counters()
+
+    def sample(self):
+        """أخذ عينة واحدة وحفظ المعدلات مباشرة في المصفوفات"""
+        if self._previous is None:
+            self.prime()
+            return None
+
+        counters = self._read_counters()
+        elapsed = counters[0] - self._previous[0]
+        if elapsed <= 0:
+            return None
+        # الفرق السالب يعني إعادة ضبط العداد (إعادة تشغيل واجهة مثلاً) فنعتبره صفراً
+        rates = [max(0, current - previous) / elapsed for current, previous in zip(counters[1:], self._previous[1:])]
+        self._previous = counters
+
+        per_core = psutil.cpu_percent(percpu=True)
+        try:
+            with self.process.oneshot():
+                process_cpu = self.process.cpu_percent()
+                process_rss = self.process.memory_info().rss / 1024 / 1024
+                process_threads = self.process.num_threads()
+        except psutil.Error:
+            process_cpu = process_rss = process_threads = np.nan
+
+        row = self._row
+        row[0] = counters[0]
+        row[1] = sum(per_core) / len(per_core) if per_core else 0.0
+        row[2] = psutil.virtual_memory().percent
+        row[3:7] = rates[:4]
+        row[7] = process_cpu
+        row[8] = process_rss
+        row[9] = process_threads
+        row[10:12] = rates[4:]
+        row[12:12 + len(per_core)] = per_core[:self.core_count]
+
+        with self._lock:
+            self.levels[0].append(row)
+            pending = row
+            for downsampler in self._downsamplers:
+                pending = downsampler.add(pending)
+                if pending is None:
+                    break
+        return row
+
+    # ---- التشغيل في الخلفية ----
+
+    def start(self, duration=None):
+        """تشغيل المراقبة في خيط خلفي (لمدة محددة أو حتى stop)"""
+        if self._thread is not None:
+            return self._thread
+        self._stop_event.clear()
+        self._thread = threading.Thread(target=self._run, args=(duration,), name='system-monitor')
+        self._thread.daemon = True
+        self._thread.start()
+        return self._thread
+
+    def stop(self):
+        self._stop_event.set()
+        if self._thread is not None and self._thread is not threading.current_thread():
+            self._thread.join()
+        self._thread = None
+
+    @property
+    def running(self):
+        return self._thread is not None and self._thread.is_alive()
+
+    def _run(self, duration):
+        self.prime()
+        started = time.monotonic()
+        next_sample = started + self.interval
+        while duration is None or time.monotonic() - started < duration:
+            # جدولة مطلقة حتى لا ينجرف الفاصل بزمن أخذ العينة نفسه
+            if self._stop_event.wait(max(0.0, next_sample - time.monotonic())):
+                break
+            self.sample()
+            next_sample += self.interval
+
+    # ---- القراءة ----
+
+    def _level(self, resolution):
+        if resolution is None:
+            return self.levels[0]
+        for series in self.levels:
+            if series.resolution == resolution:
+                return series
+        raise ValueError(f"Unknown resolution: {resolution}")
+
+    def resolutions(self):
+        return [series.resolution for series in self.levels]
+
+    def series(self, resolution=None, last=None):
+        """نسخة من كل الأعمدة لدقة معينة (None = الدقة الخام)
+
+        القراءة من خيوط أخرى (الواجهة، التقارير) فتُنسخ تحت القفل بدلاً من إرجاع عرض
+        قد يكتب فوقه خيط أخذ العينات.
+        """
+        with self._lock:
+            return self._level(resolution).view(last).copy()
+
+    def column(self, name, resolution=None, last=None):
+        """نسخة من عمود واحد"""
+        with self._lock:
+            return self._level(resolution).column(name, last).copy()
+
+    def read_since(self, names, since=None, resolution=None):
+        """نسخة متسقة من العينات الأحدث من since تحت قفل المراقب (للرسم في الخلفية)"""
+        with self._lock:
+            return self._level(resolution).read_since(names, since)
+
+    def best_resolution(self, seconds):
+        """أدق مستوى يغطي المدة المطلوبة"""
+        for series in self.levels:
+            if series.resolution * series.capacity >= seconds:
+                return series.resolution
+        return self.levels[-1].resolution
+
+    def latest(self):
+        """آخر عينة كقاموس"""
+        with self._lock:
+            view = self.levels[0].view(1)
+            if not len(view):
+                return None
+            row = view[0].tolist()
+        return dict(zip(self.columns, row))
+
+    def to_dict(self, resolution=None, last=None):
+        """تصدير الأعمدة كقوائم لواجهات JSON"""
+        view = self.series(resolution, last)
+        return {
+            'resolution': self._level(resolution).resolution,
+            # NaN (قيمة غير متاحة) تصبح null لأن JSON لا يدعمها
+            'columns': {
+                name: [None if value != value else value for value in view[:, index].tolist()]
+                for index, name in enumerate(self.columns)
+            }
+        }
@@ -0,0 +1,15 @@
+import os
+import sys
+
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+
+@pytest.fixture(scope='session', autouse=True)
+def _log_directory(tmp_path_factory):
+    """ملفات السجلات والمفاتيح النسبية تُكتب في مجلد مؤقت لا في المستودع"""
+    previous = os.getcwd()
+    os.chdir(tmp_path_factory.mktemp('logs'))
+    yield
+    os.chdir(previous)
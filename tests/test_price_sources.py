@@ -0,0 +1,119 @@
+import threading
+import time
+
+import pytest
+
+from price_sources import PriceAggregator, PriceSource, PriceSourceError, reject_outliers
+
+
+class StubSource(PriceSource):
+    """مزود ثابت السعر؛ gate يحجز الاستجابة حتى يُفتح و error يجعله يفشل"""
+
+    def __init__(self, name, price, error=False, gate=None):
+        super().__init__(name, url=None)
+        self.price = price
+        self.error = error
+        self.gate = gate
+        self.calls = 0
+
+    def fetch(self, coins):
+        self.calls += 1
+        if self.gate is not None:
+            self.gate.wait(5)
+        if self.error:
+            raise PriceSourceError(f"{self.name}: down")
+        return {coin: {'usd': self.price, 'usd_24h_change': 1.0} for coin in coins}
+
+
+@pytest.fixture
+def make_aggregator():
+    created = []
+
+    def factory(sources, **kwargs):
+        aggregator = PriceAggregator(sources, **kwargs)
+        created.append((aggregator, sources))
+        return aggregator
+
+    yield factory
+    for aggregator, sources in created:
+        for source in sources:
+            if source.gate is not None:
+                source.gate.set()
+        aggregator.close()
+
+
+def test_hedges_to_next_source_when_first_is_slow(make_aggregator):
+    slow = StubSource('slow', 100.0, gate=threading.Event())
+    fast = StubSource('fast', 101.0)
+    aggregator = make_aggregator([slow, fast], quorum=1, hedge_delay=0.05, timeout=2.0)
+
+    started = time.perf_counter()
+    prices = aggregator.fetch(['bitcoin'])
+
+    assert time.perf_counter() - started < 1.0
+    assert prices['bitcoin']['usd'] == 101.0
+    assert aggregator.last_result['sources'] == ['fast']
+    assert slow.calls == 1 and fast.calls == 1
+
+
+def test_failed_source_launches_replacement(make_aggregator):
+    broken = StubSource('broken', 100.0, error=True)
+    backup = StubSource('backup', 102.0)
+    aggregator = make_aggregator([broken, backup], quorum=1, hedge_delay=1.0, timeout=2.0)
+
+    prices = aggregator.fetch(['bitcoin'])
+
+    assert prices['bitcoin']['usd'] == 102.0
+    assert 'broken' in aggregator.last_result['errors']
+    assert aggregator.stats['broken'].failures == 1
+    # المزود الفاشل يتأخر في الترتيب التالي
+    assert aggregator.ranked_sources()[0] is backup
+
+
+def test_agreeing_quorum_skips_third_source(make_aggregator):
+    sources = [StubSource('a', 100.0), StubSource('b', 100.2), StubSource('c', 150.0)]
+    aggregator = make_aggregator(sources, quorum=2, hedge_delay=1.0, max_spread=0.01)
+
+    prices = aggregator.fetch(['bitcoin'])
+
+    assert sources[2].calls == 0
+    assert prices['bitcoin']['usd'] == pytest.approx(100.1)
+
+
+def test_disputed_quorum_asks_third_source_and_rejects_outlier(make_aggregator):
+    sources = [StubSource('a', 100.0), StubSource('b', 110.0), StubSource('c', 101.0)]
+    aggregator = make_aggregator(sources, quorum=2, hedge_delay=1.0, max_spread=0.01)
+
+    prices = aggregator.fetch(['bitcoin'])
+
+    assert sources[2].calls == 1
+    assert aggregator.last_result['coins']['bitcoin']['rejected'] == ['b']
+    assert sorted(aggregator.last_result['coins']['bitcoin']['sources']) == ['a', 'c']
+    assert prices['bitcoin']['usd'] == pytest.approx(100.5)
+    assert aggregator.stats['b'].outliers == 1
+
+
+def test_disputed_quorum_without_third_source_keeps_both(make_aggregator):
+    sources = [StubSource('a', 100.0), StubSource('b', 110.0)]
+    aggregator = make_aggregator(sources, quorum=2, hedge_delay=1.0, max_spread=0.01)
+
+    prices = aggregator.fetch(['bitcoin'])
+
+    assert aggregator.last_result['coins']['bitcoin']['rejected'] == []
+    assert prices['bitcoin']['usd'] == pytest.approx(105.0)
+
+
+def test_all_sources_failing_returns_none(make_aggregator):
+    sources = [StubSource('a', 100.0, error=True), StubSource('b', 100.0, error=True)]
+    aggregator = make_aggregator(sources, quorum=1, hedge_delay=1.0)
+
+    assert aggregator.fetch(['bitcoin']) is None
+    assert set(aggregator.last_result['errors']) == {'a', 'b'}
+
+
+def test_reject_outliers_uses_median_absolute_deviation():
+    assert reject_outliers([100.0, 100.1, 99.9, 150.0]).tolist() == [True, True, True, False]
+    # أقل من ثلاث قيم: لا يمكن تحديد الشاذ
+    assert reject_outliers([100.0, 200.0]).tolist() == [True, True]
+    # MAD = 0: الحد الأدنى النسبي يمنع رفض فرق ضئيل
+    assert reject_outliers([100.0, 100.0, 100.0, 100.05]).all()
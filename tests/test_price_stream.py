@@ -0,0 +1,137 @@
+import json
+import threading
+import time
+
+import pytest
+import websocket
+
+import price_stream
+from price_stream import PriceStream
+
+FEED_URL = 'ws://feed.test/prices'
+
+
+class FakeSocket:
+    """اتصال وهمي يعيد رسائل مبرمجة ثم ينقطع، أو ينتظر حتى abort إذا كان الأخير"""
+
+    def __init__(self, messages, hold_open):
+        self.messages = list(messages)
+        self.hold_open = hold_open
+        self._aborted = threading.Event()
+
+    def recv_data(self, control_frame=False):
+        if self.messages:
+            return websocket.ABNF.OPCODE_TEXT, json.dumps(self.messages.pop(0))
+        if self.hold_open:
+            self._aborted.wait(5)
+        raise websocket.WebSocketConnectionClosedException("fake feed closed")
+
+    def ping(self):
+        pass
+
+    def abort(self):
+        self._aborted.set()
+
+    def close(self):
+        self._aborted.set()
+
+
+class FakeFeed:
+    """بديل create_connection: كل عنصر في script اتصال (قائمة رسائل) أو استثناء يُرفع"""
+
+    def __init__(self, script):
+        self.script = list(script)
+        self.urls = []
+
+    def create_connection(self, url, timeout=None):
+        self.urls.append(url)
+        step = self.script.pop(0) if self.script else []
+        if isinstance(step, Exception):
+            raise step
+        return FakeSocket(step, hold_open=not self.script)
+
+
+class RecordingEvent(threading.Event):
+    """حدث إيقاف يسجل مهل الانتظار ويعود فوراً حتى لا ينتظر الاختبار التراجع فعلاً"""
+
+    def __init__(self):
+        super().__init__()
+        self.waits = []
+
+    def wait(self, timeout=None):
+        self.waits.append(timeout)
+        return super().wait(0)
+
+
+def snapshot(seq, usd):
+    return {'type': 'snapshot', 'seq': seq, 'prices': {'bitcoin': {'usd': usd, 'usd_24h_change': 0.0}}}
+
+
+def ticker(seq, usd):
+    return {'type': 'ticker', 'seq': seq, 'coin': 'bitcoin', 'usd': usd}
+
+
+def run_until(stream, condition, timeout=2.0):
+    stream.start()
+    deadline = time.monotonic() + timeout
+    try:
+        while not condition() and time.monotonic() < deadline:
+            time.sleep(0.005)
+    finally:
+        stream.stop()
+    assert condition()
+
+
+@pytest.fixture
+def feed(monkeypatch):
+    def install(script):
+        fake = FakeFeed(script)
+        monkeypatch.setattr(price_stream.websocket, 'create_connection', fake.create_connection)
+        monkeypatch.setattr(price_stream.random, 'uniform', lambda low, high: 1.0)
+        return fake
+    return install
+
+
+def make_stream(**kwargs):
+    stream = PriceStream(FEED_URL, threshold=0.001, **kwargs)
+    stream._stop_event = RecordingEvent()
+    return stream
+
+
+def test_resumes_from_last_sequence_after_disconnect(feed):
+    fake = feed([
+        [snapshot(1, 100.0), ticker(2, 101.0), ticker(3, 102.0)],
+        # الخادم يعيد آخر رسالة مطبقة بعد الاستئناف؛ يجب تجاهلها
+        [ticker(3, 999.0), ticker(4, 103.0)],
+    ])
+    stream = make_stream(backoff_initial=0.1)
+
+    run_until(stream, lambda: stream.seq == 4)
+
+    assert fake.urls == [FEED_URL, f"{FEED_URL}?since=3"]
+    assert stream.prices_snapshot()['bitcoin']['usd'] == 103.0
+    assert stream.reconnects == 1
+
+
+def test_sequence_gap_forces_resubscribe(feed):
+    fake = feed([
+        [snapshot(5, 100.0), ticker(7, 101.0)],
+        [ticker(6, 100.5), ticker(7, 101.0)],
+    ])
+    stream = make_stream(backoff_initial=0.1)
+
+    run_until(stream, lambda: stream.seq == 7)
+
+    assert fake.urls == [FEED_URL, f"{FEED_URL}?since=5"]
+    assert stream.prices_snapshot()['bitcoin']['usd'] == 101.0
+
+
+def test_reconnect_backoff_doubles_to_cap_and_resets_after_message(feed):
+    refused = ConnectionRefusedError("feed down")
+    feed([refused, refused, refused, refused, [snapshot(1, 100.0)], [ticker(2, 101.0)]])
+    stream = make_stream(backoff_initial=0.1, backoff_max=0.4)
+
+    run_until(stream, lambda: stream.seq == 2)
+
+    assert stream._stop_event.waits == pytest.approx([0.1, 0.2, 0.4, 0.4, 0.1])
+    assert stream.reconnects == 5
@@ -0,0 +1,284 @@
+import hashlib
+import logging
+import re
+
+try:
+    from Crypto.Hash import keccak
+except ImportError:  # pycryptodome اختياري؛ بدونه تُرفض العناوين التي تحتاج keccak
+    keccak = None
+    logging.getLogger(__name__).warning(
+        "pycryptodome is not installed: mixed-case ETH and all XMR addresses will be rejected "
+        "because their keccak checksums cannot be verified"
+    )
+
+from coin_algorithms import supported_coins
+
+BASE58_ALPHABET = '123456789ABCDEFGHJKLMNPQRSTUVWXYZabcdefghijkmnopqrstuvwxyz'
+_BASE58_INDEX = {char: index for index, char in enumerate(BASE58_ALPHABET)}
+# جدول translate يحذف الأحرف المسموحة؛ أي حرف متبقٍ غير صالح
+_BASE58_STRIP = str.maketrans('', '', BASE58_ALPHABET)
+_BASE58_RE = re.compile(r'[1-9A-HJ-NP-Za-km-z]+\Z')
+
+BECH32_CHARSET = 'qpzry9x8gf2tvdw0s3jn54khce6mua7l'
+_BECH32_INDEX = {char: index for index, char in enumerate(BECH32_CHARSET)}
+_BECH32_GENERATOR = (0x3b6a57b2, 0x26508e6d, 0x1ea119fa, 0x3d4233dd, 0x2a1462b3)
+_BECH32_CONST = 1
+_BECH32M_CONST = 0x2bc830a3
+
+_ETH_RE = re.compile(r'0x[0-9a-fA-F]{40}\Z')
+_XMR_RE = re.compile(r'[48][1-9A-HJ-NP-Za-km-z]{94}\Z|4[1-9A-HJ-NP-Za-km-z]{105}\Z')
+
+# بايتات الإصدار المقبولة في عناوين base58check وبادئة bech32 لكل عملة
+COIN_ADDRESS_RULES = {
+    'BTC': {'base58_versions': {0x00, 0x05}, 'bech32_hrp': 'bc'},
+    'LTC': {'base58_versions': {0x30, 0x32, 0x05}, 'bech32_hrp': 'ltc'},
+}
+_XMR_NETWORK_BYTES = {18, 19, 42}
+_XMR_FULL_BLOCK = 11
+_XMR_BLOCK_SIZES = {0: 0, 2: 1, 3: 2, 5: 3, 6: 4, 7: 5, 9: 6, 10: 7, 11: 8}
+
+
+def is_base58(text):
+    """فحص سريع لأحرف base58 باستخدام translate بدلاً من حلقة بايثون لكل حرف"""
+    return bool(text) and not text.translate(_BASE58_STRIP)
+
+
+def base58_decode(text):
+    """فك ترميز base58 (أسلوب بيتكوين)"""
+    number = 0
+    for char in text:
+        number = number * 58 + _BASE58_INDEX[char]
+    leading_zeros = len(text) - len(text.lstrip('1'))
+    body = number.to_bytes((number.bit_length() + 7) // 8, 'big') if number else b''
+    return b'\x00' * leading_zeros + body
+
+
+def base58check_decode(text):
+    """فك base58check وإرجاع الحمولة بدون المجموع، أو None إذا فشل المجموع"""
+    if not _BASE58_RE.match(text):
+        return None
+    raw = base58_decode(text)
+    if len(raw) < 5:
+        return None
+    payload, checksum = raw[:-4], raw[-4:]
+    if hashlib.sha256(hashlib.sha256(payload).digest()).digest()[:4] != checksum:
+        return None
+    return payload
+
+
+def _bech32_polymod(values):
+    checksum = 1
+    for value in values:
+        top = checksum >> 25
+        checksum = (checksum & 0x1ffffff) << 5 ^ value
+        for i in range(5):
+            if (top >> i) & 1:
+                checksum ^= _BECH32_GENERATOR[i]
+    return checksum
+
+
+def _bech32_hrp_expand(hrp):
+    return [ord(c) >> 5 for c in hrp] + [0] + [ord(c) & 31 for c in hrp]
+
+
+def _convert_bits(data, from_bits, to_bits):
+    accumulator = 0
+    bits = 0
+    result = []
+    max_value = (1 << to_bits) - 1
+    for value in data:
+        accumulator = (accumulator << from_bits) | value
+        bits += from_bits
+        while bits >= to_bits:
+            bits -= to_bits
+            result.append((accumulator >> bits) & max_value)
+    # يجب ألا يتبقى حشو غير صفري (BIP173)
+    if bits >= from_bits or ((accumulator << (to_bits - bits)) & max_value):
+        return None
+    return result
+
+
+def segwit_decode(hrp, address):
+    """فك عنوان segwit (bech32 للإصدار 0 و bech32m للإصدارات الأحدث - BIP173/BIP350)"""
+    if address.lower() != address and address.upper() != address:
+        return None
+    address = address.lower()
+    separator = address.rfind('1')
+    if separator < 1 or separator + 7 > len(address) or len(address) > 90:
+        return None
+    if address[:separator] != hrp:
+        return None
+
+    try:
+        data = [_BECH32_INDEX[c] for c in address[separator + 1:]]
+    except KeyError:
+        return None
+
+    constant = _bech32_polymod(_bech32_hrp_expand(hrp) + data)
+    if constant not in (_BECH32_CONST, _BECH32M_CONST):
+        return None
+
+    witness_version = data[0]
+    program = _convert_bits(data[1:-6], 5, 8)
+    if program is None or not 2 <= len(program) <= 40 or witness_version > 16:
+        return None
+    if witness_version == 0:
+        if constant != _BECH32_CONST or len(program) not in (20, 32):
+            return None
+    elif constant != _BECH32M_CONST:
+        return None
+    return witness_version, bytes(program)
+
+
+def _keccak256(data):
+    return keccak.new(digest_bits=256, data=data).digest()
+
+
+def eth_checksum_ok(address):
+    """فحص EIP-55: العناوين أحادية الحالة مقبولة، والمختلطة يجب أن تطابق المجموع
+
+    بدون keccak لا يمكن التحقق من المختلطة فتُرفض (الإغلاق عند الفشل).
+    """
+    body = address[2:]
+    if body.lower() == body or body.upper() == body:
+        return True
+    if keccak is None:
+        return False
+    digest = _keccak256(body.lower().encode()).hex()
+    for char, nibble in zip(body, digest):
+        if char.isalpha() and (char.isupper() != (int(nibble, 16) >= 8)):
+            return False
+    return True
+
+
+def monero_base58_decode(text):
+    """فك base58 الخاص بمونيرو (كتل من 11 حرفاً ↔ 8 بايتات)"""
+    result = bytearray()
+    for start in range(0, len(text), _XMR_FULL_BLOCK):
+        block = text[start:start + _XMR_FULL_BLOCK]
+        size = _XMR_BLOCK_SIZES.get(len(block))
+        if size is None:
+            return None
+        number = 0
+        for char in block:
+            number = number * 58 + _BASE58_INDEX[char]
+        if number >> (size * 8):
+            return None
+        result += number.to_bytes(size, 'big')
+    return bytes(result)
+
+
+def validate_address(coin, address):
+    """التحقق من عنوان محفظة لعملة محددة وإرجاع رسالة الخطأ أو None"""
+    if not isinstance(coin, str):
+        return "Unsupported coin"
+    if not isinstance(address, str) or not address:
+        return "Address must be a non-empty string"
+
+    if coin == 'ETH':
+        if not _ETH_RE.match(address):
+            return "Invalid Ethereum address format"
+        if not eth_checksum_ok(address):
+            if keccak is None:
+                return "EIP-55 checksum cannot be verified (pycryptodome missing)"
+            return "Invalid EIP-55 checksum"
+        return None
+
+    if coin == 'XMR':
+        if not _XMR_RE.match(address):
+            return "Invalid Monero address format"
+        raw = monero_base58_decode(address)
+        if raw is None or raw[0] not in _XMR_NETWORK_BYTES:
+            return "Invalid Monero network byte"
+        if keccak is None:
+            return "Monero checksum cannot be verified (pycryptodome missing)"
+        if _keccak256(raw[:-4])[:4] != raw[-4:]:
+            return "Invalid Monero checksum"
+        return None
+
+    rules = COIN_ADDRESS_RULES.get(coin)
+    if rules is None:
+        return "Unsupported coin"
+
+    if address.lower().startswith(rules['bech32_hrp'] + '1'):
+        if segwit_decode(rules['bech32_hrp'], address) is None:
+            return "Invalid bech32 address or checksum"
+        return None
+
+    payload = base58check_decode(address)
+    if payload is None:
+        return "Invalid base58check address or checksum"
+    if len(payload) != 21 or payload[0] not in rules['base58_versions']:
+        return "Unexpected address version for coin"
+    return None
+
+
+class BatchValidator:
+    """مدقق دفعات لمعاملات التعدين وعناوين المحافظ بمخطط مُجمّع مرة واحدة"""
+
+    def __init__(self, valid_coins=None, required_fields=('coin', 'hash_rate', 'power_limit')):
+        # العملات المدعومة افتراضياً هي عملات إضافات الخوارزميات المسجلة
+        self.valid_coins = frozenset(valid_coins or supported_coins())
+        self.required_fields = tuple(required_fields)
+        # (الحقل، رسالة الخطأ) للحقول الرقمية الموجبة بنفس ترتيب الفحص الأصلي
+        self.positive_fields = (('power_limit', "Invalid power limit"), ('hash_rate', "Invalid hash rate"))
+
+    def validate_parameters(self, params):
+        """التحقق من مجموعة معاملات واحدة وإرجاع قائمة الأخطاء"""
+        if not isinstance(params, dict):
+            return [{'field': None, 'error': "Parameters must be an object"}]
+
+        errors = [
+            {'field': field, 'error': f"Missing required field: {field}"}
+            for field in self.required_fields if field not in params
+        ]
+        if errors:
+            return errors
+
+        # قيم غير قابلة للتجزئة (قائمة أو قاموس) تُعامل كعملة غير صالحة بدل TypeError
+        coin = params['coin']
+        coin_valid = isinstance(coin, str) and coin in self.valid_coins
+        if not coin_valid:
+            errors.append({'field': 'coin', 'error': "Invalid coin specified"})
+        for field, message in self.positive_fields:
+            value = params[field]
+            if not isinstance(value, (int, float)) or value <= 0:
+                errors.append({'field': field, 'error': message})
+
+        address = params.get('wallet_address')
+        if address is not None and coin_valid:
+            error = validate_address(coin, address)
+            if error:
+                errors.append({'field': 'wallet_address', 'error': error})
+        return errors
+
+    def validate_parameters_batch(self, params_list):
+        """التحقق من قائمة كاملة من إعدادات الأجهزة في استدعاء واحد"""
+        validate = self.validate_parameters
+        results = []
+        for index, params in enumerate(params_list):
+            errors = validate(params)
+            results.append({'index': index, 'valid': not errors, 'errors': errors})
+        return results
+
+    def validate_addresses_batch(self, entries):
+        """التحقق من قائمة (العملة، العنوان) وإرجاع نتيجة لكل عنصر"""
+        results = []
+        for index, entry in enumerate(entries):
+            if not isinstance(entry, (tuple, list)) or len(entry) != 2:
+                results.append({
+                    'index': index,
+                    'coin': None,
+                    'valid': False,
+                    'errors': [{'field': None, 'error': "Entry must be a (coin, address) pair"}]
+                })
+                continue
+            coin, address = entry
+            error = validate_address(coin, address)
+            results.append({
+                'index': index,
+                'coin': coin,
+                'valid': error is None,
+                'errors': [] if error is None else [{'field': 'address', 'error': error}]
+            })
+        return results